@@ -1,13 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Path
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Path, Query, Request, Response
+from sqlalchemy import insert, select, func, or_, and_
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional, Dict, Any
-from app.core.database import get_db
-from models.schemas import RAGStore, RAGLevel, KnowledgeBase
-from app.rag.retriever import HierarchicalRAG
-from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, AsyncIterator, Literal, Set, Tuple
+from app.core.config import settings
+from app.core.database import get_db, SessionLocal
+from models.schemas import RAGStore, RAGLevel, KnowledgeBase, JobStatus, Project, Crew, Agent
+from app.rag.retriever import HierarchicalRAG, get_rag_retriever, shared_retriever
+from app.rag.ingestion import ingest_stream, TEXT_FILE_TYPES
+from app.rag.jobs import ingestion_jobs, JobProgress, JobQueueFull
+from app.rag.stats import get_store_stats, count_inserted_stores
+from pydantic import BaseModel, Field, ValidationError
+from datetime import datetime
+import asyncio
+import base64
+import json
+import logging
 import tempfile
 import os
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 class RAGStoreCreate(BaseModel):
@@ -26,18 +38,24 @@ class RAGSearchRequest(BaseModel):
     crew_id: Optional[int] = Field(None, gt=0)
     agent_id: Optional[int] = Field(None, gt=0)
     top_k: int = Field(default=5, ge=1, le=20, description="Number of results to return")
+    mode: Literal["vector", "hybrid"] = Field(
+        default="vector", description="vector: dense search only; hybrid: dense and BM25 rankings fused with RRF"
+    )
+    diversify: Optional[bool] = Field(
+        None, description="Cross-level vector search: rerank with MMR and drop repeats across levels (default RAG_SEARCH_DIVERSIFY)"
+    )
 
 class RAGStoreResponse(BaseModel):
     id: int
-    level: RAGLevel
-    name: str
-    content: str
+    level: Optional[RAGLevel] = None
+    name: Optional[str] = None
+    content: Optional[str] = None
     project_id: Optional[int] = None
     crew_id: Optional[int] = None
     agent_id: Optional[int] = None
     metadata: Optional[Dict[str, Any]] = None
     vector_id: Optional[str] = None
-    created_at: str
+    created_at: Optional[str] = None
     updated_at: Optional[str] = None
     
     class Config:
@@ -45,15 +63,15 @@ class RAGStoreResponse(BaseModel):
 
 class RAGStoreDetailResponse(BaseModel):
     id: int
-    level: RAGLevel
-    name: str
-    content: str
+    level: Optional[RAGLevel] = None
+    name: Optional[str] = None
+    content: Optional[str] = None
     project_id: Optional[int] = None
     crew_id: Optional[int] = None
     agent_id: Optional[int] = None
     metadata: Optional[Dict[str, Any]] = None
     vector_id: Optional[str] = None
-    created_at: str
+    created_at: Optional[str] = None
     updated_at: Optional[str] = None
     # Entity information
     project_name: Optional[str] = None
@@ -68,67 +86,74 @@ class RAGSearchResponse(BaseModel):
     query: str
     total_results: int
 
-# Initialize RAG retriever
-rag_retriever = HierarchicalRAG()
+class IngestionJobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    level: Optional[RAGLevel] = None
+    entity_id: Optional[int] = None
+    project_id: Optional[int] = None
+    filename: Optional[str] = None
+    bytes_total: int = 0
+    bytes_processed: int = 0
+    items_total: int = 0
+    items_processed: int = 0
+    items_failed: int = 0
+    chunk_count: int = 0
+    progress: Optional[float] = None
+    elapsed_seconds: Optional[float] = None
+    bytes_per_second: Optional[float] = None
+    chunks_per_second: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    completed_at: Optional[str] = None
 
-@router.get("/stores", response_model=List[RAGStoreResponse])
+@router.get("/stores", response_model=List[RAGStoreResponse], response_model_exclude_unset=True)
 async def get_rag_stores(
+    response: Response,
     level: Optional[RAGLevel] = None,
     project_id: Optional[int] = None,
     crew_id: Optional[int] = None,
     agent_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of stores to return"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all but content)"),
     db: Session = Depends(get_db)
 ):
-    """Get RAG stores with optional filtering"""
+    """Get RAG stores with optional filtering, newest first, one page at a time"""
     try:
-        query = db.query(RAGStore)
-        
-        if level:
-            query = query.filter(RAGStore.level == level)
-        if project_id:
-            query = query.filter(RAGStore.project_id == project_id)
-        if crew_id:
-            query = query.filter(RAGStore.crew_id == crew_id)
-        if agent_id:
-            query = query.filter(RAGStore.agent_id == agent_id)
-        
-        # Use eager loading to prevent N+1 queries when accessing related entities
-        stores = query.options(
-            joinedload(RAGStore.project),
-            joinedload(RAGStore.crew),
-            joinedload(RAGStore.agent)
-        ).order_by(RAGStore.created_at.desc()).all()
-        return stores
+        stores = _list_stores(
+            db, response, STORE_FIELDS, level, project_id, crew_id, agent_id, limit, cursor, fields
+        )
+        return [RAGStoreResponse(**store) for store in stores]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve RAG stores: {str(e)}")
 
 @router.post("/stores", response_model=RAGStoreResponse)
-async def create_rag_store(rag_store: RAGStoreCreate, db: Session = Depends(get_db)):
+async def create_rag_store(
+    rag_store: RAGStoreCreate,
+    db: Session = Depends(get_db),
+    rag_retriever: HierarchicalRAG = Depends(get_rag_retriever)
+):
     """Create a new RAG store entry"""
     try:
         # Validate entity IDs based on level
-        if rag_store.level == RAGLevel.PROJECT and not rag_store.project_id:
-            raise HTTPException(status_code=400, detail="project_id required for project-level RAG")
-        elif rag_store.level == RAGLevel.CREW and not rag_store.crew_id:
-            raise HTTPException(status_code=400, detail="crew_id required for crew-level RAG")
-        elif rag_store.level == RAGLevel.AGENT and not rag_store.agent_id:
-            raise HTTPException(status_code=400, detail="agent_id required for agent-level RAG")
-        
-        # Determine entity ID for RAG storage
-        entity_id = None
-        if rag_store.level == RAGLevel.PROJECT:
-            entity_id = rag_store.project_id
-        elif rag_store.level == RAGLevel.CREW:
-            entity_id = rag_store.crew_id
-        elif rag_store.level == RAGLevel.AGENT:
-            entity_id = rag_store.agent_id
+        try:
+            entity_id = _entity_id_for(rag_store)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         # Add to vector database
         vector_id = await rag_retriever.add_knowledge(
             level=rag_store.level,
             entity_id=entity_id,
             content=rag_store.content,
-            metadata=rag_store.metadata
+            metadata=rag_store.metadata,
+            file_type=(rag_store.metadata or {}).get("file_type")
         )
         
         # Create database entry
@@ -152,23 +177,274 @@ async def create_rag_store(rag_store: RAGStoreCreate, db: Session = Depends(get_
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to create RAG store: {str(e)}")
 
+def _entity_id_for(rag_store: RAGStoreCreate) -> int:
+    """Entity ID the knowledge is stored under, based on its level"""
+    if rag_store.level == RAGLevel.PROJECT:
+        if not rag_store.project_id:
+            raise ValueError("project_id required for project-level RAG")
+        return rag_store.project_id
+    elif rag_store.level == RAGLevel.CREW:
+        if not rag_store.crew_id:
+            raise ValueError("crew_id required for crew-level RAG")
+        return rag_store.crew_id
+    else:
+        if not rag_store.agent_id:
+            raise ValueError("agent_id required for agent-level RAG")
+        return rag_store.agent_id
+
+@router.post("/stores/bulk")
+async def create_rag_stores_bulk(
+    request: Request,
+    response: Response,
+    background: bool = Query(False, description="Queue the insert as an ingestion job and return its id"),
+    db: Session = Depends(get_db),
+    rag_retriever: HierarchicalRAG = Depends(get_rag_retriever)
+):
+    """Create many RAG store entries at once.
+    
+    Accepts a JSON array of RAG store items, or an NDJSON stream (one item per
+    line, ``Content-Type: application/x-ndjson``) which is processed as it
+    arrives. Items are embedded and written in batches of RAG_BULK_BATCH_SIZE;
+    a failing item is reported in ``results`` without rolling back the others.
+    """
+    if not background:
+        return await _bulk_create(_iter_bulk_items(request), db, rag_retriever)
+    
+    # Spool the items to disk, like uploads, instead of holding them until the job runs
+    spool_path, items_total, project_ids = await _spool_bulk_items(_iter_bulk_items(request))
+    
+    async def run_bulk(progress: JobProgress) -> Dict[str, Any]:
+        try:
+            with SessionLocal() as job_db:
+                return await _bulk_create(_replay_bulk_items(spool_path), job_db, rag_retriever, progress)
+        finally:
+            os.unlink(spool_path)
+    
+    try:
+        job_id = await ingestion_jobs.submit(
+            "bulk",
+            run_bulk,
+            project_id=project_ids.pop() if len(project_ids) == 1 else None,
+            items_total=items_total
+        )
+    except JobQueueFull as e:
+        os.unlink(spool_path)
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    response.status_code = 202
+    return {
+        "message": "Bulk insert accepted for processing",
+        "job_id": job_id,
+        "status": JobStatus.PENDING.value,
+        "items_total": items_total,
+        "status_url": f"/api/v1/rag/jobs/{job_id}"
+    }
+
+async def _spool_bulk_items(items: AsyncIterator[Any]) -> Tuple[str, int, Set[Optional[int]]]:
+    """Write bulk items to an NDJSON spool file in RAG_UPLOAD_READ_BYTES pieces.
+    
+    Returns the spool path, the item count and the project ids seen. Each
+    line wraps one item, or the parse error it is replayed as.
+    """
+    count = 0
+    project_ids = set()
+    pending: List[bytes] = []
+    pending_bytes = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".ndjson") as spool_file:
+        try:
+            async for item in items:
+                if isinstance(item, Exception):
+                    record = {"error": str(item)}
+                else:
+                    record = {"item": item}
+                    if isinstance(item, dict):
+                        project_ids.add(item.get("project_id"))
+                line = json.dumps(record).encode() + b"\n"
+                pending.append(line)
+                pending_bytes += len(line)
+                count += 1
+                if pending_bytes >= settings.RAG_UPLOAD_READ_BYTES:
+                    await asyncio.to_thread(spool_file.write, b"".join(pending))
+                    pending, pending_bytes = [], 0
+            await asyncio.to_thread(spool_file.write, b"".join(pending))
+        except BaseException:
+            spool_file.close()
+            os.unlink(spool_file.name)
+            raise
+    return spool_file.name, count, project_ids
+
+async def _replay_bulk_items(spool_path: str) -> AsyncIterator[Any]:
+    """Yield the items written by ``_spool_bulk_items``, reading off the event loop"""
+    with open(spool_path, "rb") as spool_file:
+        while True:
+            lines = await asyncio.to_thread(spool_file.readlines, settings.RAG_UPLOAD_READ_BYTES)
+            if not lines:
+                return
+            for line in lines:
+                record = json.loads(line)
+                yield ValueError(record["error"]) if "error" in record else record["item"]
+
+async def _iter_bulk_items(request: Request) -> AsyncIterator[Any]:
+    """Yield raw bulk items from a JSON array or an NDJSON stream.
+    
+    Lines that are not valid JSON are yielded as the parse error so they are
+    reported as failed items rather than aborting the request.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        buffer = b""
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_ndjson_line(line)
+        if buffer.strip():
+            yield _parse_ndjson_line(buffer)
+        return
+    
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array or NDJSON stream")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array or NDJSON stream")
+    for item in payload:
+        yield item
+
+def _parse_ndjson_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {e}")
+
+async def _bulk_create(
+    items: AsyncIterator[Any],
+    db: Session,
+    rag_retriever: HierarchicalRAG,
+    progress: Optional[JobProgress] = None
+) -> Dict[str, Any]:
+    """Insert bulk items batch by batch, collecting per-item results"""
+    results = []
+    batch = []
+    
+    async def flush():
+        results.extend(await _bulk_create_batch(batch, db, rag_retriever))
+        batch.clear()
+        if progress:
+            await progress.update(
+                items_processed=len(results),
+                items_failed=sum(1 for result in results if result["status"] == "failed")
+            )
+    
+    async for item in items:
+        batch.append((len(results) + len(batch), item))
+        if len(batch) >= settings.RAG_BULK_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+    
+    failed = sum(1 for result in results if result["status"] == "failed")
+    return {
+        "total": len(results),
+        "created": len(results) - failed,
+        "failed": failed,
+        "results": results
+    }
+
+async def _bulk_create_batch(batch: List[tuple], db: Session, rag_retriever: HierarchicalRAG) -> List[Dict[str, Any]]:
+    """Validate, embed and store one batch; one vector write and one bulk
+    INSERT for the whole batch"""
+    results: Dict[int, Dict[str, Any]] = {}
+    valid = []
+    for index, raw in batch:
+        try:
+            if isinstance(raw, Exception):
+                raise raw
+            rag_store = RAGStoreCreate.model_validate(raw)
+            valid.append((index, rag_store, _entity_id_for(rag_store)))
+        except (ValidationError, ValueError) as e:
+            results[index] = {"index": index, "status": "failed", "error": str(e)}
+    
+    if valid:
+        try:
+            vector_ids = await rag_retriever.add_knowledge_batch([
+                {
+                    "level": rag_store.level,
+                    "entity_id": entity_id,
+                    "content": rag_store.content,
+                    "metadata": rag_store.metadata,
+                    "file_type": (rag_store.metadata or {}).get("file_type")
+                }
+                for _, rag_store, entity_id in valid
+            ])
+        except Exception as e:
+            vector_ids = [e] * len(valid)
+        
+        stored = []
+        for (index, rag_store, _), vector_id in zip(valid, vector_ids):
+            if isinstance(vector_id, Exception):
+                results[index] = {"index": index, "status": "failed", "error": f"Failed to embed/store: {vector_id}"}
+            else:
+                stored.append((index, rag_store, vector_id))
+        
+        if stored:
+            rows = [
+                {
+                    "level": rag_store.level,
+                    "name": rag_store.name,
+                    "content": rag_store.content,
+                    "project_id": rag_store.project_id,
+                    "crew_id": rag_store.crew_id,
+                    "agent_id": rag_store.agent_id,
+                    "meta_data": rag_store.metadata,
+                    "vector_id": vector_id
+                }
+                for _, rag_store, vector_id in stored
+            ]
+            try:
+                store_ids = db.scalars(
+                    insert(RAGStore).returning(RAGStore.id, sort_by_parameter_order=True),
+                    rows
+                ).all()
+                count_inserted_stores(db, rows)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                # Keep the vector store consistent with the database
+                for index, rag_store, vector_id in stored:
+                    await rag_retriever.delete_knowledge(vector_id, rag_store.level)
+                    results[index] = {"index": index, "status": "failed", "error": f"Failed to save: {e}"}
+            else:
+                for (index, _, vector_id), store_id in zip(stored, store_ids):
+                    results[index] = {"index": index, "status": "created", "id": store_id, "vector_id": vector_id}
+    
+    return [results[index] for index, _ in batch]
+
 @router.post("/search", response_model=RAGSearchResponse)
-async def search_rag(search_request: RAGSearchRequest, db: Session = Depends(get_db)):
+async def search_rag(
+    search_request: RAGSearchRequest,
+    db: Session = Depends(get_db),
+    rag_retriever: HierarchicalRAG = Depends(get_rag_retriever)
+):
     """Search across RAG stores"""
     try:
+        if search_request.mode == "hybrid" and rag_retriever.lexical_index is None:
+            raise HTTPException(status_code=400, detail="Hybrid search requires RAG_LEXICAL_INDEX to be enabled")
+        
         if search_request.level:
             # Search specific level
             if search_request.level == RAGLevel.PROJECT and search_request.project_id:
                 results = {"project": await rag_retriever.get_project_context(
-                    search_request.project_id, search_request.query, search_request.top_k
+                    search_request.project_id, search_request.query, search_request.top_k, search_request.mode
                 )}
             elif search_request.level == RAGLevel.CREW and search_request.crew_id:
                 results = {"crew": await rag_retriever.get_crew_context(
-                    search_request.crew_id, search_request.query, search_request.top_k
+                    search_request.crew_id, search_request.query, search_request.top_k, search_request.mode
                 )}
             elif search_request.level == RAGLevel.AGENT and search_request.agent_id:
                 results = {"agent": await rag_retriever.get_agent_context(
-                    search_request.agent_id, search_request.query, search_request.top_k
+                    search_request.agent_id, search_request.query, search_request.top_k, search_request.mode
                 )}
             else:
                 raise HTTPException(status_code=400, detail="Invalid level/ID combination")
@@ -178,7 +454,9 @@ async def search_rag(search_request: RAGSearchRequest, db: Session = Depends(get
                 query=search_request.query,
                 project_id=search_request.project_id or 0,
                 crew_id=search_request.crew_id,
-                agent_id=search_request.agent_id
+                agent_id=search_request.agent_id,
+                mode=search_request.mode,
+                diversify=search_request.diversify
             )
         
         total_results = sum(1 for content in results.values() if content.strip())
@@ -193,7 +471,7 @@ async def search_rag(search_request: RAGSearchRequest, db: Session = Depends(get
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to search RAG: {str(e)}")
 
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 async def upload_knowledge_file(
     file: UploadFile = File(...),
     level: RAGLevel = RAGLevel.PROJECT,
@@ -202,7 +480,12 @@ async def upload_knowledge_file(
     agent_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
-    """Upload a file and add its content to RAG"""
+    """Upload a file and queue its content for RAG ingestion.
+    
+    The upload is copied to a spool file in fixed-size pieces and a background
+    job streams it through the chunker; poll ``GET /rag/jobs/{job_id}`` or
+    watch the project's live log for progress.
+    """
     try:
         # Validate file type
         allowed_extensions = {".txt", ".md", ".pdf", ".docx"}
@@ -213,90 +496,182 @@ async def upload_knowledge_file(
                 detail=f"Unsupported file type. Allowed: {', '.join(allowed_extensions)}"
             )
         
-        # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        entity_id = project_id if level == RAGLevel.PROJECT else crew_id if level == RAGLevel.CREW else agent_id
+        if not entity_id:
+            raise HTTPException(status_code=400, detail="Entity ID required for the specified level")
         
+        owning_project_id = _owning_project_id(db, level, project_id, crew_id, agent_id)
+        filename = file.filename
+        
+        # Spool the upload to disk without holding it in memory; the file is
+        # removed here unless a queued job takes ownership of it
+        bytes_total = 0
+        spool_file = tempfile.NamedTemporaryFile(delete=False, suffix=file_extension)
+        spool_path = spool_file.name
         try:
-            # Extract text content (simplified - in production, use proper parsers)
-            if file_extension == ".txt" or file_extension == ".md":
-                with open(temp_file_path, 'r', encoding='utf-8') as f:
-                    text_content = f.read()
-            else:
-                # For PDF/DOCX, return placeholder (implement proper parsing)
-                text_content = f"File content from {file.filename} (parsing not implemented yet)"
+            with spool_file:
+                while True:
+                    data = await file.read(settings.RAG_UPLOAD_READ_BYTES)
+                    if not data:
+                        break
+                    await asyncio.to_thread(spool_file.write, data)
+                    bytes_total += len(data)
             
-            # Create knowledge base entry
-            db_knowledge = KnowledgeBase(
-                name=file.filename,
-                description=f"Uploaded file: {file.filename}",
-                file_path=temp_file_path,
-                file_type=file_extension,
-                processed=True
-            )
-            db.add(db_knowledge)
-            db.commit()
+            async def run_upload(progress: JobProgress) -> Dict[str, Any]:
+                return await _ingest_spooled_file(
+                    spool_path, filename, file_extension, level, entity_id, progress
+                )
             
-            # Add to RAG
-            entity_id = project_id if level == RAGLevel.PROJECT else crew_id if level == RAGLevel.CREW else agent_id
-            if not entity_id:
-                raise HTTPException(status_code=400, detail="Entity ID required for the specified level")
+            job_id = await ingestion_jobs.submit(
+                "upload",
+                run_upload,
+                level=level,
+                entity_id=entity_id,
+                project_id=owning_project_id,
+                filename=filename,
+                bytes_total=bytes_total
+            )
+        except BaseException as e:
+            spool_file.close()
+            os.unlink(spool_path)
+            if isinstance(e, JobQueueFull):
+                raise HTTPException(status_code=503, detail=str(e))
+            raise
+        
+        return {
+            "message": "File upload accepted for processing",
+            "filename": filename,
+            "job_id": job_id,
+            "status": JobStatus.PENDING.value,
+            "bytes_total": bytes_total,
+            "status_url": f"/api/v1/rag/jobs/{job_id}"
+        }
             
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
+
+async def _ingest_spooled_file(
+    spool_path: str,
+    filename: str,
+    file_extension: str,
+    level: RAGLevel,
+    entity_id: int,
+    progress: JobProgress
+) -> Dict[str, Any]:
+    """Background job body for /upload: stream the spool file into RAG"""
+    metadata = {"filename": filename, "file_type": file_extension}
+    # Resolved here so accepting an upload never waits for the model to load
+    rag_retriever = await asyncio.to_thread(shared_retriever.get)
+    
+    async def report(state: Dict[str, Any]):
+        await progress.update(bytes_processed=state["bytes_processed"], chunk_count=state["chunk_count"])
+    
+    try:
+        if file_extension in TEXT_FILE_TYPES:
+            with open(spool_path, "rb") as spool_file:
+                async def read(size: int) -> bytes:
+                    return await asyncio.to_thread(spool_file.read, size)
+                
+                result = await ingest_stream(
+                    rag_retriever,
+                    read,
+                    level=level,
+                    entity_id=entity_id,
+                    file_type=file_extension,
+                    metadata=metadata,
+                    progress_callback=report
+                )
+        else:
+            # For PDF/DOCX, store placeholder (implement proper parsing)
+            text_content = f"File content from {filename} (parsing not implemented yet)"
             vector_id = await rag_retriever.add_knowledge(
                 level=level,
                 entity_id=entity_id,
                 content=text_content,
-                metadata={"filename": file.filename, "file_type": file_extension}
+                metadata=metadata,
+                file_type=file_extension
             )
-            
-            return {
-                "message": "File uploaded and processed successfully",
-                "filename": file.filename,
+            result = {
                 "vector_id": vector_id,
+                "bytes_processed": os.path.getsize(spool_path),
                 "content_length": len(text_content),
-                "knowledge_id": db_knowledge.id
+                "chunk_count": 1
             }
-        finally:
-            # Clean up temp file
-            os.unlink(temp_file_path)
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
+            await report(result)
+    finally:
+        os.unlink(spool_path)
+    
+    # Create knowledge base entry
+    with SessionLocal() as db:
+        db_knowledge = KnowledgeBase(
+            name=filename,
+            description=f"Uploaded file: {filename}",
+            file_type=file_extension,
+            processed=True,
+            embeddings_created=result["chunk_count"] > 0
+        )
+        db.add(db_knowledge)
+        db.commit()
+        result["knowledge_id"] = db_knowledge.id
+    
+    return result
+
+def _owning_project_id(
+    db: Session,
+    level: RAGLevel,
+    project_id: Optional[int],
+    crew_id: Optional[int],
+    agent_id: Optional[int]
+) -> Optional[int]:
+    """Project whose live log should receive ingestion progress"""
+    if project_id:
+        return project_id
+    if level == RAGLevel.CREW and crew_id:
+        crew = db.query(Crew).filter(Crew.id == crew_id).first()
+        return crew.project_id if crew else None
+    if level == RAGLevel.AGENT and agent_id:
+        agent = db.query(Agent).options(joinedload(Agent.crew)).filter(Agent.id == agent_id).first()
+        return agent.crew.project_id if agent and agent.crew else None
+    return None
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(job_id: str = Path(..., min_length=1, max_length=32, description="Ingestion job ID")):
+    """Get progress, throughput and errors for a background ingestion job"""
+    job = ingestion_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
 
 @router.get("/stats")
 async def get_rag_stats(db: Session = Depends(get_db)):
     """Get RAG statistics"""
     try:
-        # Count stores by level
-        project_count = db.query(RAGStore).filter(RAGStore.level == RAGLevel.PROJECT).count()
-        crew_count = db.query(RAGStore).filter(RAGStore.level == RAGLevel.CREW).count()
-        agent_count = db.query(RAGStore).filter(RAGStore.level == RAGLevel.AGENT).count()
-        
-        # Get total content size using a more efficient approach
-        all_stores = db.query(RAGStore).all()
-        total_content_size = sum(
-            len(store.content or "") for store in all_stores
-        )
+        # Count stores and content size by level without loading documents
+        stats = get_store_stats(db)
+        total_content_size = sum(size for _, size in stats.values())
         
         return {
             "stores_by_level": {
-                "project": project_count,
-                "crew": crew_count,
-                "agent": agent_count,
-                "total": project_count + crew_count + agent_count
+                **{level.value: count for level, (count, _) in stats.items()},
+                "total": sum(count for count, _ in stats.values())
             },
             "total_content_size_bytes": total_content_size,
-            "total_content_size_mb": round(total_content_size / (1024 * 1024), 2)
+            "total_content_size_mb": round(total_content_size / (1024 * 1024), 2),
+            # Reported once the shared retriever has loaded; stats never force a load
+            "embedding_cache": shared_retriever.instance.embedding_cache.stats() if shared_retriever.instance else None,
+            "query_cache": shared_retriever.instance.query_cache.stats() if shared_retriever.instance else None
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get RAG stats: {str(e)}")
 
 @router.delete("/stores/{store_id}")
-async def delete_rag_store(store_id: int = Path(..., gt=0, description="RAG store ID"), db: Session = Depends(get_db)):
+async def delete_rag_store(
+    store_id: int = Path(..., gt=0, description="RAG store ID"),
+    db: Session = Depends(get_db),
+    rag_retriever: HierarchicalRAG = Depends(get_rag_retriever)
+):
     """Delete a RAG store entry"""
     try:
         store = db.query(RAGStore).filter(RAGStore.id == store_id).first()
@@ -318,55 +693,154 @@ async def delete_rag_store(store_id: int = Path(..., gt=0, description="RAG stor
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete RAG store: {str(e)}")
 
-@router.get("/stores/detailed", response_model=List[RAGStoreDetailResponse])
+@router.get("/stores/detailed", response_model=List[RAGStoreDetailResponse], response_model_exclude_unset=True)
 async def get_rag_stores_detailed(
+    response: Response,
     level: Optional[RAGLevel] = None,
     project_id: Optional[int] = None,
     crew_id: Optional[int] = None,
     agent_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of stores to return"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all but content)"),
     db: Session = Depends(get_db)
 ):
-    """Get RAG stores with detailed entity information using eager loading"""
+    """Get RAG stores with detailed entity information, one page at a time"""
     try:
-        query = db.query(RAGStore)
-        
-        if level:
-            query = query.filter(RAGStore.level == level)
-        if project_id:
-            query = query.filter(RAGStore.project_id == project_id)
-        if crew_id:
-            query = query.filter(RAGStore.crew_id == crew_id)
-        if agent_id:
-            query = query.filter(RAGStore.agent_id == agent_id)
-        
-        # Use eager loading to prevent N+1 queries when accessing related entities
-        stores = query.options(
-            joinedload(RAGStore.project),
-            joinedload(RAGStore.crew),
-            joinedload(RAGStore.agent)
-        ).order_by(RAGStore.created_at.desc()).all()
-        
-        # Build detailed response with entity names
-        response_data = []
-        for store in stores:
-            store_data = {
-                "id": store.id,
-                "level": store.level,
-                "name": store.name,
-                "content": store.content,
-                "project_id": store.project_id,
-                "crew_id": store.crew_id,
-                "agent_id": store.agent_id,
-                "metadata": store.meta_data,  # Note: field name is meta_data in schema
-                "vector_id": store.vector_id,
-                "created_at": store.created_at.isoformat() if store.created_at else "",
-                "updated_at": store.updated_at.isoformat() if store.updated_at else None,
-                "project_name": store.project.name if store.project else None,
-                "crew_name": store.crew.name if store.crew else None,
-                "agent_name": store.agent.name if store.agent else None
-            }
-            response_data.append(RAGStoreDetailResponse(**store_data))
-        
-        return response_data
+        stores = _list_stores(
+            db, response, DETAIL_FIELDS, level, project_id, crew_id, agent_id, limit, cursor, fields
+        )
+        return [RAGStoreDetailResponse(**store) for store in stores]
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve detailed RAG stores: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve detailed RAG stores: {str(e)}")
+
+# Projectable store fields; list views leave out content unless asked for
+STORE_FIELDS = {
+    "id": RAGStore.id,
+    "level": RAGStore.level,
+    "name": RAGStore.name,
+    "content": RAGStore.content,
+    "project_id": RAGStore.project_id,
+    "crew_id": RAGStore.crew_id,
+    "agent_id": RAGStore.agent_id,
+    "metadata": RAGStore.meta_data,
+    "vector_id": RAGStore.vector_id,
+    "created_at": RAGStore.created_at,
+    "updated_at": RAGStore.updated_at
+}
+# Entity name fields of the detailed view, joined only when requested
+ENTITY_NAME_FIELDS = {
+    "project_name": Project.name,
+    "crew_name": Crew.name,
+    "agent_name": Agent.name
+}
+DETAIL_FIELDS = {**STORE_FIELDS, **ENTITY_NAME_FIELDS}
+
+def _list_stores(
+    db: Session,
+    response: Response,
+    allowed_fields: Dict[str, Any],
+    level: Optional[RAGLevel],
+    project_id: Optional[int],
+    crew_id: Optional[int],
+    agent_id: Optional[int],
+    limit: int,
+    cursor: Optional[str],
+    fields: Optional[str]
+) -> List[Dict[str, Any]]:
+    """Keyset-paginated store listing ordered by (created_at, id) descending.
+    
+    Only the projected columns are selected, and entity tables are joined
+    only for requested name fields. Sets X-Total-Count/X-Page-Count and,
+    when more rows follow, X-Next-Cursor on the response.
+    """
+    selected = _parse_fields(fields, allowed_fields)
+    
+    filters = []
+    if level:
+        filters.append(RAGStore.level == level)
+    if project_id:
+        filters.append(RAGStore.project_id == project_id)
+    if crew_id:
+        filters.append(RAGStore.crew_id == crew_id)
+    if agent_id:
+        filters.append(RAGStore.agent_id == agent_id)
+    
+    query = db.query(*(allowed_fields[name].label(name) for name in selected))
+    if "project_name" in selected:
+        query = query.outerjoin(Project, RAGStore.project_id == Project.id)
+    if "crew_name" in selected:
+        query = query.outerjoin(Crew, RAGStore.crew_id == Crew.id)
+    if "agent_name" in selected:
+        query = query.outerjoin(Agent, RAGStore.agent_id == Agent.id)
+    query = query.filter(*filters)
+    
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        # Compare against the stored timestamp so the database's own
+        # datetime format is used; fall back to the cursor's copy if the
+        # row has since been deleted
+        created_at = func.coalesce(
+            select(RAGStore.created_at).where(RAGStore.id == cursor_id).scalar_subquery(),
+            cursor_created_at
+        )
+        query = query.filter(or_(
+            RAGStore.created_at < created_at,
+            and_(RAGStore.created_at == created_at, RAGStore.id < cursor_id)
+        ))
+    
+    rows = query.order_by(RAGStore.created_at.desc(), RAGStore.id.desc()).limit(limit + 1).all()
+    
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last.created_at, last.id)
+    total = _count_stores(db, filters, level, project_id or crew_id or agent_id)
+    response.headers["X-Total-Count"] = str(total)
+    response.headers["X-Page-Count"] = str(-(-total // limit))
+    
+    stores = []
+    for row in rows:
+        store = {name: getattr(row, name) for name in selected}
+        for name in ("created_at", "updated_at"):
+            if name in store:
+                store[name] = store[name].isoformat() if store[name] else None
+        stores.append(store)
+    return stores
+
+def _parse_fields(fields: Optional[str], allowed_fields: Dict[str, Any]) -> List[str]:
+    if not fields:
+        return [name for name in allowed_fields if name != "content"]
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in allowed_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # id and created_at are needed to build the next cursor
+    return [name for name in allowed_fields if name in requested or name in ("id", "created_at")]
+
+def _encode_cursor(created_at, store_id: int) -> str:
+    raw = json.dumps([created_at.isoformat() if created_at else None, store_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, store_id = json.loads(raw)
+        return (datetime.fromisoformat(created_at) if created_at else None), int(store_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _count_stores(db: Session, filters: List[Any], level: Optional[RAGLevel], entity_filtered) -> int:
+    """Total matching stores without touching content or joins.
+    
+    Unfiltered and level-only listings are answered from the per-level
+    stats (the counters table when RAG_STATS_COUNTERS is enabled).
+    """
+    if not entity_filtered:
+        stats = get_store_stats(db)
+        if level:
+            return stats[level][0]
+        return sum(count for count, _ in stats.values())
+    return db.query(func.count(RAGStore.id)).filter(*filters).scalar()
\ No newline at end of file
@@ -1,6 +1,11 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.websocket import ws_manager
+from app.rag.retriever import shared_retriever
 from app.api.endpoints import projects_simple as projects, crews, agents, tasks, rag, auth, live_demo
 
 router = APIRouter()
@@ -16,4 +21,23 @@ router.include_router(rag.router, prefix="/rag", tags=["rag"])
 
 @router.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "MultiAgent Ultra API"}
\ No newline at end of file
+    return {"status": "healthy", "service": "MultiAgent Ultra API"}
+
+@router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the embedding model and vector store are
+    loaded (and warmed up, if enabled), 503 before that"""
+    report = shared_retriever.readiness(
+        require_warm_up=settings.RAG_PRELOAD_ON_STARTUP and settings.RAG_WARMUP_ON_STARTUP
+    )
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+@router.get("/ws/stats")
+async def websocket_stats(project_id: Optional[int] = None):
+    """Live log connections with their send queue depth and drop counts"""
+    connections = ws_manager.stats(project_id)
+    return {
+        "connections": connections,
+        "total_dropped": sum(connection["dropped"] for connection in connections),
+        "total_coalesced": sum(connection["coalesced"] for connection in connections)
+    }
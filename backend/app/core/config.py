@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field, field_validator
-from typing import Optional, List
+from typing import Optional, List, Literal
 import os
 import secrets
 import string
@@ -53,6 +53,62 @@ class Settings(BaseSettings):
     # Vector DB
     CHROMA_PERSIST_DIRECTORY: str = Field(default="./chroma_db", env="CHROMA_PERSIST_DIRECTORY")
     
+    # Retrieval
+    RAG_PRELOAD_ON_STARTUP: bool = Field(default=True, env="RAG_PRELOAD_ON_STARTUP", description="Load the embedding model and vector store in the background after startup instead of on first use")
+    RAG_WARMUP_ON_STARTUP: bool = Field(default=True, env="RAG_WARMUP_ON_STARTUP", description="After preloading, run a dummy encode and touch each collection before /ready reports ready")
+    RAG_QUERY_WORKERS: int = Field(default=4, env="RAG_QUERY_WORKERS", ge=1, description="Threads in the dedicated pool serving RAG searches")
+    RAG_LEVEL_QUERY_TIMEOUT_SECONDS: float = Field(default=2.0, env="RAG_LEVEL_QUERY_TIMEOUT_SECONDS", gt=0, description="Per-level timeout for cross-level searches; slow levels return no results")
+    RAG_UNIFIED_COLLECTION: bool = Field(default=False, env="RAG_UNIFIED_COLLECTION", description="Store all RAG levels in one collection and search them in a single pass")
+    RAG_UNIFIED_OVERFETCH: int = Field(default=3, env="RAG_UNIFIED_OVERFETCH", ge=1, description="Over-fetch factor for single-pass cross-level searches")
+    RAG_QUERY_CACHE_MAX_ENTRIES: int = Field(default=1000, env="RAG_QUERY_CACHE_MAX_ENTRIES", ge=0, description="Cached retrieval results keyed by level, entity, query and top_k; writes invalidate the affected entity (0 disables)")
+    RAG_LEXICAL_INDEX: bool = Field(default=True, env="RAG_LEXICAL_INDEX", description="Maintain a BM25 index of all chunks under CHROMA_PERSIST_DIRECTORY for hybrid search")
+    RAG_HYBRID_CANDIDATES: int = Field(default=4, env="RAG_HYBRID_CANDIDATES", ge=1, description="Hybrid search fuses the top top_k x this many hits of the vector and BM25 rankings")
+    RAG_RRF_K: int = Field(default=60, env="RAG_RRF_K", ge=1, description="Rank offset k in reciprocal rank fusion, 1 / (k + rank)")
+    RAG_SEARCH_DIVERSIFY: bool = Field(default=True, env="RAG_SEARCH_DIVERSIFY", description="Cross-level vector searches rerank each level with MMR and drop passages repeated across levels")
+    RAG_MMR_LAMBDA: float = Field(default=0.7, env="RAG_MMR_LAMBDA", ge=0, le=1, description="MMR trade-off: 1 ranks by query similarity only, lower values favour passages unlike those already picked")
+    RAG_MMR_CANDIDATES: int = Field(default=4, env="RAG_MMR_CANDIDATES", ge=1, description="MMR picks each level's results from the top n_results x this many hits")
+    RAG_DUPLICATE_SIMILARITY: float = Field(default=0.95, env="RAG_DUPLICATE_SIMILARITY", gt=0, le=1, description="Cosine similarity above which a cross-level search hit counts as a repeat of one already picked")
+    
+    # Chunking
+    RAG_CHUNK_TOKENS: int = Field(default=200, env="RAG_CHUNK_TOKENS", ge=16, description="Approximate tokens per embedded chunk (the default model truncates at 256)")
+    RAG_CHUNK_OVERLAP_TOKENS: int = Field(default=40, env="RAG_CHUNK_OVERLAP_TOKENS", ge=0, description="Tokens repeated between consecutive chunks")
+    RAG_UPLOAD_READ_BYTES: int = Field(default=64 * 1024, env="RAG_UPLOAD_READ_BYTES", ge=1024, description="Bytes read per step when streaming uploads into the chunker")
+    
+    RAG_BULK_BATCH_SIZE: int = Field(default=100, env="RAG_BULK_BATCH_SIZE", ge=1, description="Items embedded and inserted together by POST /rag/stores/bulk")
+    
+    RAG_STATS_COUNTERS: bool = Field(default=False, env="RAG_STATS_COUNTERS", description="Serve /rag/stats from a counters table maintained on insert/delete instead of aggregating rag_stores")
+    
+    # Agent context
+    AGENT_CONTEXT_TOKEN_BUDGET: int = Field(default=1500, env="AGENT_CONTEXT_TOKEN_BUDGET", ge=0, description="Tokens of RAG passages packed into each agent's backstory across all levels")
+    AGENT_CONTEXT_CANDIDATES: int = Field(default=10, env="AGENT_CONTEXT_CANDIDATES", ge=1, description="Candidate passages retrieved per level before ranking and packing")
+    AGENT_CONTEXT_DUPLICATE_SIMILARITY: float = Field(default=0.95, env="AGENT_CONTEXT_DUPLICATE_SIMILARITY", gt=0, le=1, description="Cosine similarity above which passages count as near-identical and are kept once")
+    
+    # Background ingestion
+    RAG_INGEST_WORKERS: int = Field(default=2, env="RAG_INGEST_WORKERS", ge=1, description="Concurrent background ingestion jobs")
+    RAG_INGEST_QUEUE_SIZE: int = Field(default=100, env="RAG_INGEST_QUEUE_SIZE", ge=1, description="Maximum queued ingestion jobs before uploads are rejected")
+    RAG_INGEST_PROGRESS_INTERVAL_SECONDS: float = Field(default=1.0, env="RAG_INGEST_PROGRESS_INTERVAL_SECONDS", ge=0, description="Minimum interval between persisted/broadcast job progress updates")
+    RAG_INGEST_HEARTBEAT_SECONDS: float = Field(default=10.0, env="RAG_INGEST_HEARTBEAT_SECONDS", gt=0, description="Interval at which a process refreshes the heartbeat of its pending/running ingestion jobs")
+    RAG_INGEST_STALE_SECONDS: float = Field(default=60.0, env="RAG_INGEST_STALE_SECONDS", gt=0, description="Pending/running ingestion jobs whose heartbeat is older than this are marked failed")
+    
+    # Live log WebSocket
+    WS_SEND_QUEUE_SIZE: int = Field(default=256, env="WS_SEND_QUEUE_SIZE", ge=1, description="Frames queued per connection for its writer task before the overflow policy applies")
+    WS_OVERFLOW_POLICY: Literal["drop_oldest", "coalesce", "disconnect"] = Field(default="drop_oldest", env="WS_OVERFLOW_POLICY", description="Full send queue: drop the oldest frame, replace the queued frame of the same stream (else drop oldest), or disconnect the slow client")
+    WS_BATCH_SIZE: int = Field(default=50, env="WS_BATCH_SIZE", ge=1, description="Messages per array frame for connections that negotiate batching without a batch_size")
+    WS_BATCH_MAX_INTERVAL_MS: int = Field(default=1000, env="WS_BATCH_MAX_INTERVAL_MS", ge=1, description="Longest batch interval a /ws client may request")
+    WS_REPLAY_BUFFER_BYTES: int = Field(default=1024 * 1024, env="WS_REPLAY_BUFFER_BYTES", ge=0, description="Encoded live log messages kept per project for clients reconnecting with ?since= (0 disables replay)")
+    WS_REPLAY_MAX_PROJECTS: int = Field(default=100, env="WS_REPLAY_MAX_PROJECTS", ge=1, description="Projects with a replay buffer; the least recently active one is dropped beyond this")
+    
+    # Embeddings
+    EMBEDDING_MODEL_NAME: str = Field(default="all-MiniLM-L6-v2", env="EMBEDDING_MODEL_NAME")
+    EMBEDDING_BACKEND: Literal["torch", "int8", "onnx"] = Field(default="torch", env="EMBEDDING_BACKEND", description="Embedding backend: torch (float32), int8 (dynamically quantized torch) or onnx (ONNX Runtime)")
+    EMBEDDING_ONNX_MODEL_PATH: Optional[str] = Field(default=None, env="EMBEDDING_ONNX_MODEL_PATH", description="ONNX model file for the onnx backend, e.g. an int8 export; defaults to Chroma's bundled all-MiniLM-L6-v2")
+    EMBEDDING_PROCESS_WORKERS: int = Field(default=0, env="EMBEDDING_PROCESS_WORKERS", ge=0, description="Forked worker processes for ingestion embeddings (0 = encode in the API process); needs RAG_PRELOAD_ON_STARTUP")
+    EMBEDDING_BATCH_MAX_SIZE: int = Field(default=32, env="EMBEDDING_BATCH_MAX_SIZE", ge=1, description="Maximum number of texts encoded in one model call")
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = Field(default=5.0, env="EMBEDDING_BATCH_MAX_WAIT_MS", ge=0, description="How long to gather concurrent encode requests before flushing a batch")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = Field(default=10000, env="EMBEDDING_CACHE_MAX_ENTRIES", ge=0, description="In-memory LRU embedding cache size (0 disables)")
+    EMBEDDING_CACHE_PERSIST: bool = Field(default=False, env="EMBEDDING_CACHE_PERSIST", description="Keep a memory-mapped embedding cache under CHROMA_PERSIST_DIRECTORY")
+    EMBEDDING_CACHE_DISK_CAPACITY: int = Field(default=100000, env="EMBEDDING_CACHE_DISK_CAPACITY", ge=1, description="Number of vectors kept in the on-disk embedding cache")
+    
     # CORS
     CORS_ORIGINS: str = Field(default="http://localhost:3000", env="CORS_ORIGINS")
     
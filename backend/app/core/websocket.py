@@ -1,15 +1,32 @@
 from fastapi import WebSocket
-from typing import Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, List, Literal, Optional, Set, Tuple, Union
+from collections import OrderedDict, deque
 import json
 import asyncio
 import threading
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 import logging
 
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def encode_json(payload) -> str:
+    """Compact JSON text for a WebSocket frame, using orjson when installed"""
+    if orjson is not None:
+        # Like json.dumps, accept non-string dict keys in metadata
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
 class LogType(Enum):
     THOUGHT = "thought"
     ACTION = "action"
@@ -18,6 +35,17 @@ class LogType(Enum):
     MILESTONE = "milestone"
     STATUS = "status"
 
+# Severity of each log type, for subscriptions with a minimum severity
+SEVERITY_LEVELS = {"debug": 0, "info": 1, "notice": 2, "error": 3}
+LOG_SEVERITY = {
+    LogType.THOUGHT: SEVERITY_LEVELS["debug"],
+    LogType.ACTION: SEVERITY_LEVELS["info"],
+    LogType.STATUS: SEVERITY_LEVELS["info"],
+    LogType.RESULT: SEVERITY_LEVELS["notice"],
+    LogType.MILESTONE: SEVERITY_LEVELS["notice"],
+    LogType.ERROR: SEVERITY_LEVELS["error"],
+}
+
 class LogMessage:
     def __init__(
         self,
@@ -27,7 +55,8 @@ class LogMessage:
         crew_id: Optional[int],
         project_id: Optional[int],
         content: str,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        stream_key: Optional[str] = None
     ):
         self.type = type
         self.agent_id = agent_id
@@ -36,7 +65,22 @@ class LogMessage:
         self.project_id = project_id
         self.content = content
         self.metadata = metadata or {}
+        self.stream_key = stream_key
         self.timestamp = datetime.utcnow().isoformat()
+        # Position in the project's stream, assigned when broadcast
+        self.seq: Optional[int] = None
+    
+    @property
+    def coalesce_key(self) -> Optional[Hashable]:
+        """Messages with equal keys are successive states of one stream, so a
+        newer one may replace an older one still queued for a slow client.
+        Thoughts and status updates coalesce per agent unless the sender
+        names the stream; other messages are never replaced."""
+        if self.stream_key is not None:
+            return self.stream_key
+        if self.type in (LogType.THOUGHT, LogType.STATUS):
+            return (self.type.value, self.crew_id, self.agent_id)
+        return None
         
     def to_dict(self):
         return {
@@ -47,19 +91,370 @@ class LogMessage:
             "project_id": self.project_id,
             "content": self.content,
             "metadata": self.metadata,
-            "timestamp": self.timestamp
+            "timestamp": self.timestamp,
+            "seq": self.seq
         }
+    
+    def encode(self) -> str:
+        """The message as a JSON text frame"""
+        return encode_json(self.to_dict())
 
-class ConnectionManager:
+class SubscribeCommand(BaseModel):
+    """Filter a client sends over its socket; omitted fields do not restrict"""
+    action: Literal["subscribe"]
+    crew_ids: Optional[List[int]] = None
+    agent_ids: Optional[List[int]] = None
+    log_types: Optional[List[LogType]] = None
+    min_severity: Optional[Literal["debug", "info", "notice", "error"]] = None
+
+class Subscription:
+    """Which messages of its project a connection receives.
+    
+    With crew or agent ids, only messages of those crews or agents (either
+    matches) are delivered, so project-wide messages without a crew or agent
+    are skipped. Log types and the minimum severity narrow the types further.
+    """
+    
+    def __init__(
+        self,
+        crew_ids: Optional[Iterable[int]] = None,
+        agent_ids: Optional[Iterable[int]] = None,
+        log_types: Optional[Iterable[LogType]] = None,
+        min_severity: Optional[str] = None
+    ):
+        self.crew_ids = frozenset(crew_ids or ())
+        self.agent_ids = frozenset(agent_ids or ())
+        threshold = SEVERITY_LEVELS[min_severity] if min_severity else 0
+        self.log_types = frozenset(
+            log_type for log_type in (log_types or LogType) if LOG_SEVERITY[log_type] >= threshold
+        )
+        self.min_severity = min_severity
+    
+    @property
+    def scoped(self) -> bool:
+        """Whether delivery is limited to certain crews or agents"""
+        return bool(self.crew_ids or self.agent_ids)
+    
+    def matches(self, message: LogMessage) -> bool:
+        if message.type not in self.log_types:
+            return False
+        return not self.scoped or message.crew_id in self.crew_ids or message.agent_id in self.agent_ids
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "crew_ids": sorted(self.crew_ids),
+            "agent_ids": sorted(self.agent_ids),
+            "log_types": [log_type.value for log_type in LogType if log_type in self.log_types],
+            "min_severity": self.min_severity
+        }
+
+class SubscriptionIndex:
+    """A project's connections indexed by their subscription, so a broadcast
+    only visits the connections whose filter the message passes"""
+    
     def __init__(self):
+        self.unscoped: Set["ClientConnection"] = set()
+        self.by_crew: Dict[int, Set["ClientConnection"]] = {}
+        self.by_agent: Dict[int, Set["ClientConnection"]] = {}
+        self.by_type: Dict[LogType, Set["ClientConnection"]] = {log_type: set() for log_type in LogType}
+    
+    def add(self, client: "ClientConnection"):
+        subscription = client.subscription
+        if not subscription.scoped:
+            self.unscoped.add(client)
+        for crew_id in subscription.crew_ids:
+            self.by_crew.setdefault(crew_id, set()).add(client)
+        for agent_id in subscription.agent_ids:
+            self.by_agent.setdefault(agent_id, set()).add(client)
+        for log_type in subscription.log_types:
+            self.by_type[log_type].add(client)
+    
+    def remove(self, client: "ClientConnection"):
+        subscription = client.subscription
+        self.unscoped.discard(client)
+        for index, entity_ids in ((self.by_crew, subscription.crew_ids), (self.by_agent, subscription.agent_ids)):
+            for entity_id in entity_ids:
+                subscribers = index.get(entity_id)
+                if subscribers is not None:
+                    subscribers.discard(client)
+                    if not subscribers:
+                        del index[entity_id]
+        for log_type in subscription.log_types:
+            self.by_type[log_type].discard(client)
+    
+    def match(self, message: LogMessage) -> Set["ClientConnection"]:
+        candidates = self.by_type[message.type]
+        if not candidates:
+            return set()
+        by_crew = self.by_crew.get(message.crew_id) if message.crew_id is not None else None
+        by_agent = self.by_agent.get(message.agent_id) if message.agent_id is not None else None
+        if by_crew or by_agent:
+            return candidates & self.unscoped.union(by_crew or (), by_agent or ())
+        return candidates & self.unscoped
+
+def parse_since(value: str) -> Union[int, datetime]:
+    """A ``since`` resume point: a sequence id, or an ISO timestamp (naive
+    values are taken as UTC, like message timestamps)"""
+    if value.isdigit():
+        return int(value)
+    since = datetime.fromisoformat(value)
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+class ReplayBuffer:
+    """A project's most recent encoded messages, bounded by their total size"""
+    
+    def __init__(self, max_bytes: int, evicted_seq: int = 0, evicted_at: Optional[datetime] = None):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: Deque[Tuple[int, str, str]] = deque()
+        # Newest message that no longer fits, to tell whether a replay is complete
+        self.evicted_seq = evicted_seq
+        self.evicted_at = evicted_at
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def append(self, seq: int, timestamp: str, text: str):
+        self._entries.append((seq, timestamp, text))
+        self.size += len(text)
+        while self.size > self.max_bytes and self._entries:
+            self.evicted_seq, evicted_timestamp, evicted_text = self._entries.popleft()
+            self.evicted_at = datetime.fromisoformat(evicted_timestamp)
+            self.size -= len(evicted_text)
+    
+    def since(self, since: Union[int, datetime]) -> Tuple[List[str], bool]:
+        """Messages after a sequence id or timestamp, and whether none of
+        those have been evicted"""
+        if isinstance(since, int):
+            return [text for seq, _, text in self._entries if seq > since], since >= self.evicted_seq
+        return (
+            [text for _, timestamp, text in self._entries if datetime.fromisoformat(timestamp) > since],
+            self.evicted_at is None or since >= self.evicted_at
+        )
+
+class ClientConnection:
+    """One WebSocket subscriber with its own bounded send queue.
+    
+    Broadcasters only enqueue pre-encoded frames and never wait on the
+    network; a writer task drains the queue onto the socket, so a slow client
+    delays nobody else. When the queue is full the overflow policy decides
+    what gives way: ``drop_oldest`` discards the oldest queued frame,
+    ``coalesce`` replaces the queued frame of the same stream (falling back to
+    dropping the oldest) and ``disconnect`` closes the client.
+    
+    With a batch interval the writer instead collects frames for up to that
+    long, or until ``batch_size`` are queued, and sends them together as one
+    JSON array frame.
+    
+    ``preamble`` frames (text, message count) are sent before anything queued.
+    """
+    
+    def __init__(
+        self,
+        websocket: WebSocket,
+        project_id: int,
+        user_id: Optional[int],
+        max_queue: int,
+        overflow_policy: str,
+        on_close: Callable[[WebSocket], None],
+        batch_interval_ms: Optional[int] = None,
+        batch_size: int = 1,
+        preamble: Optional[List[Tuple[str, int]]] = None
+    ):
+        self.websocket = websocket
+        self.project_id = project_id
+        self.user_id = user_id
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
+        self.batch_interval_ms = batch_interval_ms
+        self.batch_size = batch_size if batch_interval_ms else 1
+        self.subscription = Subscription()
+        self.connected_at = datetime.utcnow()
+        self.sent = 0
+        self.frames = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.closed = False
+        self._overflowed = False
+        self._queue: Deque[Tuple[Optional[Hashable], str]] = deque()
+        # Broadcasts may come from crew threads running their own event loop
+        self._lock = threading.Lock()
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._on_close = on_close
+        self._preamble = list(preamble or ())
+        self._writer = self._loop.create_task(self._write())
+    
+    def enqueue(self, text: str, key: Optional[Hashable] = None) -> bool:
+        """Queue a frame for the writer; returns False if it was not queued"""
+        with self._lock:
+            if self.closed or self._overflowed:
+                return False
+            if len(self._queue) >= self.max_queue:
+                if self.overflow_policy == "disconnect":
+                    self._overflowed = True
+                    self.dropped += 1
+                    self._wake()
+                    return False
+                if self.overflow_policy == "coalesce" and key is not None and self._remove_queued(key):
+                    self.coalesced += 1
+                else:
+                    self._queue.popleft()
+                    self.dropped += 1
+            self._queue.append((key, text))
+            self.max_depth = max(self.max_depth, len(self._queue))
+        self._wake()
+        return True
+    
+    def _remove_queued(self, key: Hashable) -> bool:
+        """Drop the newest queued frame of a stream"""
+        for index in range(len(self._queue) - 1, -1, -1):
+            if self._queue[index][0] == key:
+                del self._queue[index]
+                return True
+        return False
+    
+    def _wake(self):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wakeup.set()
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+    
+    async def _write(self):
+        try:
+            for text, count in self._preamble:
+                await self.websocket.send_text(text)
+                self.sent += count
+                self.frames += 1
+            self._preamble = []
+            while True:
+                with self._lock:
+                    overflowed, pending = self._overflowed, len(self._queue)
+                if overflowed:
+                    logger.warning(
+                        f"Disconnecting slow WebSocket client for project {self.project_id}, "
+                        f"user {self.user_id}: send queue full"
+                    )
+                    await self.websocket.close(code=1013, reason="Client too slow")
+                    break
+                if not pending:
+                    await self._wakeup.wait()
+                    self._wakeup.clear()
+                    continue
+                
+                if self.batch_interval_ms:
+                    await self._wait_for_batch()
+                with self._lock:
+                    texts = [self._queue.popleft()[1] for _ in range(min(self.batch_size, len(self._queue)))]
+                if not texts:
+                    continue
+                # Frames are already JSON, so a batch is just their concatenation
+                await self.websocket.send_text("[" + ",".join(texts) + "]" if self.batch_interval_ms else texts[0])
+                self.sent += len(texts)
+                self.frames += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Connection might be closed - clean it up
+            logger.debug(f"Failed to send message to WebSocket: {e}")
+        self._on_close(self.websocket)
+    
+    async def _wait_for_batch(self):
+        """Wait until a full batch is queued or the batch interval is over"""
+        deadline = self._loop.time() + self.batch_interval_ms / 1000
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                if self._overflowed or len(self._queue) >= self.batch_size:
+                    return
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return
+    
+    def stop(self):
+        """Stop the writer, discarding anything still queued"""
+        with self._lock:
+            self.closed = True
+            self._queue.clear()
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+    
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._queue)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "project_id": self.project_id,
+            "user_id": self.user_id,
+            "connected_at": self.connected_at.isoformat(),
+            "subscription": self.subscription.to_dict(),
+            "overflow_policy": self.overflow_policy,
+            "batch_interval_ms": self.batch_interval_ms,
+            "batch_size": self.batch_size,
+            "queue_size": self.max_queue,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_depth,
+            "sent": self.sent,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced
+        }
+
+class ConnectionManager:
+    def __init__(
+        self,
+        max_queue: Optional[int] = None,
+        overflow_policy: Optional[str] = None,
+        replay_buffer_bytes: Optional[int] = None
+    ):
         # Store connections by project_id for targeted broadcasts
         self.active_connections: Dict[int, List[WebSocket]] = {}
-        self.connection_metadata: Dict[WebSocket, Dict] = {}
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.subscriptions: Dict[int, SubscriptionIndex] = {}
         # Thread safety
         self._lock = threading.RLock()
         self._max_connections_per_project = 100  # Prevent DoS
+        self.max_queue = max_queue or settings.WS_SEND_QUEUE_SIZE
+        self.overflow_policy = overflow_policy or settings.WS_OVERFLOW_POLICY
+        self.replay_buffer_bytes = settings.WS_REPLAY_BUFFER_BYTES if replay_buffer_bytes is None else replay_buffer_bytes
+        # Last sequence id per project, and replay buffers, least recently active first
+        self._sequences: Dict[int, int] = {}
+        self._replay: "OrderedDict[int, ReplayBuffer]" = OrderedDict()
+        
+    async def connect(
+        self,
+        websocket: WebSocket,
+        project_id: int,
+        user_id: Optional[int] = None,
+        batch_interval_ms: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        since: Optional[Union[int, datetime]] = None
+    ):
+        """Accept a live log subscriber.
         
-    async def connect(self, websocket: WebSocket, project_id: int, user_id: Optional[int] = None):
+        ``batch_interval_ms`` switches the connection to batching: messages
+        arrive as JSON array frames, flushed every ``batch_interval_ms`` or
+        once ``batch_size`` messages (default WS_BATCH_SIZE) are waiting.
+        
+        With ``since`` (a sequence id or timestamp) the buffered messages
+        after it are replayed in one array frame right after the connection
+        confirmation, before any live message. A sequence id beyond the
+        project's last one comes from before a server restart, so everything
+        buffered is replayed.
+        """
         try:
             await websocket.accept()
             
@@ -71,33 +466,61 @@ class ConnectionManager:
                     logger.warning(f"Connection limit exceeded for project {project_id}")
                     return
                 
-                # Store connection metadata
-                self.connection_metadata[websocket] = {
-                    "project_id": project_id,
-                    "user_id": user_id,
-                    "connected_at": datetime.utcnow()
-                }
+                # Snapshot the replay and register the connection under the
+                # same lock as broadcasts, so no message is missed or repeated
+                last_seq = self._sequences.get(project_id, 0)
+                replay, replay_complete = [], True
+                if since is not None:
+                    if isinstance(since, int) and since > last_seq:
+                        since = 0
+                    buffer = self._replay.get(project_id)
+                    if buffer is not None:
+                        replay, replay_complete = buffer.since(since)
+                    else:
+                        replay_complete = last_seq == 0 or (isinstance(since, int) and since >= last_seq)
                 
-                # Add to project connections
-                if project_id not in self.active_connections:
-                    self.active_connections[project_id] = []
-                self.active_connections[project_id].append(websocket)
-                
-                client_count = len(self.active_connections[project_id])
-            
-            # Send connection confirmation (outside lock to avoid deadlock)
-            await self.send_personal_message(
-                websocket,
-                LogMessage(
+                batched = bool(batch_interval_ms)
+                # Without batching every message is its own frame
+                batch_size = min(batch_size or settings.WS_BATCH_SIZE, self.max_queue) if batched else 1
+                confirmation = LogMessage(
                     type=LogType.STATUS,
                     agent_id=None,
                     agent_name="System",
                     crew_id=None,
                     project_id=project_id,
                     content="Connected to live log stream",
-                    metadata={"connected_clients": client_count}
+                    metadata={
+                        "connected_clients": current_connections + 1,
+                        "batch": {"interval_ms": batch_interval_ms, "max_messages": batch_size} if batched else None,
+                        "last_seq": last_seq,
+                        "replay": {"messages": len(replay), "complete": replay_complete} if since is not None else None
+                    }
+                ).encode()
+                if batched:
+                    preamble = [("[" + ",".join([confirmation, *replay]) + "]", len(replay) + 1)]
+                else:
+                    preamble = [(confirmation, 1)] + ([("[" + ",".join(replay) + "]", len(replay))] if replay else [])
+                
+                # Start the connection's writer
+                client = ClientConnection(
+                    websocket,
+                    project_id,
+                    user_id,
+                    self.max_queue,
+                    self.overflow_policy,
+                    on_close=self.disconnect,
+                    batch_interval_ms=batch_interval_ms,
+                    batch_size=batch_size,
+                    preamble=preamble
                 )
-            )
+                self.clients[websocket] = client
+                self.subscriptions.setdefault(project_id, SubscriptionIndex()).add(client)
+                
+                # Add to project connections
+                if project_id not in self.active_connections:
+                    self.active_connections[project_id] = []
+                self.active_connections[project_id].append(websocket)
+            
             logger.info(f"WebSocket connected for project {project_id}, user {user_id}")
             
         except Exception as e:
@@ -109,10 +532,9 @@ class ConnectionManager:
         
     def disconnect(self, websocket: WebSocket):
         with self._lock:
-            metadata = self.connection_metadata.get(websocket)
-            if metadata:
-                project_id = metadata["project_id"]
-                user_id = metadata.get("user_id")
+            client = self.clients.pop(websocket, None)
+            if client:
+                project_id = client.project_id
                 
                 # Remove from project connections
                 if project_id in self.active_connections:
@@ -124,40 +546,133 @@ class ConnectionManager:
                         # WebSocket was already removed, which is fine
                         pass
                 
-                # Remove metadata
-                del self.connection_metadata[websocket]
-                logger.info(f"WebSocket disconnected for project {project_id}, user {user_id}")
+                index = self.subscriptions.get(project_id)
+                if index is not None:
+                    index.remove(client)
+                    if project_id not in self.active_connections:
+                        del self.subscriptions[project_id]
+                
+                client.stop()
+                logger.info(f"WebSocket disconnected for project {project_id}, user {client.user_id}")
             else:
-                logger.warning("Attempted to disconnect unknown WebSocket")
+                logger.debug("Attempted to disconnect unknown WebSocket")
             
     async def send_personal_message(self, websocket: WebSocket, message: LogMessage):
+        """Queue a message for one connection"""
+        with self._lock:
+            client = self.clients.get(websocket)
+        if client:
+            client.enqueue(message.encode(), message.coalesce_key)
+            
+    async def handle_message(self, websocket: WebSocket, text: str):
+        """Apply a command sent by the client.
+        
+        ``{"action": "subscribe", "crew_ids": [...], "agent_ids": [...],
+        "log_types": [...], "min_severity": "notice"}`` replaces the
+        connection's filter; omitted fields do not restrict. The client gets
+        the resulting subscription back, or an error message.
+        """
+        with self._lock:
+            client = self.clients.get(websocket)
+        if client is None:
+            return
+        
         try:
-            await websocket.send_json(message.to_dict())
-        except Exception as e:
-            # Connection might be closed - clean it up
-            logger.debug(f"Failed to send message to WebSocket: {e}")
-            self.disconnect(websocket)
+            command = SubscribeCommand.model_validate_json(text)
+        except ValidationError as e:
+            errors = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or 'message'}: {error['msg']}" for error in e.errors()
+            )
+            await self.send_personal_message(websocket, LogMessage(
+                type=LogType.ERROR,
+                agent_id=None,
+                agent_name="System",
+                crew_id=None,
+                project_id=client.project_id,
+                content=f"Invalid command: {errors}"
+            ))
+            return
+        
+        self.subscribe(websocket, Subscription(
+            crew_ids=command.crew_ids,
+            agent_ids=command.agent_ids,
+            log_types=command.log_types,
+            min_severity=command.min_severity
+        ))
+        await self.send_personal_message(websocket, LogMessage(
+            type=LogType.STATUS,
+            agent_id=None,
+            agent_name="System",
+            crew_id=None,
+            project_id=client.project_id,
+            content="Subscription updated",
+            metadata={"subscription": client.subscription.to_dict()}
+        ))
+    
+    def subscribe(self, websocket: WebSocket, subscription: Subscription):
+        """Replace a connection's filter and re-index it"""
+        with self._lock:
+            client = self.clients.get(websocket)
+            if client is None:
+                return
+            index = self.subscriptions[client.project_id]
+            index.remove(client)
+            client.subscription = subscription
+            index.add(client)
             
     async def broadcast_to_project(self, project_id: int, message: LogMessage):
-        """Broadcast a message to all connections watching a specific project"""
-        # Get connections safely
-        with self._lock:
-            connections = self.active_connections.get(project_id, []).copy()
+        """Broadcast a message to the connections of a project whose
+        subscription it matches.
         
-        if connections:
-            # Create tasks for all connections
-            tasks = []
-            for connection in connections:
-                tasks.append(self.send_personal_message(connection, message))
+        The message is encoded once and the same text frame is queued for
+        every connection; delivery happens on the connections' writer tasks,
+        so this never waits on a slow client.
+        """
+        # Number, encode and buffer the message and pick its connections in
+        # one step, so a connection replaying the buffer sees each message once
+        with self._lock:
+            message.seq = self._sequences.get(project_id, 0) + 1
+            try:
+                text = message.encode()
+            except TypeError as e:
+                message.seq = None
+                logger.error(f"Cannot encode {message.type.value} message for project {project_id}: {e}")
+                return
+            self._sequences[project_id] = message.seq
+            self._remember(project_id, message, text)
             
-            # Send to all connections concurrently
-            if tasks:
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # Log any exceptions (for debugging)
-                failed_count = sum(1 for result in results if isinstance(result, Exception))
-                if failed_count > 0:
-                    logger.debug(f"Failed to broadcast to {failed_count}/{len(tasks)} connections for project {project_id}")
+            index = self.subscriptions.get(project_id)
+            clients = index.match(message) if index is not None else ()
+        
+        if clients:
+            key = message.coalesce_key
+            not_queued = sum(1 for client in clients if not client.enqueue(text, key))
+            if not_queued:
+                logger.debug(f"Failed to queue broadcast for {not_queued}/{len(clients)} connections for project {project_id}")
+    
+    def _remember(self, project_id: int, message: LogMessage, text: str):
+        """Add a broadcast to the project's replay buffer"""
+        if not self.replay_buffer_bytes:
+            return
+        buffer = self._replay.get(project_id)
+        if buffer is None:
+            # Earlier messages of the project, if any, were in a dropped buffer
+            buffer = self._replay[project_id] = ReplayBuffer(
+                self.replay_buffer_bytes,
+                evicted_seq=message.seq - 1,
+                evicted_at=datetime.fromisoformat(message.timestamp) if message.seq > 1 else None
+            )
+            if len(self._replay) > settings.WS_REPLAY_MAX_PROJECTS:
+                self._replay.popitem(last=False)
+        else:
+            self._replay.move_to_end(project_id)
+        buffer.append(message.seq, message.timestamp, text)
+    
+    def stats(self, project_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Send queue depth and drop counts per connection"""
+        with self._lock:
+            clients = list(self.clients.values())
+        return [client.stats() for client in clients if project_id is None or client.project_id == project_id]
                 
     async def broadcast_agent_thought(
         self,
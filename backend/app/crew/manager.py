@@ -3,7 +3,8 @@ from crewai.tools import BaseTool
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session, joinedload
 from models.schemas import Crew as CrewModel, Agent as AgentModel, Task as TaskModel
-from app.rag.retriever import HierarchicalRAG
+from app.rag.retriever import HierarchicalRAG, shared_retriever
+from app.rag.context_assembler import AssembledContext, ContextAssembler
 from app.core.websocket import ws_manager, LogType
 from app.crew.live_agent import LiveLogAgent
 import json
@@ -21,6 +22,8 @@ class CrewActivity:
         self.last_activity = time.time()
         self.created_at = datetime.utcnow()
         self.task_count = 0
+        # Agent id -> RAG context token usage
+        self.context_usage: Dict[int, Dict[str, Any]] = {}
     
     def update_activity(self):
         self.last_activity = time.time()
@@ -31,9 +34,18 @@ class CrewActivity:
 class CrewAIManager:
     """Manager class for CrewAI integration with hierarchical RAG"""
     
-    def __init__(self, db: Session, max_active_crews: int = 10, cleanup_interval: int = 300):
+    def __init__(
+        self,
+        db: Session,
+        max_active_crews: int = 10,
+        cleanup_interval: int = 300,
+        rag_retriever: Optional[HierarchicalRAG] = None
+    ):
         self.db = db
-        self.rag_retriever = HierarchicalRAG()
+        # Without an explicit retriever the process-wide one is taken on first
+        # use, so building a manager never waits for the model to load
+        self.rag_retriever = rag_retriever
+        self._context_assembler: Optional[ContextAssembler] = None
         self.active_crews: Dict[int, CrewActivity] = {}
         self.max_active_crews = max_active_crews
         self.cleanup_interval = cleanup_interval
@@ -55,16 +67,23 @@ class CrewAIManager:
         if not crew_model:
             raise ValueError(f"Crew with ID {crew_id} not found")
         
-        # Get project-level RAG context
-        project_context = await self.rag_retriever.get_project_context(crew_model.project_id)
-        
-        # Get crew-level RAG context
-        crew_context = await self.rag_retriever.get_crew_context(crew_id)
-        
-        # Create CrewAI agents
+        # Create CrewAI agents, each with its own budgeted RAG context
         agents = []
+        context_usage = {}
+        context_assembler = await self._get_context_assembler()
         for agent_model in crew_model.agents:
-            agent = await self._create_agent_from_db(agent_model, project_context, crew_context)
+            context = await context_assembler.assemble(
+                query=". ".join(part for part in (agent_model.role, agent_model.goal) if part),
+                project_id=crew_model.project_id,
+                crew_id=crew_id,
+                agent_id=agent_model.id
+            )
+            context_usage[agent_model.id] = context.usage()
+            logger.info(
+                f"RAG context for agent {agent_model.id}: {context.tokens_used}/{context.budget} tokens "
+                + ", ".join(f"{level}={tokens}" for level, tokens in context.tokens_by_level.items())
+            )
+            agent = await self._create_agent_from_db(agent_model, context)
             agents.append(agent)
         
         # Create CrewAI crew
@@ -78,6 +97,7 @@ class CrewAIManager:
         
         # Track crew activity
         activity = CrewActivity(crew)
+        activity.context_usage = context_usage
         self.active_crews[crew_id] = activity
         
         # Ensure we don't exceed capacity
@@ -85,28 +105,21 @@ class CrewAIManager:
         
         return crew
     
-    async def _create_agent_from_db(self, agent_model: AgentModel, project_context: str, crew_context: str) -> Agent:
+    async def _get_context_assembler(self) -> ContextAssembler:
+        """Context assembler over the shared retriever, loaded off the event loop"""
+        if self._context_assembler is None:
+            if self.rag_retriever is None:
+                self.rag_retriever = await asyncio.to_thread(shared_retriever.get)
+            self._context_assembler = ContextAssembler(self.rag_retriever)
+        return self._context_assembler
+    
+    async def _create_agent_from_db(self, agent_model: AgentModel, context: AssembledContext) -> Agent:
         """Create a CrewAI Agent from database model"""
-        # Get agent-specific RAG context
-        agent_context = await self.rag_retriever.get_agent_context(agent_model.id)
-        
-        # Combine all context levels
-        full_context = f"""
-PROJECT CONTEXT:
-{project_context}
-
-CREW CONTEXT: 
-{crew_context}
-
-AGENT CONTEXT:
-{agent_context}
-        """
-        
         # Create LiveLogAgent with hierarchical context
         agent = LiveLogAgent(
             role=agent_model.role,
             goal=agent_model.goal,
-            backstory=f"{agent_model.backstory}\n\nCONTEXT:\n{full_context}",
+            backstory=f"{agent_model.backstory}\n\nCONTEXT:\n{context.render()}",
             tools=self._load_agent_tools(agent_model.tools),
             llm=self._get_agent_llm(agent_model.llm_config),
             verbose=True,
@@ -332,7 +345,8 @@ AGENT CONTEXT:
                 "last_activity": activity.last_activity,
                 "created_at": activity.created_at.isoformat(),
                 "task_count": activity.task_count,
-                "is_inactive": activity.is_inactive()
+                "is_inactive": activity.is_inactive(),
+                "context_usage": activity.context_usage
             }
             for crew_id, activity in self.active_crews.items()
         }
\ No newline at end of file
@@ -0,0 +1,213 @@
+from typing import List, Optional, Tuple
+import itertools
+import re
+
+# Words with their trailing whitespace, so chunks can be re-joined verbatim
+_WORD = re.compile(r"\S+\s*")
+# Rough stand-in for word-piece pre-tokenization: runs of word characters
+# and individual punctuation marks each count as at least one token
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+# Characters one estimated token may stand for before a streamed window is
+# cut anyway; a long run of word characters otherwise counts as one token
+_MAX_TOKEN_CHARS = 32
+
+MARKDOWN_TYPES = {".md", "md", ".markdown", "markdown"}
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate that tracks the embedding tokenizer closely"""
+    return len(_PIECE.findall(text))
+
+def chunk_text(
+    text: str,
+    file_type: Optional[str] = None,
+    chunk_tokens: int = 200,
+    overlap_tokens: int = 40
+) -> List[str]:
+    """Split text into overlapping, token-bounded chunks for embedding.
+
+    Markdown is first split at headings and every chunk is prefixed with its
+    heading path, so a chunk keeps its context once retrieved on its own.
+    Within a section, chunks prefer to end on paragraph or sentence breaks.
+    """
+    chunker = StreamingChunker(file_type, chunk_tokens, overlap_tokens)
+    return chunker.feed(text, final=True)
+
+class StreamingChunker:
+    """Incremental form of ``chunk_text`` for text that arrives in pieces.
+
+    ``feed`` buffers text and emits chunks once roughly ``window_tokens`` have
+    accumulated, cutting the buffer at the last paragraph or line break (or,
+    without any whitespace, hard at the window size) so memory stays bounded
+    regardless of document size. Markdown heading and code-fence state
+    carries across windows, and the last ``overlap_tokens`` of a window lead
+    the next one when it continues the same section, as in ``chunk_text``.
+    """
+
+    def __init__(
+        self,
+        file_type: Optional[str] = None,
+        chunk_tokens: int = 200,
+        overlap_tokens: int = 40,
+        window_tokens: Optional[int] = None
+    ):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.markdown = bool(file_type) and file_type.lower() in MARKDOWN_TYPES
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.window_tokens = window_tokens or chunk_tokens * 8
+        self._window_chars = self.window_tokens * _MAX_TOKEN_CHARS
+        self._state = _MarkdownState()
+        self._buffer = ""
+        # Tail of the previous window, repeated at the start of the next
+        self._carry = ""
+
+    def feed(self, text: str, final: bool = False) -> List[str]:
+        """Add text; return the chunks that are complete so far"""
+        self._buffer += text
+        if final:
+            head, self._buffer = self._buffer, ""
+            return self._chunk(head, final=True)
+
+        chunks = []
+        while len(self._buffer) >= self._window_chars or estimate_tokens(self._buffer) >= self.window_tokens:
+            cut = self._cut_point(self._buffer)
+            head, self._buffer = self._buffer[:cut], self._buffer[cut:]
+            chunks.extend(self._chunk(head))
+        return chunks
+
+    def finish(self) -> List[str]:
+        """Flush whatever remains in the buffer"""
+        return self.feed("", final=True)
+
+    def _cut_point(self, buffer: str) -> int:
+        for separator in ("\n\n", "\n"):
+            cut = buffer.rfind(separator)
+            if cut > 0:
+                return cut + len(separator)
+        # No line break at all: cut at whitespace so no word is split
+        match = None
+        for match in re.finditer(r"\s+", buffer):
+            pass
+        if match:
+            return match.end()
+        # One unbroken word: cut it after a window's worth of tokens
+        last = next(itertools.islice(_PIECE.finditer(buffer), self.window_tokens - 1, None), None)
+        return min(last.end() if last else len(buffer), self._window_chars)
+
+    def _chunk(self, text: str, final: bool = False) -> List[str]:
+        carry, self._carry = self._carry, ""
+        separator = text[len(text.rstrip()):]
+        if self.markdown:
+            first_line = next((line for line in text.splitlines() if line.strip()), "")
+            continues = self._state.in_fence or not _HEADING.match(first_line)
+            sections = markdown_sections(text, self._state)
+        else:
+            text = text.strip()
+            continues = True
+            sections = [("", text)] if text else []
+        if carry and continues and sections:
+            heading, body = sections[0]
+            sections[0] = (heading, carry + body)
+
+        chunks = []
+        for heading, body in sections:
+            prefix = f"{heading}\n\n" if heading else ""
+            budget = max(self.chunk_tokens - estimate_tokens(prefix), self.chunk_tokens // 2)
+            overlap = min(self.overlap_tokens, budget - 1)
+            pieces = split_by_tokens(body, budget, overlap)
+            chunks.extend(prefix + piece for piece in pieces)
+            if pieces and not final:
+                self._carry = _overlap_tail(pieces[-1], overlap) + separator
+        return chunks
+
+class _MarkdownState:
+    """Heading stack and fence flag carried between streamed windows"""
+
+    def __init__(self):
+        self.headings: List[Tuple[int, str]] = []
+        self.in_fence = False
+
+def markdown_sections(text: str, state: Optional[_MarkdownState] = None) -> List[Tuple[str, str]]:
+    """Split markdown into (heading path, body) sections.
+
+    Headings inside fenced code blocks are ignored. Sections without body
+    text are dropped; their heading still appears in child heading paths.
+    """
+    state = state or _MarkdownState()
+    sections = []
+    body: List[str] = []
+
+    def flush():
+        content = "\n".join(body).strip()
+        if content:
+            sections.append((" > ".join(title for _, title in state.headings), content))
+        body.clear()
+
+    for line in text.splitlines():
+        if _FENCE.match(line):
+            state.in_fence = not state.in_fence
+        match = None if state.in_fence else _HEADING.match(line)
+        if match:
+            flush()
+            depth = len(match.group(1))
+            state.headings = [(d, title) for d, title in state.headings if d < depth]
+            state.headings.append((depth, match.group(2)))
+        else:
+            body.append(line)
+    flush()
+    return sections
+
+def split_by_tokens(text: str, budget: int, overlap: int) -> List[str]:
+    """Greedy token-window split with overlap between consecutive windows"""
+    words = _WORD.findall(text)
+    costs = [max(1, estimate_tokens(word)) for word in words]
+    chunks = []
+    start = 0
+
+    while start < len(words):
+        end = start
+        total = 0
+        while end < len(words) and (total + costs[end] <= budget or end == start):
+            total += costs[end]
+            end += 1
+
+        if end < len(words):
+            end = _preferred_break(words, start, end)
+
+        chunks.append("".join(words[start:end]).strip())
+        if end >= len(words):
+            break
+
+        # Step back so the next window repeats roughly `overlap` tokens
+        back = end
+        carried = 0
+        while back - 1 > start and carried + costs[back - 1] <= overlap:
+            back -= 1
+            carried += costs[back]
+        start = back
+
+    return chunks
+
+def _overlap_tail(text: str, overlap: int) -> str:
+    """Trailing words of a chunk worth at most ``overlap`` tokens, never the
+    whole chunk"""
+    words = _WORD.findall(text)
+    back = len(words)
+    carried = 0
+    while back - 1 > 0 and carried + max(1, estimate_tokens(words[back - 1])) <= overlap:
+        back -= 1
+        carried += max(1, estimate_tokens(words[back]))
+    return "".join(words[back:]).rstrip() if back < len(words) else ""
+
+def _preferred_break(words: List[str], start: int, end: int) -> int:
+    """Move a window end back to a paragraph, then sentence, boundary if one
+    falls in the back half of the window"""
+    floor = start + (end - start) // 2
+    for boundary in (lambda w: "\n\n" in w, lambda w: w.rstrip().endswith((".", "!", "?"))):
+        for k in range(end - 1, floor, -1):
+            if boundary(words[k]):
+                return k + 1
+    return end
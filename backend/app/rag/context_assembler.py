@@ -0,0 +1,122 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+
+from models.schemas import RAGLevel
+from app.core.config import settings
+from app.rag.chunking import estimate_tokens
+from app.rag.diversity import mmr_select
+
+logger = logging.getLogger(__name__)
+
+# Section order in the rendered context, broadest level first
+LEVEL_ORDER = (RAGLevel.PROJECT, RAGLevel.CREW, RAGLevel.AGENT)
+
+class AssembledContext:
+    """Passages selected for one agent and the tokens they cost per level"""
+
+    def __init__(self, passages: List[Dict[str, Any]], budget: int, candidates: int, duplicates: int, over_budget: int):
+        self.passages = passages
+        self.budget = budget
+        self.candidates = candidates
+        self.duplicates = duplicates
+        self.over_budget = over_budget
+        self.tokens_by_level = {level.value: 0 for level in LEVEL_ORDER}
+        for passage in passages:
+            self.tokens_by_level[passage["level"]] += passage["tokens"]
+
+    @property
+    def tokens_used(self) -> int:
+        return sum(self.tokens_by_level.values())
+
+    def render(self) -> str:
+        """Context sections in project -> crew -> agent order, best passages first"""
+        sections = []
+        for level in LEVEL_ORDER:
+            texts = [passage["text"] for passage in self.passages if passage["level"] == level.value]
+            body = "\n\n".join(texts) if texts else f"No {level.value} context available."
+            sections.append(f"{level.value.upper()} CONTEXT:\n{body}")
+        return "\n\n".join(sections)
+
+    def usage(self) -> Dict[str, Any]:
+        """Token accounting reported for the agent"""
+        return {
+            "budget": self.budget,
+            "tokens_used": self.tokens_used,
+            "tokens_by_level": dict(self.tokens_by_level),
+            "passages": len(self.passages),
+            "candidates": self.candidates,
+            "dropped_duplicates": self.duplicates,
+            "dropped_over_budget": self.over_budget
+        }
+
+class ContextAssembler:
+    """Builds an agent's RAG context under a token budget.
+
+    Candidate passages from the project, crew and agent levels are ranked by
+    similarity to the agent's focus (role and goal), near-identical passages
+    are kept only once across levels, and the best remaining passages are
+    packed greedily until the budget is spent.
+    """
+
+    def __init__(
+        self,
+        rag_retriever,
+        token_budget: Optional[int] = None,
+        candidates_per_level: Optional[int] = None,
+        duplicate_similarity: Optional[float] = None
+    ):
+        self.rag_retriever = rag_retriever
+        self.token_budget = settings.AGENT_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+        self.candidates_per_level = candidates_per_level or settings.AGENT_CONTEXT_CANDIDATES
+        self.duplicate_similarity = duplicate_similarity or settings.AGENT_CONTEXT_DUPLICATE_SIMILARITY
+
+    async def assemble(self, query: str, project_id: Optional[int], crew_id: Optional[int], agent_id: Optional[int]) -> AssembledContext:
+        entities = [
+            (level, entity_id)
+            for level, entity_id in zip(LEVEL_ORDER, (project_id, crew_id, agent_id))
+            if entity_id
+        ]
+        level_passages = await asyncio.gather(*(
+            self.rag_retriever.retrieve_passages(level, entity_id, query, self.candidates_per_level)
+            for level, entity_id in entities
+        ))
+        candidates = [passage for passages in level_passages for passage in passages]
+        return self.pack(candidates)
+
+    def pack(self, candidates: List[Dict[str, Any]]) -> AssembledContext:
+        """Rank, dedupe and pack candidate passages into the budget"""
+        # Best first; on equal scores prefer the more specific level
+        specificity = {level.value: index for index, level in enumerate(LEVEL_ORDER)}
+        ranked = sorted(candidates, key=lambda p: (-p["score"], -specificity[p["level"]]))
+
+        # Repeated text is dropped first, then near-identical embeddings; with
+        # lambda_mult=1 the MMR pass keeps the ranking and only removes duplicates
+        kept_texts = set()
+        unique = []
+        for passage in ranked:
+            normalized = " ".join(passage["text"].split()).lower()
+            if normalized not in kept_texts:
+                kept_texts.add(normalized)
+                unique.append(passage)
+        embedded = [passage for passage in unique if passage.get("embedding") is not None]
+        distinct = {
+            id(passage)
+            for passage in mmr_select(embedded, len(embedded), lambda_mult=1.0, duplicate_similarity=self.duplicate_similarity)
+        }
+        unique = [passage for passage in unique if passage.get("embedding") is None or id(passage) in distinct]
+        duplicates = len(ranked) - len(unique)
+
+        selected: List[Dict[str, Any]] = []
+        over_budget = used = 0
+        for passage in unique:
+            tokens = estimate_tokens(passage["text"])
+            if used + tokens > self.token_budget:
+                # A smaller passage further down may still fit
+                over_budget += 1
+                continue
+
+            used += tokens
+            selected.append({**passage, "tokens": tokens})
+
+        return AssembledContext(selected, self.token_budget, len(candidates), duplicates, over_budget)
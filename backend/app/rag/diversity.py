@@ -0,0 +1,49 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+def mmr_select(
+    passages: List[Dict[str, Any]],
+    k: int,
+    lambda_mult: float = 0.5,
+    exclude: Sequence[np.ndarray] = (),
+    duplicate_similarity: float = 0.95
+) -> List[Dict[str, Any]]:
+    """Maximal marginal relevance selection over scored passages.
+
+    Repeatedly picks the passage maximizing
+    ``lambda_mult * score - (1 - lambda_mult) * max similarity`` to what was
+    already picked, where ``exclude`` holds embeddings picked elsewhere (e.g.
+    at another RAG level) that count as already picked. Candidates at least
+    ``duplicate_similarity`` similar to a picked passage are dropped outright.
+    Passages need ``score`` (query similarity) and ``embedding``.
+    """
+    if not passages or k <= 0:
+        return []
+
+    vectors = np.stack([_unit(passage["embedding"]) for passage in passages])
+    relevance = np.array([passage["score"] for passage in passages], dtype=np.float32)
+
+    # Highest similarity of each candidate to anything picked so far
+    redundancy = np.full(len(passages), -1.0, dtype=np.float32)
+    if len(exclude):
+        redundancy = np.max(vectors @ np.stack([_unit(vector) for vector in exclude]).T, axis=1)
+
+    available = redundancy < duplicate_similarity
+    picked: List[int] = []
+    while len(picked) < k and available.any():
+        penalty = np.where(redundancy > -1.0, redundancy, 0.0)
+        marginal = lambda_mult * relevance - (1 - lambda_mult) * penalty
+        index = int(np.argmax(np.where(available, marginal, -np.inf)))
+        picked.append(index)
+        available[index] = False
+
+        redundancy = np.maximum(redundancy, vectors @ vectors[index])
+        available &= redundancy < duplicate_similarity
+
+    return [passages[index] for index in picked]
+
+def _unit(vector: Optional[Any]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
@@ -0,0 +1,139 @@
+from typing import List, Optional
+from abc import ABC, abstractmethod
+import logging
+import os
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+# Token limit used by sentence-transformers for MiniLM models
+MAX_SEQUENCE_LENGTH = 256
+
+class EmbeddingBackend(ABC):
+    """Interface for the model that turns texts into embedding vectors.
+
+    ``encode`` returns a float32 array of shape (len(texts), dimension) with
+    L2-normalized rows, so backends are interchangeable for cosine search.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as L2-normalized float32 rows"""
+
+class TorchBackend(EmbeddingBackend):
+    """Float32 PyTorch SentenceTransformer, optionally int8-quantized.
+
+    Quantization uses dynamic int8 weights for every Linear layer, which
+    covers nearly all of MiniLM's compute on CPU.
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False):
+        self.name = "int8" if quantize else "torch"
+        if quantize:
+            import torch
+            model = SentenceTransformer(model_name, device="cpu")
+            self.model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Only models ending in a Normalize module come back normalized, and
+        # quantization shifts the norms slightly
+        return l2_normalize(np.asarray(self.model.encode(texts), dtype=np.float32))
+
+class OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime export of a sentence-transformers model.
+
+    ``model_path`` points at an ``.onnx`` file (for example an int8
+    ``model_qint8_avx512.onnx`` export) with ``tokenizer.json`` next to it
+    or one directory up, as in the Hugging Face repo layout. Without a path,
+    Chroma's bundled all-MiniLM-L6-v2 export is used.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, model_path: Optional[str] = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        if not model_path:
+            model_path = self._bundled_model_path(model_name)
+        tokenizer_path = self._find_tokenizer(model_path)
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQUENCE_LENGTH)
+        # Pad to the longest text in each batch rather than a fixed length
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX embedding model from {model_path}")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        encoded = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        last_hidden_state = self.session.run(None, inputs)[0]
+        return mean_pool(last_hidden_state, attention_mask)
+
+    @staticmethod
+    def _bundled_model_path(model_name: str) -> str:
+        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+        if model_name != ONNXMiniLM_L6_V2.MODEL_NAME:
+            raise ValueError(
+                f"No bundled ONNX export for {model_name}; set EMBEDDING_ONNX_MODEL_PATH"
+            )
+        bundled = ONNXMiniLM_L6_V2()
+        # Downloads and verifies the export on first use only
+        bundled._download_model_if_not_exists()
+        return os.path.join(bundled.DOWNLOAD_PATH, bundled.EXTRACTED_FOLDER_NAME, "model.onnx")
+
+    @staticmethod
+    def _find_tokenizer(model_path: str) -> str:
+        model_dir = os.path.dirname(os.path.abspath(model_path))
+        for directory in (model_dir, os.path.dirname(model_dir)):
+            candidate = os.path.join(directory, "tokenizer.json")
+            if os.path.exists(candidate):
+                return candidate
+        raise FileNotFoundError(f"tokenizer.json not found next to {model_path}")
+
+def mean_pool(last_hidden_state: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Attention-weighted mean pooling followed by L2 normalization, as in
+    the sentence-transformers MiniLM pipeline"""
+    mask = attention_mask[..., np.newaxis].astype(np.float32)
+    summed = (last_hidden_state * mask).sum(axis=1)
+    return l2_normalize(summed / np.clip(mask.sum(axis=1), 1e-9, None))
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length (zero rows stay zero) as float32"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+EMBEDDING_BACKENDS = ("torch", "int8", "onnx")
+
+def create_embedding_backend(name: str, model_name: str, onnx_model_path: Optional[str] = None) -> EmbeddingBackend:
+    """Build the embedding backend selected by EMBEDDING_BACKEND"""
+    if name == "torch":
+        return TorchBackend(model_name)
+    if name == "int8":
+        return TorchBackend(model_name, quantize=True)
+    if name == "onnx":
+        return OnnxBackend(model_name, onnx_model_path)
+    raise ValueError(f"Unknown embedding backend {name!r}; expected one of {', '.join(EMBEDDING_BACKENDS)}")
@@ -0,0 +1,97 @@
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from concurrent.futures import Executor
+import asyncio
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingBatcher:
+    """Micro-batching embedder that coalesces concurrent encode requests.
+
+    Callers await ``embed(text)``; requests arriving within ``max_wait_ms`` of
+    each other (or until ``max_batch_size`` is reached) are encoded together in
+    a single model call and the resulting vectors are fanned back out.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0) / 1000.0
+        self.executor = executor
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+        # Counters for sizing the batch window
+        self.batches_encoded = 0
+        self.items_encoded = 0
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed a single text, batched with any concurrent requests"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush, loop)
+
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed several texts into a (len(texts), dim) float32 array; they
+        share batches with other callers"""
+        vectors = await asyncio.gather(*(self.embed(text) for text in texts))
+        return np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+        """Dispatch pending requests to the encoder in batches"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = loop.create_task(self._encode_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _encode_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            # One float32 matrix per batch; callers get row views of it
+            vectors = np.asarray(
+                await loop.run_in_executor(self.executor, self.encode_fn, texts),
+                dtype=np.float32
+            )
+            if len(vectors) != len(batch):
+                raise RuntimeError(
+                    f"Encoder returned {len(vectors)} embeddings for {len(batch)} texts"
+                )
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_encoded += 1
+        self.items_encoded += len(batch)
+
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
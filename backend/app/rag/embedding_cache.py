@@ -0,0 +1,264 @@
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import os
+import threading
+import unicodedata
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: processes must not share a cache directory
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """Content-addressed embedding cache with an LRU memory tier and an
+    optional memory-mapped on-disk tier.
+
+    Entries are keyed by a hash of the normalized text plus the model name, so
+    switching models never serves stale vectors.
+    """
+
+    KEY_BYTES = 16
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = 10000,
+        persist_directory: Optional[str] = None,
+        disk_capacity: int = 100000
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._disk: Optional[_DiskTier] = None
+        if persist_directory:
+            try:
+                self._disk = _DiskTier(persist_directory, model_name, disk_capacity)
+            except Exception as e:
+                logger.warning(f"Embedding disk cache disabled: {e}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._disk is not None
+
+    def make_key(self, text: str) -> bytes:
+        """Hash the normalized text together with the model name"""
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        digest = hashlib.blake2b(digest_size=self.KEY_BYTES)
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(normalized.encode("utf-8"))
+        return digest.digest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached float32 embedding for text, or None on a miss.
+
+        The returned array is shared with the cache and read-only.
+        """
+        if not self.enabled:
+            return None
+        key = self.make_key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            if self._disk is not None:
+                vector = self._disk.get(key)
+                if vector is not None:
+                    self.disk_hits += 1
+                    vector.flags.writeable = False
+                    self._remember(key, vector)
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, embedding: Any):
+        """Store an embedding for text in every enabled tier"""
+        if not self.enabled:
+            return
+        key = self.make_key(text)
+        # Own copy, so a cached row does not pin the whole batch it came from
+        vector = np.array(embedding, dtype=np.float32)
+        vector.flags.writeable = False
+        with self._lock:
+            self._remember(key, vector)
+            if self._disk is not None:
+                try:
+                    self._disk.put(key, vector)
+                except Exception as e:
+                    logger.warning(f"Failed to write embedding to disk cache: {e}")
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def flush(self):
+        """Persist the on-disk tier's bookkeeping"""
+        with self._lock:
+            if self._disk is not None:
+                self._disk.flush()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "model": self.model_name,
+                "memory_entries": len(self._memory),
+                "memory_capacity": self.max_entries,
+                "disk_entries": self._disk.size if self._disk is not None else 0,
+                "disk_capacity": self._disk.capacity if self._disk is not None else 0,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+class _DiskTier:
+    """Fixed-capacity ring of vectors stored in memory-mapped files.
+
+    ``keys.bin`` and ``vectors.f32`` hold one row per slot and ``meta.json``
+    records the dimension. Processes sharing the directory serialize on an
+    ``fcntl`` lock of ``ring.lock``, which also holds the shared write cursor,
+    and every read checks that the slot still holds the requested key, since
+    another process may have reused it. The key index is rebuilt from
+    ``keys.bin`` on startup, so entries added by other processes later are
+    found after a restart.
+    """
+
+    def __init__(self, persist_directory: str, model_name: str, capacity: int):
+        safe_model = "".join(c if c.isalnum() or c in "-_." else "_" for c in model_name)
+        self.directory = os.path.join(persist_directory, "embedding_cache", safe_model)
+        self.capacity = capacity
+        self.dim: Optional[int] = None
+        self._index: Dict[bytes, int] = {}
+        self._keys: Optional[np.memmap] = None
+        self._vectors: Optional[np.memmap] = None
+        self._dirty = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(self.directory, "ring.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        meta_path = os.path.join(self.directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("capacity") == capacity:
+                self.dim = meta["dim"]
+                with self._locked(exclusive=False):
+                    self._open()
+                    empty = bytes(EmbeddingCache.KEY_BYTES)
+                    for slot in range(capacity):
+                        key = self._keys[slot].tobytes()
+                        if key != empty:
+                            self._index[key] = slot
+            else:
+                logger.info("Embedding disk cache capacity changed, starting fresh")
+
+    @property
+    def size(self) -> int:
+        return len(self._index)
+
+    @contextmanager
+    def _locked(self, exclusive: bool = True):
+        """Hold the cross-process lock on the ring (a no-op without fcntl)"""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _open(self):
+        """Map the ring files; existing files of the right size are reused, not truncated"""
+        paths = {
+            "keys": (os.path.join(self.directory, "keys.bin"), np.uint8, (self.capacity, EmbeddingCache.KEY_BYTES)),
+            "vectors": (os.path.join(self.directory, "vectors.f32"), np.float32, (self.capacity, self.dim))
+        }
+        reuse = all(
+            os.path.exists(path) and os.path.getsize(path) == np.dtype(dtype).itemsize * shape[0] * shape[1]
+            for path, dtype, shape in paths.values()
+        )
+        mode = "r+" if reuse else "w+"
+        self._keys, self._vectors = (
+            np.memmap(path, dtype=dtype, mode=mode, shape=shape) for path, dtype, shape in paths.values()
+        )
+
+    def _cursor(self) -> int:
+        os.lseek(self._lock_fd, 0, os.SEEK_SET)
+        return int.from_bytes(os.read(self._lock_fd, 8) or bytes(8), "little") % self.capacity
+
+    def _set_cursor(self, cursor: int):
+        os.lseek(self._lock_fd, 0, os.SEEK_SET)
+        os.write(self._lock_fd, cursor.to_bytes(8, "little"))
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        slot = self._index.get(key)
+        if slot is None:
+            return None
+        with self._locked(exclusive=False):
+            if self._keys[slot].tobytes() != key:
+                # Slot reused by another process since the index was built
+                del self._index[key]
+                return None
+            return np.array(self._vectors[slot])
+
+    def put(self, key: bytes, vector: np.ndarray):
+        with self._locked():
+            if self.dim is None:
+                self.dim = int(vector.shape[-1])
+                self._open()
+            if vector.shape[-1] != self.dim:
+                return
+            slot = self._index.get(key)
+            if slot is not None and self._keys[slot].tobytes() == key:
+                return
+
+            slot = self._cursor()
+            evicted = self._keys[slot].tobytes()
+            if self._index.get(evicted) == slot:
+                del self._index[evicted]
+
+            self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+            self._vectors[slot] = vector
+            self._index[key] = slot
+            self._set_cursor((slot + 1) % self.capacity)
+
+        self._dirty += 1
+        if self._dirty >= 256:
+            self.flush()
+
+    def flush(self):
+        if self._keys is None:
+            return
+        self._keys.flush()
+        self._vectors.flush()
+        with self._locked(), open(os.path.join(self.directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "capacity": self.capacity}, f)
+        self._dirty = 0
@@ -0,0 +1,114 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional
+import logging
+import multiprocessing
+import signal
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Backend inherited by forked workers; set in the parent right before forking
+# so every worker shares the already-loaded weights copy-on-write
+_worker_backend = None
+
+def _init_worker():
+    # One intra-op thread per worker: the pool provides the parallelism, and
+    # OpenMP state inherited over fork is not safe to reuse with more threads
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    # Shutdown is driven by the parent
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _worker_dimension() -> int:
+    return int(np.asarray(_worker_backend.encode(["dimension probe"])).shape[1])
+
+def _worker_encode(texts: List[str], shm_name: str, dimension: int):
+    """Encode texts straight into the parent's shared memory block"""
+    vectors = np.asarray(_worker_backend.encode(texts), dtype=np.float32)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        np.ndarray((len(texts), dimension), dtype=np.float32, buffer=shm.buf)[:] = vectors
+    finally:
+        shm.close()
+
+class EmbeddingProcessPool:
+    """Out-of-process embedding workers forked from a loaded backend.
+
+    Workers are forked after the model is loaded, so they share its weights
+    copy-on-write instead of loading their own copy, and encode outside the
+    API process's GIL. Results come back through a shared memory block
+    allocated by the caller rather than as pickled Python lists.
+    """
+
+    def __init__(self, backend, workers: int):
+        self.backend = backend
+        self.workers = workers
+        self.dimension: Optional[int] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @staticmethod
+    def supported() -> bool:
+        return "fork" in multiprocessing.get_all_start_methods()
+
+    def start(self):
+        """Fork the workers once the backend is loaded.
+        
+        Blocks until every worker has answered a probe encode, so run it off
+        the event loop.
+        """
+        global _worker_backend
+        # Shared memory segments created here are unlinked here; make sure
+        # workers report to the same tracker instead of starting their own
+        resource_tracker.ensure_running()
+        _worker_backend = self.backend
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker
+        )
+        # Fork every worker now and learn the vector size
+        probes = [self._executor.submit(_worker_dimension) for _ in range(self.workers)]
+        self.dimension = probes[0].result()
+        for probe in probes[1:]:
+            probe.result()
+        logger.info(f"Embedding process pool started with {self.workers} workers")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode in a worker process (blocking); returns a float32 array.
+        
+        If a worker dies the pool is broken for good; it is then shut down and
+        this and later calls encode in-process.
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        executor = self._executor
+        if executor is None:
+            return np.asarray(self.backend.encode(texts), dtype=np.float32)
+        nbytes = len(texts) * self.dimension * np.dtype(np.float32).itemsize
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        try:
+            executor.submit(_worker_encode, texts, shm.name, self.dimension).result()
+            return np.ndarray((len(texts), self.dimension), dtype=np.float32, buffer=shm.buf).copy()
+        except BrokenProcessPool as e:
+            logger.error(f"Embedding process pool is broken, encoding in-process from now on: {e}")
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            return np.asarray(self.backend.encode(texts), dtype=np.float32)
+        finally:
+            try:
+                shm.close()
+            finally:
+                # Unlink even if close fails, or the segment outlives the process
+                shm.unlink()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
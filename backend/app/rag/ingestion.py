@@ -0,0 +1,86 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+import codecs
+import logging
+
+from models.schemas import RAGLevel
+from app.core.config import settings
+from app.rag.chunking import StreamingChunker
+
+logger = logging.getLogger(__name__)
+
+# Reads up to n bytes, returning b"" at end of stream (e.g. UploadFile.read)
+ByteReader = Callable[[int], Awaitable[bytes]]
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+TEXT_FILE_TYPES = {".txt", ".md"}
+
+async def ingest_stream(
+    retriever,
+    read: ByteReader,
+    level: RAGLevel,
+    entity_id: int,
+    file_type: Optional[str] = None,
+    metadata: Dict[str, Any] = None,
+    progress_callback: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """Stream a UTF-8 text source into the RAG store with bounded memory.
+
+    Bytes are read in RAG_UPLOAD_READ_BYTES pieces, decoded incrementally,
+    chunked as they arrive and written in embedding-sized batches, so only
+    the current read and the chunker's window are ever held in memory. If
+    ingestion fails midway, the chunks already written are removed.
+    """
+    doc_id = retriever.new_document_id(level, entity_id)
+    chunker = StreamingChunker(
+        file_type,
+        chunk_tokens=settings.RAG_CHUNK_TOKENS,
+        overlap_tokens=settings.RAG_CHUNK_OVERLAP_TOKENS
+    )
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    batch_size = settings.EMBEDDING_BATCH_MAX_SIZE
+
+    bytes_processed = 0
+    characters = 0
+    chunk_count = 0
+    pending = []
+
+    try:
+        while True:
+            data = await read(settings.RAG_UPLOAD_READ_BYTES)
+            final = not data
+            text = decoder.decode(data, final=final)
+            bytes_processed += len(data)
+            characters += len(text)
+
+            pending.extend(chunker.feed(text, final=final))
+            # Hold back a full batch until more text arrives, so the last batch
+            # always has chunks in it and can be written as final
+            while len(pending) > batch_size or (final and pending):
+                batch, pending = pending[:batch_size], pending[batch_size:]
+                chunk_count += await retriever.add_chunks(
+                    level, entity_id, doc_id, batch, start_index=chunk_count, metadata=metadata,
+                    final=final and not pending
+                )
+
+            progress = {
+                "vector_id": doc_id,
+                "bytes_processed": bytes_processed,
+                "chunk_count": chunk_count,
+                "done": final
+            }
+            logger.debug(f"Ingested {bytes_processed} bytes into {doc_id} ({chunk_count} chunks)")
+            if progress_callback:
+                await progress_callback(progress)
+            if final:
+                break
+    except Exception:
+        if chunk_count:
+            await retriever.delete_knowledge(doc_id, level)
+        raise
+
+    return {
+        "vector_id": doc_id,
+        "bytes_processed": bytes_processed,
+        "content_length": characters,
+        "chunk_count": chunk_count
+    }
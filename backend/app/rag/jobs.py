@@ -0,0 +1,310 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+from sqlalchemy import or_
+
+from models.schemas import IngestionJob, JobStatus, RAGLevel
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.websocket import ws_manager, LogMessage, LogType
+
+logger = logging.getLogger(__name__)
+
+class JobQueueFull(Exception):
+    """Raised when the ingestion queue cannot accept more jobs"""
+
+class JobProgress:
+    """Progress reporter handed to a running job.
+
+    Updates are persisted to the job row and pushed to the project's live
+    log at most once per RAG_INGEST_PROGRESS_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, queue: "IngestionJobQueue", job_id: str):
+        self._queue = queue
+        self.job_id = job_id
+        self._fields: Dict[str, Any] = {}
+        self._last_publish = 0.0
+
+    async def update(self, **fields):
+        self._fields.update(fields)
+        now = time.monotonic()
+        if now - self._last_publish >= settings.RAG_INGEST_PROGRESS_INTERVAL_SECONDS:
+            self._last_publish = now
+            await self._queue._update(self.job_id, "progress", **self._fields)
+
+# A job handler does the ingestion work and returns the job result
+JobHandler = Callable[[JobProgress], Awaitable[Dict[str, Any]]]
+
+class IngestionJobQueue:
+    """In-process background queue for RAG ingestion with a persistent job table.
+
+    Several processes may share the job table, so every job records the
+    process that owns it and a heartbeat that owner keeps refreshing. Only
+    jobs whose owner is gone are failed as interrupted.
+    """
+
+    def __init__(self, session_factory=SessionLocal, workers: int = None, max_pending: int = None):
+        self.session_factory = session_factory
+        self.worker_count = workers or settings.RAG_INGEST_WORKERS
+        self.max_pending = max_pending or settings.RAG_INGEST_QUEUE_SIZE
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return any(not worker.done() for worker in self._workers)
+
+    async def start(self):
+        """Create the job table if needed and spawn the worker pool"""
+        if self.running:
+            return
+        with self.session_factory() as db:
+            IngestionJob.__table__.create(bind=db.get_bind(), checkfirst=True)
+        self._fail_abandoned_jobs()
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._workers = [
+            asyncio.create_task(self._worker_loop(index)) for index in range(self.worker_count)
+        ]
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        logger.info(f"Ingestion job queue started with {self.worker_count} workers")
+
+    async def stop(self):
+        """Cancel workers; jobs still queued are marked failed once their
+        heartbeat goes stale"""
+        tasks = self._workers + ([self._heartbeat] if self._heartbeat else [])
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        self._heartbeat = None
+
+    async def submit(
+        self,
+        kind: str,
+        handler: JobHandler,
+        level: Optional[RAGLevel] = None,
+        entity_id: Optional[int] = None,
+        project_id: Optional[int] = None,
+        filename: Optional[str] = None,
+        bytes_total: int = 0,
+        items_total: int = 0
+    ) -> str:
+        """Record a pending job and queue it; returns the job id immediately"""
+        await self.start()
+        if self._queue.full():
+            raise JobQueueFull(f"Ingestion queue is full ({self.max_pending} pending jobs)")
+
+        job_id = uuid.uuid4().hex
+        with self.session_factory() as db:
+            db.add(IngestionJob(
+                id=job_id,
+                kind=kind,
+                status=JobStatus.PENDING,
+                level=level,
+                entity_id=entity_id,
+                project_id=project_id,
+                filename=filename,
+                bytes_total=bytes_total,
+                items_total=items_total,
+                owner_id=self.owner_id,
+                heartbeat_at=datetime.utcnow()
+            ))
+            db.commit()
+
+        self._queue.put_nowait((job_id, handler))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.session_factory() as db:
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+            return self.serialize(job) if job else None
+
+    @staticmethod
+    def serialize(job: IngestionJob) -> Dict[str, Any]:
+        """Job state including progress and throughput"""
+        elapsed = None
+        if job.started_at:
+            elapsed = max(((job.completed_at or datetime.utcnow()) - job.started_at).total_seconds(), 1e-6)
+        return {
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status.value if job.status else None,
+            "level": job.level.value if job.level else None,
+            "entity_id": job.entity_id,
+            "project_id": job.project_id,
+            "filename": job.filename,
+            "bytes_total": job.bytes_total or 0,
+            "bytes_processed": job.bytes_processed or 0,
+            "items_total": job.items_total or 0,
+            "items_processed": job.items_processed or 0,
+            "items_failed": job.items_failed or 0,
+            "chunk_count": job.chunk_count or 0,
+            "progress": _fraction(job),
+            "elapsed_seconds": round(elapsed, 3) if elapsed else None,
+            "bytes_per_second": round((job.bytes_processed or 0) / elapsed, 1) if elapsed else None,
+            "chunks_per_second": round((job.chunk_count or 0) / elapsed, 1) if elapsed else None,
+            "result": job.result,
+            "error": job.error_message,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "completed_at": job.completed_at.isoformat() if job.completed_at else None
+        }
+
+    async def _worker_loop(self, index: int):
+        while True:
+            job_id, handler = await self._queue.get()
+            try:
+                await self._run(job_id, handler)
+            except Exception as e:
+                logger.error(f"Ingestion worker {index} failed to record job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, handler: JobHandler):
+        await self._update(job_id, "started", status=JobStatus.RUNNING, started_at=datetime.utcnow())
+        progress = JobProgress(self, job_id)
+        try:
+            result = await handler(progress)
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            await self._update(
+                job_id, "failed",
+                **progress._fields,
+                status=JobStatus.FAILED,
+                error_message=str(e),
+                completed_at=datetime.utcnow()
+            )
+            return
+        await self._update(
+            job_id, "completed",
+            **progress._fields,
+            status=JobStatus.COMPLETED,
+            result=result,
+            completed_at=datetime.utcnow()
+        )
+
+    async def _update(self, job_id: str, event: str, **fields):
+        """Persist job fields and push the new state to the project's live log"""
+        with self.session_factory() as db:
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+            if not job:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+            db.commit()
+            state = self.serialize(job)
+
+        if state["project_id"]:
+            await ws_manager.broadcast_to_project(
+                state["project_id"],
+                LogMessage(
+                    type=LogType.ERROR if event == "failed" else LogType.STATUS,
+                    agent_id=None,
+                    agent_name="Ingestion",
+                    crew_id=None,
+                    project_id=state["project_id"],
+                    content=_describe(event, state),
+                    metadata={"event": f"ingestion_{event}", "job": state},
+                    # A slow client may skip straight to the job's latest state
+                    stream_key=f"ingestion_job:{job_id}"
+                )
+            )
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(settings.RAG_INGEST_HEARTBEAT_SECONDS)
+            try:
+                self._beat()
+                self._fail_abandoned_jobs()
+            except Exception as e:
+                logger.error(f"Ingestion job heartbeat failed: {e}")
+
+    def _beat(self):
+        """Refresh the heartbeat of every live job this process owns"""
+        with self.session_factory() as db:
+            db.query(IngestionJob).filter(
+                IngestionJob.owner_id == self.owner_id,
+                IngestionJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING])
+            ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+
+    def _fail_abandoned_jobs(self):
+        """Jobs left pending/running by a process that is gone can never finish.
+
+        An owner is gone once its heartbeat is older than
+        RAG_INGEST_STALE_SECONDS, or right away if it was a process on this
+        host that no longer exists.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.RAG_INGEST_STALE_SECONDS)
+        with self.session_factory() as db:
+            live = db.query(IngestionJob.id, IngestionJob.owner_id, IngestionJob.heartbeat_at).filter(
+                IngestionJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),
+                or_(IngestionJob.owner_id.is_(None), IngestionJob.owner_id != self.owner_id)
+            ).all()
+            abandoned = [
+                job.id for job in live
+                if job.heartbeat_at is None or job.heartbeat_at < cutoff or _owner_exited(job.owner_id)
+            ]
+            if not abandoned:
+                return
+            db.query(IngestionJob).filter(IngestionJob.id.in_(abandoned)).update(
+                {
+                    "status": JobStatus.FAILED,
+                    "error_message": "Interrupted: the server process running the job stopped",
+                    "completed_at": datetime.utcnow()
+                },
+                synchronize_session=False
+            )
+            db.commit()
+        logger.warning(f"Marked {len(abandoned)} interrupted ingestion jobs as failed")
+
+def _owner_exited(owner_id: Optional[str]) -> bool:
+    """Whether a job owner was a process on this host that has exited"""
+    host, _, rest = (owner_id or "").partition(":")
+    pid = rest.partition(":")[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+def _fraction(job: IngestionJob) -> Optional[float]:
+    if job.status == JobStatus.COMPLETED:
+        return 1.0
+    if job.bytes_total:
+        return round(min((job.bytes_processed or 0) / job.bytes_total, 1.0), 4)
+    if job.items_total:
+        return round(min((job.items_processed or 0) / job.items_total, 1.0), 4)
+    return None
+
+def _describe(event: str, state: Dict[str, Any]) -> str:
+    name = state["filename"] or f"{state['kind']} job {state['id'][:8]}"
+    if event == "failed":
+        return f"Ingestion of {name} failed: {state['error']}"
+    if event == "completed":
+        return f"Ingestion of {name} completed ({state['chunk_count']} chunks)"
+    if event == "started":
+        return f"Ingestion of {name} started"
+    if state["progress"] is not None:
+        return f"Ingesting {name}: {state['progress'] * 100:.0f}%"
+    return f"Ingesting {name}: {state['chunk_count']} chunks stored"
+
+# Global ingestion job queue instance
+ingestion_jobs = IngestionJobQueue()
@@ -0,0 +1,143 @@
+from typing import Dict, Iterable, List, Optional, Sequence
+import os
+import re
+import sqlite3
+import threading
+
+from models.schemas import RAGLevel
+
+# Words, keeping identifiers such as ERR-4031, v2.1.0 or user_id together
+_WORD = re.compile(r"\w+(?:[-.:/]\w+)*")
+_SEPARATORS = re.compile(r"[-.:/_]+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms for BM25.
+
+    Compound identifiers are indexed whole (``err_4031`` for ``ERR-4031``) and
+    by their parts, so an exact code ranks highest while a partial one still
+    matches.
+    """
+    tokens = []
+    for match in _WORD.finditer(text.lower()):
+        parts = [part for part in _SEPARATORS.split(match.group()) if part]
+        if len(parts) > 1:
+            tokens.append("_".join(parts))
+        tokens.extend(parts)
+    return tokens
+
+def _partition(level: RAGLevel, entity_id: int) -> str:
+    return f"{level.value}_{entity_id}"
+
+class LexicalIndex:
+    """BM25 inverted index over RAG chunks, stored in an SQLite FTS5 table.
+
+    Chunks are indexed under the same ids as in the vector store, tagged with
+    a ``<level>_<entity_id>`` partition term that searches intersect with, so
+    a lookup only scores postings of the requested entity. The partition
+    column has zero weight in the BM25 score.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunk_terms USING fts5("
+                "terms, partition, tokenize=\"unicode61 tokenchars '_'\")"
+            )
+            # Maps vector ids to FTS rows so documents can be deleted by id
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "rowid INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, parent_id TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_chunks_parent_id ON chunks (parent_id)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @property
+    def built(self) -> bool:
+        """Whether the index has been backfilled from the vector store"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+        return row is not None
+
+    def mark_built(self):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+
+    def add(self, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[Dict]):
+        """Index chunks as written to the vector store (same ids and metadata)"""
+        with self._lock, self._conn:
+            for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                if "level" not in metadata or "entity_id" not in metadata:
+                    # Not searchable by entity, so never returned by search()
+                    continue
+                self._delete_rows(self._conn.execute(
+                    "SELECT rowid FROM chunks WHERE chunk_id = ?", (chunk_id,)
+                ).fetchall())
+                rowid = self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, parent_id) VALUES (?, ?)",
+                    (chunk_id, metadata.get("parent_id") or chunk_id)
+                ).lastrowid
+                self._conn.execute(
+                    "INSERT INTO chunk_terms (rowid, terms, partition) VALUES (?, ?, ?)",
+                    (
+                        rowid,
+                        " ".join(tokenize(document or "")),
+                        _partition(RAGLevel(metadata["level"]), metadata["entity_id"])
+                    )
+                )
+
+    def delete_document(self, doc_id: str):
+        """Remove every chunk of a document, and a legacy unchunked vector"""
+        with self._lock, self._conn:
+            self._delete_rows(self._conn.execute(
+                "SELECT rowid FROM chunks WHERE parent_id = ? OR chunk_id = ?", (doc_id, doc_id)
+            ).fetchall())
+
+    def _delete_rows(self, rows: Iterable[tuple]):
+        for (rowid,) in rows:
+            self._conn.execute("DELETE FROM chunk_terms WHERE rowid = ?", (rowid,))
+            self._conn.execute("DELETE FROM chunks WHERE rowid = ?", (rowid,))
+
+    def search(self, query: str, level: RAGLevel, entity_id: int, limit: int) -> List[str]:
+        """Chunk ids of one entity ranked by BM25 against the query"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        match = 'partition:"{}" AND terms:({})'.format(
+            _partition(level, entity_id), " OR ".join(f'"{term}"' for term in terms)
+        )
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunks.chunk_id FROM chunk_terms JOIN chunks ON chunks.rowid = chunk_terms.rowid "
+                "WHERE chunk_terms MATCH ? ORDER BY bm25(chunk_terms, 1.0, 0.0) LIMIT ?",
+                (match, limit)
+            ).fetchall()
+        return [chunk_id for (chunk_id,) in rows]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunk_terms")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM meta WHERE key = 'built'")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60, limit: Optional[int] = None) -> List[str]:
+    """Fuse ranked id lists by summing 1 / (k + rank) per list"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    fused = sorted(scores, key=lambda item: scores[item], reverse=True)
+    return fused[:limit] if limit is not None else fused
@@ -0,0 +1,110 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+import threading
+
+from models.schemas import RAGLevel
+
+# (level, entity_id, normalized query, top_k, search mode)
+QueryKey = Tuple[str, int, str, int, str]
+
+class QueryResultCache:
+    """LRU cache of retrieval results keyed by (level, entity_id, query, top_k).
+
+    Entries are indexed by the entity they were read from, so a write to one
+    entity drops exactly that entity's results. Each entity also has a
+    generation counter: a read captures it before going to the vector store
+    and its result is only stored if no write to the entity happened in the
+    meantime, so a slow read can never re-insert a result the write made stale.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[QueryKey, Tuple[Any, ...]]" = OrderedDict()
+        self._by_entity: Dict[Tuple[str, int], Set[QueryKey]] = {}
+        self._generations: Dict[Tuple[str, int], int] = {}
+        # Bumped by clear() so reads that began before it are discarded too
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(level: RAGLevel, entity_id: int, query: str, top_k: int, mode: str = "vector") -> QueryKey:
+        return (level.value, entity_id, " ".join(query.split()), top_k, mode)
+
+    def generation(self, level: RAGLevel, entity_id: int) -> Tuple[int, int]:
+        """Write counter for an entity; pass it back to ``put``"""
+        with self._lock:
+            return (self._epoch, self._generations.get((level.value, entity_id), 0))
+
+    def get(self, key: QueryKey) -> Optional[List[Any]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            documents = self._entries.get(key)
+            if documents is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(documents)
+
+    def put(self, key: QueryKey, documents: List[Any], generation: Tuple[int, int]):
+        """Store a result read at ``generation`` unless the entity changed since"""
+        if not self.enabled:
+            return
+        entity = key[:2]
+        with self._lock:
+            if (self._epoch, self._generations.get(entity, 0)) != generation:
+                return
+            self._entries[key] = tuple(documents)
+            self._entries.move_to_end(key)
+            self._by_entity.setdefault(entity, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._forget(evicted)
+
+    def invalidate(self, level: RAGLevel, entity_id: int):
+        """Drop every cached result for one entity"""
+        entity = (level.value, entity_id)
+        with self._lock:
+            self._generations[entity] = self._generations.get(entity, 0) + 1
+            keys = self._by_entity.pop(entity, ())
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._generations.clear()
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_entity.clear()
+
+    def _forget(self, key: QueryKey):
+        keys = self._by_entity.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_entity[key[:2]]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "capacity": self.max_entries,
+                "entities": len(self._by_entity),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -1,33 +1,94 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 from sqlalchemy.orm import Session
 from models.schemas import RAGStore, RAGLevel
 from app.core.config import settings
+from app.rag.embedding_backends import create_embedding_backend
+from app.rag.embedding_batcher import EmbeddingBatcher
+from app.rag.embedding_pool import EmbeddingProcessPool
+from app.rag.embedding_cache import EmbeddingCache
+from app.rag.query_cache import QueryResultCache
+from app.rag.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from app.rag.diversity import mmr_select
+from app.rag.chunking import chunk_text
 import json
+import os
 import uuid
+import numpy as np
 import time
 import asyncio
 import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
 
 class HierarchicalRAG:
     """Hierarchical RAG system with Project -> Crew -> Agent levels"""
     
+    # Records per Chroma add() call during bulk writes
+    MAX_WRITE_BATCH = 1000
+    
+    # Query modes: dense vectors only, or vectors fused with BM25
+    SEARCH_MODES = ("vector", "hybrid")
+    
     def __init__(self):
         # Thread lock for thread-safe operations
         self._lock = threading.Lock()
         
+        # Seconds spent on each cold-start step, reported by /ready
+        self.startup_timings: Dict[str, float] = {}
+        
         # Initialize ChromaDB
+        started = time.perf_counter()
         self.chroma_client = chromadb.PersistentClient(
             path=settings.CHROMA_PERSIST_DIRECTORY,
             settings=Settings(anonymized_telemetry=False)
         )
+        self.startup_timings["vector_store"] = time.perf_counter() - started
+        
+        # Initialize the configured embedding backend (torch, int8 or onnx)
+        started = time.perf_counter()
+        self.embedding_model = create_embedding_backend(
+            settings.EMBEDDING_BACKEND,
+            settings.EMBEDDING_MODEL_NAME,
+            settings.EMBEDDING_ONNX_MODEL_PATH
+        )
+        self.startup_timings["embedding_model"] = time.perf_counter() - started
+        
+        # Skip the model entirely for text that was embedded recently
+        self.embedding_cache = EmbeddingCache(
+            model_name=settings.EMBEDDING_MODEL_NAME,
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+            persist_directory=settings.CHROMA_PERSIST_DIRECTORY if settings.EMBEDDING_CACHE_PERSIST else None,
+            disk_capacity=settings.EMBEDDING_CACHE_DISK_CAPACITY
+        )
+        
+        # Repeated context lookups and searches are served from memory until
+        # a write to the same entity invalidates them
+        self.query_cache = QueryResultCache(max_entries=settings.RAG_QUERY_CACHE_MAX_ENTRIES)
+        
+        # Retrieval runs on its own bounded pool so searches never block the
+        # event loop or compete with ingestion on the default executor
+        self._query_executor = ThreadPoolExecutor(
+            max_workers=settings.RAG_QUERY_WORKERS,
+            thread_name_prefix="rag-query"
+        )
         
-        # Initialize sentence transformer for embeddings
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Optional out-of-process workers for ingestion encodes, see
+        # start_embedding_pool
+        self.embedding_pool: Optional[EmbeddingProcessPool] = None
+        
+        # Coalesce concurrent ingestion encodes into batched model calls
+        self.embedding_batcher = EmbeddingBatcher(
+            self._encode_batch,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+        )
         
         # Create collections for each RAG level
+        started = time.perf_counter()
         self.project_collection = self.chroma_client.get_or_create_collection(
             name="project_rag",
             metadata={"description": "Project level knowledge base"}
@@ -42,15 +103,46 @@ class HierarchicalRAG:
             name="agent_rag",
             metadata={"description": "Agent level knowledge base"}
         )
+        
+        # Optional single collection holding every level, partitioned by
+        # level/entity_id metadata, so cross-level search is one ANN scan
+        self.unified = settings.RAG_UNIFIED_COLLECTION
+        self.unified_collection = self._get_unified_collection() if self.unified else None
+        self.startup_timings["collections"] = time.perf_counter() - started
+        
+        # BM25 index mirroring every chunk, for exact identifiers in hybrid search
+        self.lexical_index: Optional[LexicalIndex] = None
+        if settings.RAG_LEXICAL_INDEX:
+            started = time.perf_counter()
+            self.lexical_index = LexicalIndex(
+                os.path.join(settings.CHROMA_PERSIST_DIRECTORY, "lexical_index.sqlite3")
+            )
+            if not self.lexical_index.built:
+                try:
+                    indexed = self.rebuild_lexical_index()
+                    logger.info(f"Built lexical index for {indexed} existing chunks")
+                except Exception as e:
+                    logger.error(f"Failed to build lexical index, hybrid search will miss existing content: {e}")
+            self.startup_timings["lexical_index"] = time.perf_counter() - started
     
-    async def add_knowledge(self, level: RAGLevel, entity_id: int, content: str, metadata: Dict[str, Any] = None) -> str:
-        """Add knowledge to the appropriate RAG level - thread-safe"""
+    async def add_knowledge(
+        self,
+        level: RAGLevel,
+        entity_id: int,
+        content: str,
+        metadata: Dict[str, Any] = None,
+        file_type: Optional[str] = None
+    ) -> str:
+        """Add knowledge to the appropriate RAG level - thread-safe.
         
-        # Generate embedding (async to not block event loop)
-        loop = asyncio.get_event_loop()
-        embedding = await loop.run_in_executor(
-            None, lambda: self.embedding_model.encode([content])[0].tolist()
-        )
+        Long content is split into overlapping chunks, each stored as its own
+        vector tagged with ``parent_id``; the returned id identifies the whole
+        document for later updates and deletes.
+        """
+        chunks = self._chunk(content, file_type)
+        
+        # Generate embeddings (batched with concurrent requests, off the event loop)
+        embeddings = await self._embed_many(chunks)
         
         # Prepare metadata
         doc_metadata = {
@@ -71,124 +163,717 @@ class HierarchicalRAG:
             
             # Add to ChromaDB
             try:
-                collection.add(
-                    documents=[content],
-                    embeddings=[embedding],
-                    metadatas=[doc_metadata],
-                    ids=[doc_id]
-                )
+                self._add_chunks(collection, doc_id, chunks, embeddings, doc_metadata)
             except Exception as e:
                 # Handle potential duplicate ID errors
                 if "already exists" in str(e).lower():
                     # Generate new ID and retry
                     doc_id = f"{level.value}_{entity_id}_{timestamp}_{uuid.uuid4().hex}"
-                    collection.add(
-                        documents=[content],
-                        embeddings=[embedding],
-                        metadatas=[doc_metadata],
-                        ids=[doc_id]
-                    )
+                    self._add_chunks(collection, doc_id, chunks, embeddings, doc_metadata)
                 else:
                     raise e
+            finally:
+                self.query_cache.invalidate(level, entity_id)
         
         return doc_id
     
-    async def get_project_context(self, project_id: int, query: str = "", top_k: int = 5) -> str:
-        """Retrieve project-level context"""
-        if query:
-            # Query-based retrieval
-            query_embedding = self.embedding_model.encode([query])[0].tolist()
-            results = self.project_collection.query(
-                query_embeddings=[query_embedding],
-                where={"entity_id": project_id},
-                n_results=top_k
-            )
+    async def add_knowledge_batch(self, items: List[Dict[str, Any]]) -> List[Any]:
+        """Add many documents with batched embedding and batched vector writes.
+        
+        Each item is a dict with ``level``, ``entity_id``, ``content`` and
+        optional ``metadata``/``file_type``. Returns, per item, its document
+        id or the exception that prevented it from being stored; a failed
+        write only affects the items in that write.
+        """
+        chunked = [self._chunk(item["content"], item.get("file_type")) for item in items]
+        embeddings = await self._embed_many([chunk for chunks in chunked for chunk in chunks])
+        
+        results: List[Any] = [None] * len(items)
+        created_at = time.time()
+        # collection id -> (collection, pending write payload, item indexes)
+        writes: Dict[int, tuple] = {}
+        offset = 0
+        
+        with self._lock:
+            for index, (item, chunks) in enumerate(zip(items, chunked)):
+                item_embeddings = embeddings[offset:offset + len(chunks)]
+                offset += len(chunks)
+                
+                collection = self._get_collection_by_level(item["level"])
+                doc_id = self.new_document_id(item["level"], item["entity_id"])
+                doc_metadata = {
+                    "entity_id": item["entity_id"],
+                    "level": item["level"].value,
+                    "created_at": created_at,
+                    **(item.get("metadata") or {})
+                }
+                
+                _, payload, indexes = writes.setdefault(
+                    id(collection), (collection, {"documents": [], "embeddings": [], "metadatas": [], "ids": []}, [])
+                )
+                # Keep single writes well below Chroma's max batch size
+                if payload["ids"] and len(payload["ids"]) + len(chunks) > self.MAX_WRITE_BATCH:
+                    self._write_batch(collection, payload, indexes, results)
+                    payload = {"documents": [], "embeddings": [], "metadatas": [], "ids": []}
+                    indexes = []
+                    writes[id(collection)] = (collection, payload, indexes)
+                
+                payload["documents"].extend(chunks)
+                payload["embeddings"].extend(item_embeddings)
+                ids, metadatas = self._chunk_records(doc_id, doc_metadata, len(chunks), total=len(chunks))
+                payload["metadatas"].extend(metadatas)
+                payload["ids"].extend(ids)
+                indexes.append((index, doc_id))
+            
+            for collection, payload, indexes in writes.values():
+                if indexes:
+                    self._write_batch(collection, payload, indexes, results)
+            
+            for level, entity_id in {(item["level"], item["entity_id"]) for item in items}:
+                self.query_cache.invalidate(level, entity_id)
+        
+        return results
+    
+    def _write_batch(self, collection, payload: Dict[str, List], indexes: List[tuple], results: List[Any]):
+        try:
+            collection.add(**payload)
+        except Exception as e:
+            for index, _ in indexes:
+                results[index] = e
         else:
-            # Get all project knowledge
-            results = self.project_collection.get(
-                where={"entity_id": project_id}
+            self._index_chunks(payload["ids"], payload["documents"], payload["metadatas"])
+            for index, doc_id in indexes:
+                results[index] = doc_id
+    
+    def new_document_id(self, level: RAGLevel, entity_id: int) -> str:
+        """Allocate a document id for content written via add_chunks"""
+        return f"{level.value}_{entity_id}_{int(time.time() * 1000)}_{uuid.uuid4().hex}"
+    
+    async def add_chunks(
+        self,
+        level: RAGLevel,
+        entity_id: int,
+        doc_id: str,
+        chunks: List[str],
+        start_index: int = 0,
+        metadata: Dict[str, Any] = None,
+        final: bool = False
+    ) -> int:
+        """Append pre-chunked content to a document, e.g. while streaming a
+        large upload. Returns the number of chunks written.
+        
+        ``final`` marks the document's last batch: the chunk count is then
+        known and recorded on every chunk, so the stored document looks the
+        same as one written by ``add_knowledge``.
+        """
+        if not chunks:
+            return 0
+        
+        embeddings = await self._embed_many(chunks)
+        doc_metadata = {
+            "entity_id": entity_id,
+            "level": level.value,
+            "created_at": time.time(),
+            **(metadata or {})
+        }
+        total = start_index + len(chunks) if final else None
+        ids, metadatas = self._chunk_records(doc_id, doc_metadata, len(chunks), start_index, total)
+        
+        with self._lock:
+            collection = self._get_collection_by_level(level)
+            collection.add(
+                documents=chunks,
+                embeddings=embeddings,
+                metadatas=metadatas,
+                ids=ids
             )
+            self._index_chunks(ids, chunks, metadatas)
+            if final:
+                # Earlier batches were written before the count was known;
+                # Chroma merges updated metadata into the stored one
+                for start in range(0, start_index, self.MAX_WRITE_BATCH):
+                    end = min(start + self.MAX_WRITE_BATCH, start_index)
+                    collection.update(
+                        ids=[f"{doc_id}:{index}" for index in range(start, end)],
+                        metadatas=[{"chunk_count": total} for _ in range(start, end)]
+                    )
+            self.query_cache.invalidate(level, entity_id)
+        return len(chunks)
+    
+    def _chunk(self, content: str, file_type: Optional[str] = None) -> List[str]:
+        """Split content into embedding-sized chunks; short content stays whole"""
+        chunks = chunk_text(
+            content,
+            file_type=file_type,
+            chunk_tokens=settings.RAG_CHUNK_TOKENS,
+            overlap_tokens=settings.RAG_CHUNK_OVERLAP_TOKENS
+        )
+        return chunks if len(chunks) > 1 else [content]
+    
+    @staticmethod
+    def _chunk_records(
+        doc_id: str,
+        doc_metadata: Dict[str, Any],
+        count: int,
+        start_index: int = 0,
+        total: Optional[int] = None
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Vector ids and metadata for ``count`` chunks of a document from
+        ``start_index`` on. A single-chunk document keeps the document id;
+        ``chunk_count`` is recorded once the ``total`` is known."""
+        indexes = range(start_index, start_index + count)
+        ids = [doc_id] if total == 1 else [f"{doc_id}:{index}" for index in indexes]
+        counted = {} if total is None else {"chunk_count": total}
+        metadatas = [
+            {**doc_metadata, "parent_id": doc_id, "chunk_index": index, **counted}
+            for index in indexes
+        ]
+        return ids, metadatas
+    
+    def _add_chunks(self, collection, doc_id: str, chunks: List[str], embeddings: np.ndarray, doc_metadata: Dict[str, Any]):
+        ids, metadatas = self._chunk_records(doc_id, doc_metadata, len(chunks), total=len(chunks))
+        collection.add(
+            documents=chunks,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            ids=ids
+        )
+        self._index_chunks(ids, chunks, metadatas)
+    
+    def _index_chunks(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Mirror chunks just written to the vector store into the BM25 index"""
+        if self.lexical_index is None:
+            return
+        try:
+            self.lexical_index.add(ids, documents, metadatas)
+        except Exception as e:
+            logger.error(f"Failed to update lexical index for {len(ids)} chunks: {e}")
+    
+    def rebuild_lexical_index(self, batch_size: int = 500) -> int:
+        """Re-index every chunk in the vector store; returns the chunk count"""
+        self.lexical_index.clear()
+        if self.unified:
+            collections = [self.unified_collection]
+        else:
+            collections = [self.project_collection, self.crew_collection, self.agent_collection]
         
-        # Combine documents into context
-        documents = results.get('documents', [[]])[0] if query else results.get('documents', [])
-        context = "\n\n".join(documents) if documents else "No project context available."
+        indexed = 0
+        for collection in collections:
+            offset = 0
+            while True:
+                batch = collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+                ids = batch.get('ids') or []
+                if not ids:
+                    break
+                metadatas = [metadata or {} for metadata in (batch.get('metadatas') or [None] * len(ids))]
+                self.lexical_index.add(ids, batch.get('documents') or [""] * len(ids), metadatas)
+                indexed += len(ids)
+                offset += len(ids)
         
-        return context
+        self.lexical_index.mark_built()
+        return indexed
+    
+    async def get_project_context(self, project_id: int, query: str = "", top_k: int = 5, mode: str = "vector") -> str:
+        """Retrieve project-level context"""
+        return await self._run_query(
+            self._retrieve_context, RAGLevel.PROJECT, project_id, query, top_k, "No project context available.", mode
+        )
     
-    async def get_crew_context(self, crew_id: int, query: str = "", top_k: int = 5) -> str:
+    async def get_crew_context(self, crew_id: int, query: str = "", top_k: int = 5, mode: str = "vector") -> str:
         """Retrieve crew-level context"""
-        if query:
-            query_embedding = self.embedding_model.encode([query])[0].tolist()
-            results = self.crew_collection.query(
+        return await self._run_query(
+            self._retrieve_context, RAGLevel.CREW, crew_id, query, top_k, "No crew context available.", mode
+        )
+    
+    async def get_agent_context(self, agent_id: int, query: str = "", top_k: int = 3, mode: str = "vector") -> str:
+        """Retrieve agent-level context"""
+        return await self._run_query(
+            self._retrieve_context, RAGLevel.AGENT, agent_id, query, top_k, "No agent context available.", mode
+        )
+    
+    async def retrieve_passages(self, level: RAGLevel, entity_id: int, query: str, top_k: int) -> List[Dict[str, Any]]:
+        """Top passages of one entity with their similarity to the query.
+        
+        Each passage is a dict with ``id``, ``level``, ``text``, ``score``
+        (cosine similarity) and ``embedding``, for callers that rank and
+        dedupe passages themselves. Without a query the entity's first
+        ``top_k`` passages are returned unscored.
+        """
+        return await self._run_query(self._retrieve_passages, level, entity_id, query, top_k)
+    
+    def _retrieve_passages(self, level: RAGLevel, entity_id: int, query: str, top_k: int) -> List[Dict[str, Any]]:
+        cache_key = self.query_cache.make_key(level, entity_id, query, top_k, "passages")
+        passages = self.query_cache.get(cache_key)
+        if passages is not None:
+            return passages
+        
+        generation = self.query_cache.generation(level, entity_id)
+        collection = self._get_collection_by_level(level)
+        if query.strip():
+            query_embedding = self._embed_query(query)
+            results = collection.query(
                 query_embeddings=[query_embedding],
-                where={"entity_id": crew_id},
-                n_results=top_k
+                where=self._entity_filter(level, entity_id),
+                n_results=top_k,
+                include=["documents", "embeddings"]
             )
+            ids, documents, embeddings = results['ids'][0], results['documents'][0], results['embeddings'][0]
         else:
-            results = self.crew_collection.get(
-                where={"entity_id": crew_id}
+            results = collection.get(
+                where=self._entity_filter(level, entity_id),
+                limit=top_k,
+                include=["documents", "embeddings"]
             )
+            ids, documents, embeddings = results['ids'], results['documents'], results['embeddings']
+            query_embedding = None
         
-        documents = results.get('documents', [[]])[0] if query else results.get('documents', [])
-        context = "\n\n".join(documents) if documents else "No crew context available."
+        passages = [
+            self._passage(level, chunk_id, document, embedding, query_embedding)
+            for chunk_id, document, embedding in zip(ids, documents, embeddings)
+        ]
+        self.query_cache.put(cache_key, passages, generation)
+        return passages
+    
+    @staticmethod
+    def _passage(
+        level: RAGLevel,
+        chunk_id: str,
+        document: str,
+        embedding,
+        query_embedding: Optional[np.ndarray]
+    ) -> Dict[str, Any]:
+        """A retrieved chunk with its embedding and cosine similarity to the
+        query (0 without a query)"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        score = 0.0
+        if query_embedding is not None:
+            norms = (float(np.linalg.norm(vector)) or 1.0) * (float(np.linalg.norm(query_embedding)) or 1.0)
+            score = float(vector @ query_embedding) / norms
+        return {
+            "id": chunk_id,
+            "level": level.value,
+            "text": document,
+            "score": score,
+            "embedding": vector
+        }
+    
+    async def search_across_levels(
+        self,
+        query: str,
+        project_id: int,
+        crew_id: int = None,
+        agent_id: int = None,
+        mode: str = "vector",
+        diversify: Optional[bool] = None
+    ) -> Dict[str, str]:
+        """Search across all relevant RAG levels for a query.
+        
+        Levels with a cached result for the query are answered from memory.
+        For the rest the query is embedded once and the level searches run
+        concurrently; a level that exceeds RAG_LEVEL_QUERY_TIMEOUT_SECONDS
+        comes back empty (and is not cached). ``mode="hybrid"`` fuses each
+        level's vector ranking with its BM25 ranking.
         
-        return context
+        With ``diversify`` (default RAG_SEARCH_DIVERSIFY) vector searches
+        rerank each level with maximal marginal relevance and skip passages
+        already returned at another level, see ``_search_levels_diversified``.
+        """
+        self._check_search_mode(mode)
+        if diversify is None:
+            diversify = settings.RAG_SEARCH_DIVERSIFY
+        
+        # (result key, level, entity id, n_results) for each relevant level
+        searches = [("project", RAGLevel.PROJECT, project_id, 3)]
+        if crew_id:
+            searches.append(("crew", RAGLevel.CREW, crew_id, 3))
+        if agent_id:
+            searches.append(("agent", RAGLevel.AGENT, agent_id, 2))
+        
+        if diversify and mode == "vector" and query.strip():
+            return await self._search_levels_diversified(searches, query)
+        
+        cache_keys = [
+            self.query_cache.make_key(level, entity_id, query, n_results, mode)
+            for _, level, entity_id, n_results in searches
+        ]
+        level_documents = [self.query_cache.get(cache_key) for cache_key in cache_keys]
+        pending = [index for index, documents in enumerate(level_documents) if documents is None]
+        
+        if pending:
+            generations = [
+                self.query_cache.generation(searches[index][1], searches[index][2]) for index in pending
+            ]
+            fetched = await self._search_levels([searches[index] for index in pending], query, mode)
+            for index, generation, documents in zip(pending, generations, fetched):
+                if documents is None:
+                    level_documents[index] = []
+                    continue
+                level_documents[index] = documents
+                self.query_cache.put(cache_keys[index], documents, generation)
+        
+        return {
+            key: "\n".join(documents)
+            for (key, _, _, _), documents in zip(searches, level_documents)
+        }
     
-    async def get_agent_context(self, agent_id: int, query: str = "", top_k: int = 3) -> str:
-        """Retrieve agent-level context"""
-        if query:
-            query_embedding = self.embedding_model.encode([query])[0].tolist()
-            results = self.agent_collection.query(
-                query_embeddings=[query_embedding],
-                where={"entity_id": agent_id},
-                n_results=top_k
-            )
+    async def _search_levels(self, searches: List[tuple], query: str, mode: str) -> List[Optional[List[str]]]:
+        """Run the searches for several levels; None marks a timeout"""
+        query_embedding = await self._run_query(self._embed_query, query)
+        
+        if self.unified and mode == "vector":
+            return await self._search_unified(searches, query_embedding)
+        
+        return list(await asyncio.gather(*(
+            self._search_level(level, entity_id, self._query_level_hybrid, level, entity_id, query, query_embedding, n_results)
+            if mode == "hybrid" else
+            self._search_level(level, entity_id, self._query_level, level, entity_id, query_embedding, n_results)
+            for _, level, entity_id, n_results in searches
+        )))
+    
+    async def _search_levels_diversified(self, searches: List[tuple], query: str) -> Dict[str, str]:
+        """Pick each level's results by MMR from a larger candidate pool.
+        
+        Every level over-fetches RAG_MMR_CANDIDATES times its n_results hits
+        with their embeddings. Levels are then picked most specific first, and
+        passages picked at a more specific level count as already seen: MMR
+        penalizes candidates similar to them and drops those at or above
+        RAG_DUPLICATE_SIMILARITY, so a passage repeated across levels is
+        returned once, where it is most specific. Candidate pools are cached
+        per entity; the selection spans entities and is redone on every call.
+        In unified mode all pools come from one partitioned query.
+        """
+        query_embedding = await self._run_query(self._embed_query, query)
+        candidates = [
+            (key, level, entity_id, n_results * settings.RAG_MMR_CANDIDATES)
+            for key, level, entity_id, n_results in searches
+        ]
+        if self.unified:
+            pools = await self._search_unified(candidates, query_embedding, passages=True)
         else:
-            results = self.agent_collection.get(
-                where={"entity_id": agent_id}
+            # The level fetches share the query vector through the embedding cache
+            pools = await asyncio.gather(*(
+                self._search_level(level, entity_id, self._retrieve_passages, level, entity_id, query, n_results)
+                for _, level, entity_id, n_results in candidates
+            ))
+        
+        results = {}
+        picked_embeddings: List[np.ndarray] = []
+        for (key, _, _, n_results), pool in reversed(list(zip(searches, pools))):
+            picked = mmr_select(
+                pool or [],
+                n_results,
+                lambda_mult=settings.RAG_MMR_LAMBDA,
+                exclude=picked_embeddings,
+                duplicate_similarity=settings.RAG_DUPLICATE_SIMILARITY
             )
+            picked_embeddings.extend(passage["embedding"] for passage in picked)
+            results[key] = "\n".join(passage["text"] for passage in picked)
         
-        documents = results.get('documents', [[]])[0] if query else results.get('documents', [])
-        context = "\n\n".join(documents) if documents else "No agent context available."
+        return {key: results[key] for key, _, _, _ in searches}
+    
+    async def _search_unified(
+        self,
+        searches: List[tuple],
+        query_embedding: np.ndarray,
+        passages: bool = False
+    ) -> List[Optional[List[Any]]]:
+        """Single-pass search of several levels; all None if it is too slow"""
+        try:
+            return await asyncio.wait_for(
+                self._run_query(self._query_unified, searches, query_embedding, passages),
+                timeout=settings.RAG_LEVEL_QUERY_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Unified search timed out after {settings.RAG_LEVEL_QUERY_TIMEOUT_SECONDS}s, returning no results"
+            )
+            return [None for _ in searches]
+    
+    async def _search_level(self, level: RAGLevel, entity_id: int, func, *args) -> Optional[Any]:
+        """Run one level's blocking search on the query pool, returning None if it is too slow"""
+        try:
+            return await asyncio.wait_for(
+                self._run_query(func, *args), timeout=settings.RAG_LEVEL_QUERY_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"{level.value} level search for entity {entity_id} timed out after "
+                f"{settings.RAG_LEVEL_QUERY_TIMEOUT_SECONDS}s, returning no results"
+            )
+            return None
+    
+    async def _run_query(self, func, *args):
+        """Run a blocking retrieval call on the dedicated query pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._query_executor, func, *args)
+    
+    def _retrieve_context(
+        self,
+        level: RAGLevel,
+        entity_id: int,
+        query: str,
+        top_k: int,
+        empty_message: str,
+        mode: str = "vector"
+    ) -> str:
+        """Blocking context retrieval for one entity (runs on the query pool)"""
+        self._check_search_mode(mode)
+        cache_key = self.query_cache.make_key(level, entity_id, query, top_k, mode)
+        documents = self.query_cache.get(cache_key)
+        if documents is None:
+            generation = self.query_cache.generation(level, entity_id)
+            if query and mode == "hybrid":
+                documents = self._query_level_hybrid(level, entity_id, query, self._embed_query(query), top_k)
+            elif query:
+                # Query-based retrieval
+                documents = self._query_level(level, entity_id, self._embed_query(query), top_k)
+            else:
+                # Get all knowledge for the entity
+                results = self._get_collection_by_level(level).get(
+                    where=self._entity_filter(level, entity_id)
+                )
+                documents = results.get('documents', [])
+            self.query_cache.put(cache_key, documents, generation)
         
-        return context
+        # Combine documents into context
+        return "\n\n".join(documents) if documents else empty_message
     
-    async def search_across_levels(self, query: str, project_id: int, crew_id: int = None, agent_id: int = None) -> Dict[str, str]:
-        """Search across all relevant RAG levels for a query"""
-        query_embedding = self.embedding_model.encode([query])[0].tolist()
+    def _query_level(self, level: RAGLevel, entity_id: int, query_embedding: List[float], n_results: int) -> List[str]:
+        """Blocking vector search within one level for one entity"""
+        results = self._get_collection_by_level(level).query(
+            query_embeddings=[query_embedding],
+            where=self._entity_filter(level, entity_id),
+            n_results=n_results
+        )
+        return results.get('documents', [[]])[0]
+    
+    def _query_level_hybrid(
+        self,
+        level: RAGLevel,
+        entity_id: int,
+        query: str,
+        query_embedding: np.ndarray,
+        n_results: int
+    ) -> List[str]:
+        """Blocking hybrid search within one level for one entity.
         
-        results = {}
+        The vector and BM25 rankings are each cut to n_results x
+        RAG_HYBRID_CANDIDATES and fused with reciprocal rank fusion; chunks
+        found only lexically are then fetched from the vector store by id.
+        """
+        collection = self._get_collection_by_level(level)
+        depth = n_results * settings.RAG_HYBRID_CANDIDATES
         
-        # Project level search
-        project_results = self.project_collection.query(
+        dense = collection.query(
             query_embeddings=[query_embedding],
-            where={"entity_id": project_id},
-            n_results=3
+            where=self._entity_filter(level, entity_id),
+            n_results=depth
         )
-        results["project"] = "\n".join(project_results.get('documents', [[]])[0])
+        documents = dict(zip(dense.get('ids', [[]])[0], dense.get('documents', [[]])[0]))
+        lexical = self.lexical_index.search(query, level, entity_id, depth)
         
-        # Crew level search (if crew_id provided)
-        if crew_id:
-            crew_results = self.crew_collection.query(
-                query_embeddings=[query_embedding],
-                where={"entity_id": crew_id},
-                n_results=3
-            )
-            results["crew"] = "\n".join(crew_results.get('documents', [[]])[0])
+        fused = reciprocal_rank_fusion([list(documents), lexical], k=settings.RAG_RRF_K, limit=n_results)
+        missing = [chunk_id for chunk_id in fused if chunk_id not in documents]
+        if missing:
+            fetched = collection.get(ids=missing, include=["documents"])
+            documents.update(zip(fetched.get('ids', []), fetched.get('documents', [])))
+        return [documents[chunk_id] for chunk_id in fused if chunk_id in documents]
+    
+    def _check_search_mode(self, mode: str):
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}; expected one of {', '.join(self.SEARCH_MODES)}")
+        if mode == "hybrid" and self.lexical_index is None:
+            raise ValueError("Hybrid search requires RAG_LEXICAL_INDEX to be enabled")
+    
+    def _query_unified(
+        self,
+        searches: List[tuple],
+        query_embedding: List[float],
+        passages: bool = False
+    ) -> List[List[Any]]:
+        """Blocking single-pass search over the unified collection.
         
-        # Agent level search (if agent_id provided)
-        if agent_id:
-            agent_results = self.agent_collection.query(
-                query_embeddings=[query_embedding],
-                where={"entity_id": agent_id},
-                n_results=2
-            )
-            results["agent"] = "\n".join(agent_results.get('documents', [[]])[0])
+        One over-fetched vector search covers every requested level; the hits
+        are then partitioned back into per-level result lists, of documents or,
+        with ``passages``, of scored passages with their embeddings.
+        """
+        clauses = [self._unified_filter(level, entity_id) for _, level, entity_id, _ in searches]
+        where = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+        n_results = sum(n for _, _, _, n in searches) * settings.RAG_UNIFIED_OVERFETCH
+        include = ["documents", "metadatas", "embeddings"] if passages else ["documents", "metadatas"]
         
-        return results
+        results = self.unified_collection.query(
+            query_embeddings=[query_embedding],
+            where=where,
+            n_results=n_results,
+            include=include
+        )
+        
+        partitions = {level.value: [] for _, level, _, _ in searches}
+        limits = {level.value: n for _, level, _, n in searches}
+        documents = results.get('documents', [[]])[0]
+        metadatas = results.get('metadatas', [[]])[0] or [{}] * len(documents)
+        ids = results['ids'][0] if passages else [None] * len(documents)
+        embeddings = results['embeddings'][0] if passages else [None] * len(documents)
+        for chunk_id, document, metadata, embedding in zip(ids, documents, metadatas, embeddings):
+            level_value = (metadata or {}).get("level")
+            level_documents = partitions.get(level_value)
+            if level_documents is None or len(level_documents) >= limits[level_value]:
+                continue
+            if passages:
+                level_documents.append(
+                    self._passage(RAGLevel(level_value), chunk_id, document, embedding, query_embedding)
+                )
+            else:
+                level_documents.append(document)
+        
+        return [partitions[level.value] for _, level, _, _ in searches]
+    
+    async def _embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed texts for storage as a (len(texts), dim) float32 array,
+        served from cache when possible"""
+        embeddings = [self.embedding_cache.get(text) for text in texts]
+        missing = [index for index, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = await self.embedding_batcher.embed_many([texts[index] for index in missing])
+            for index, embedding in zip(missing, encoded):
+                embeddings[index] = embedding
+                self.embedding_cache.put(texts[index], embedding)
+        if not embeddings:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(embeddings)
+    
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a search query, served from cache when possible"""
+        embedding = self.embedding_cache.get(query)
+        if embedding is None:
+            # Queries are encoded in-process: one short text is cheaper
+            # than a round trip to a pool worker
+            embedding = np.asarray(self.embedding_model.encode([query]), dtype=np.float32)[0]
+            self.embedding_cache.put(query, embedding)
+        return embedding
+    
+    def warm_up(self) -> Dict[str, float]:
+        """Run a dummy encode and touch every collection so the first real
+        request does not pay for kernel setup or lazy index loading"""
+        started = time.perf_counter()
+        self.embedding_model.encode(["warm-up"])
+        self.startup_timings["warmup_encode"] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        collections = [self.project_collection, self.crew_collection, self.agent_collection]
+        if self.unified_collection is not None:
+            collections.append(self.unified_collection)
+        for collection in collections:
+            collection.count()
+        self.startup_timings["warmup_collections"] = time.perf_counter() - started
+        return self.startup_timings
+    
+    def start_embedding_pool(self, workers: int):
+        """Move ingestion encodes to ``workers`` forked processes.
+        
+        Must run after the model has loaded, so workers inherit the weights,
+        and blocks while they fork and answer a probe; falls back to
+        in-process encoding where fork is unavailable.
+        """
+        if self.embedding_pool is not None or workers < 1:
+            return
+        if not EmbeddingProcessPool.supported():
+            logger.warning("Embedding process pool needs the fork start method; encoding in-process")
+            return
+        started = time.perf_counter()
+        pool = EmbeddingProcessPool(self.embedding_model, workers)
+        pool.start()
+        self.embedding_pool = pool
+        self.startup_timings["embedding_pool"] = time.perf_counter() - started
+    
+    def close(self):
+        """Flush persistent state and stop the query pool and embedding workers"""
+        self.embedding_cache.flush()
+        self._query_executor.shutdown(wait=False)
+        if self.embedding_pool is not None:
+            self.embedding_pool.shutdown()
+            self.embedding_pool = None
+        if self.lexical_index is not None:
+            self.lexical_index.close()
+    
+    def _encode_batch(self, texts: List[str]):
+        """Encode a batch of texts with the embedding model (runs in executor)"""
+        if self.embedding_pool is not None:
+            return self.embedding_pool.encode(texts)
+        return self.embedding_model.encode(texts)
+    
+    def _get_unified_collection(self):
+        return self.chroma_client.get_or_create_collection(
+            name="unified_rag",
+            metadata={"description": "All RAG levels, partitioned by level/entity_id metadata"}
+        )
+    
+    def _entity_filter(self, level: RAGLevel, entity_id: int) -> Dict[str, Any]:
+        """Chroma where-filter selecting one entity's documents at a level"""
+        if self.unified:
+            return self._unified_filter(level, entity_id)
+        return {"entity_id": entity_id}
+    
+    @staticmethod
+    def _unified_filter(level: RAGLevel, entity_id: int) -> Dict[str, Any]:
+        return {"$and": [{"level": level.value}, {"entity_id": entity_id}]}
+    
+    def migrate_to_unified(self, batch_size: int = 500, delete_source: bool = False) -> Dict[str, int]:
+        """Copy documents from the per-level collections into the unified
+        collection, reusing the stored embeddings instead of re-encoding.
+        
+        Document ids are preserved, so RAGStore.vector_id references stay
+        valid. Returns the number of documents copied per level.
+        """
+        unified_collection = self.unified_collection or self._get_unified_collection()
+        migrated = {}
+        
+        for level in RAGLevel:
+            source = self._get_level_collection(level)
+            copied_ids = []
+            offset = 0
+            while True:
+                batch = source.get(
+                    include=["documents", "metadatas", "embeddings"],
+                    limit=batch_size,
+                    offset=offset
+                )
+                ids = batch.get('ids', [])
+                if not ids:
+                    break
+                
+                metadatas = [
+                    {**(metadata or {}), "level": level.value}
+                    for metadata in (batch.get('metadatas') or [None] * len(ids))
+                ]
+                unified_collection.upsert(
+                    ids=ids,
+                    documents=batch.get('documents'),
+                    embeddings=batch.get('embeddings'),
+                    metadatas=metadatas
+                )
+                copied_ids.extend(ids)
+                offset += len(ids)
+            
+            if delete_source:
+                for start in range(0, len(copied_ids), batch_size):
+                    source.delete(ids=copied_ids[start:start + batch_size])
+            
+            migrated[level.value] = len(copied_ids)
+            logger.info(f"Migrated {len(copied_ids)} {level.value} documents to the unified collection")
+        
+        self.query_cache.clear()
+        return migrated
     
     def _get_collection_by_level(self, level: RAGLevel):
         """Get ChromaDB collection based on RAG level"""
+        if self.unified:
+            return self.unified_collection
+        return self._get_level_collection(level)
+    
+    def _get_level_collection(self, level: RAGLevel):
+        """Get the per-level ChromaDB collection"""
         if level == RAGLevel.PROJECT:
             return self.project_collection
         elif level == RAGLevel.CREW:
@@ -198,37 +883,181 @@ class HierarchicalRAG:
         else:
             raise ValueError(f"Unknown RAG level: {level}")
     
-    async def update_knowledge(self, doc_id: str, new_content: str, level: RAGLevel):
-        """Update existing knowledge in RAG store"""
+    async def update_knowledge(self, doc_id: str, new_content: str, level: RAGLevel, file_type: Optional[str] = None):
+        """Update existing knowledge in RAG store, replacing all of its chunks"""
         collection = self._get_collection_by_level(level)
         
-        # Generate new embedding
-        new_embedding = self.embedding_model.encode([new_content])[0].tolist()
+        # Generate new embeddings
+        chunks = self._chunk(new_content, file_type)
+        new_embeddings = await self._embed_many(chunks)
         
-        # Update document
-        collection.update(
-            ids=[doc_id],
-            documents=[new_content],
-            embeddings=[new_embedding]
-        )
+        with self._lock:
+            # Keep the document's original metadata (entity, level, user fields)
+            existing_metadata = self._document_metadata(collection, doc_id)
+            if existing_metadata is None:
+                raise ValueError(f"Knowledge document {doc_id} not found")
+            base_metadata = {
+                key: value for key, value in existing_metadata.items()
+                if key not in ("parent_id", "chunk_index", "chunk_count")
+            }
+            
+            # Replace the old chunk set with the new one
+            try:
+                self._delete_chunks(collection, doc_id)
+                self._add_chunks(collection, doc_id, chunks, new_embeddings, base_metadata)
+            finally:
+                self._invalidate_document(level, existing_metadata)
     
     async def delete_knowledge(self, doc_id: str, level: RAGLevel):
-        """Delete knowledge from RAG store"""
+        """Delete knowledge from RAG store, including all of its chunks"""
         collection = self._get_collection_by_level(level)
+        with self._lock:
+            existing_metadata = self._document_metadata(collection, doc_id)
+            try:
+                self._delete_chunks(collection, doc_id)
+            finally:
+                self._invalidate_document(level, existing_metadata)
+    
+    @staticmethod
+    def _document_metadata(collection, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata of a document's first chunk, or None if it does not exist"""
+        existing = collection.get(ids=[doc_id], include=["metadatas"])
+        if not existing.get('ids'):
+            existing = collection.get(where={"parent_id": doc_id}, limit=1, include=["metadatas"])
+        if not existing.get('ids'):
+            return None
+        return (existing.get('metadatas') or [{}])[0] or {}
+    
+    def _invalidate_document(self, level: RAGLevel, metadata: Optional[Dict[str, Any]]):
+        """Drop cached results for the entity owning a changed document"""
+        if metadata is None:
+            return
+        if "entity_id" in metadata:
+            self.query_cache.invalidate(level, metadata["entity_id"])
+        else:
+            # Cannot tell which entity the document belongs to
+            self.query_cache.clear()
+    
+    def _delete_chunks(self, collection, doc_id: str):
+        # Documents stored before chunking have no parent_id, so delete by id too
         collection.delete(ids=[doc_id])
+        collection.delete(where={"parent_id": doc_id})
+        if self.lexical_index is not None:
+            try:
+                self.lexical_index.delete_document(doc_id)
+            except Exception as e:
+                logger.error(f"Failed to remove {doc_id} from lexical index: {e}")
     
     async def get_knowledge_stats(self, entity_id: int, level: RAGLevel) -> Dict[str, Any]:
         """Get statistics about knowledge stored for an entity"""
         collection = self._get_collection_by_level(level)
         
-        results = collection.get(
-            where={"entity_id": entity_id}
+        results = await self._run_query(
+            lambda: collection.get(where=self._entity_filter(level, entity_id))
         )
         
+        metadatas = results.get('metadatas') or [{}] * len(results.get('ids', []))
         return {
             "level": level.value,
             "entity_id": entity_id,
-            "document_count": len(results.get('ids', [])),
+            "document_count": len({
+                (metadata or {}).get("parent_id", vector_id)
+                for vector_id, metadata in zip(results.get('ids', []), metadatas)
+            }),
+            "chunk_count": len(results.get('ids', [])),
             "total_characters": sum(len(doc) for doc in results.get('documents', [])),
             "last_updated": "2024-01-01"  # This would be tracked in metadata
-        }
\ No newline at end of file
+        }
+
+class SharedRetriever:
+    """Process-wide HierarchicalRAG, created on first use.
+    
+    Loading the embedding model and opening Chroma takes seconds, so it is
+    deferred until a request needs the retriever or ``preload`` runs it in
+    the background after startup.
+    """
+    
+    def __init__(self, factory=HierarchicalRAG):
+        self._factory = factory
+        self._instance: Optional[HierarchicalRAG] = None
+        self._lock = threading.Lock()
+        self._warmed_up = False
+        self._loading = False
+        self._error: Optional[str] = None
+    
+    @property
+    def instance(self) -> Optional[HierarchicalRAG]:
+        """The retriever if it has been created, without creating it"""
+        return self._instance
+    
+    def get(self) -> HierarchicalRAG:
+        """Return the retriever, creating it if needed (blocking)"""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    try:
+                        self._instance = self._factory()
+                    except Exception as e:
+                        self._error = str(e)
+                        raise
+                    self._error = None
+                    logger.info(f"HierarchicalRAG initialized in {time.perf_counter() - started:.2f}s")
+        return self._instance
+    
+    async def preload(self, warm_up: bool = False, embedding_workers: int = 0):
+        """Create (and optionally warm up) the retriever off the event loop;
+        failures are retried on first use"""
+        self._loading = True
+        try:
+            retriever = await asyncio.to_thread(self.get)
+            if embedding_workers:
+                await asyncio.to_thread(retriever.start_embedding_pool, embedding_workers)
+            if warm_up and not self._warmed_up:
+                timings = await asyncio.to_thread(retriever.warm_up)
+                self._warmed_up = True
+                logger.info(f"HierarchicalRAG warmed up in {sum(timings.values()):.2f}s total")
+        except Exception as e:
+            self._error = str(e)
+            logger.error(f"Background HierarchicalRAG initialization failed: {e}")
+        finally:
+            self._loading = False
+    
+    def readiness(self, require_warm_up: bool = False) -> Dict[str, Any]:
+        """Readiness state with per-component cold-start timings"""
+        instance = self._instance
+        ready = instance is not None and (self._warmed_up or not require_warm_up)
+        if ready:
+            status = "ready"
+        elif self._loading or instance is not None:
+            status = "loading"
+        elif self._error:
+            status = "failed"
+        else:
+            status = "not_loaded"
+        timings = instance.startup_timings if instance is not None else {}
+        return {
+            "ready": ready,
+            "status": status,
+            "components": {name: {"seconds": round(seconds, 4)} for name, seconds in timings.items()},
+            "total_seconds": round(sum(timings.values()), 4),
+            "error": self._error
+        }
+    
+    def close(self):
+        with self._lock:
+            if self._instance is not None:
+                self._instance.close()
+                self._instance = None
+                self._warmed_up = False
+
+# Global shared retriever instance
+shared_retriever = SharedRetriever()
+
+def get_rag_retriever() -> HierarchicalRAG:
+    """Dependency providing the shared retriever.
+    
+    Declared sync so FastAPI runs it in the threadpool, keeping a first-use
+    model load off the event loop.
+    """
+    return shared_retriever.get()
@@ -0,0 +1,114 @@
+from typing import Dict, Iterable, Tuple
+import logging
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from models.schemas import RAGStore, RAGStoreStats, RAGLevel
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# level -> (store count, content size)
+StoreStats = Dict[RAGLevel, Tuple[int, int]]
+
+def get_store_stats(db: Session) -> StoreStats:
+    """Store count and content size per level.
+
+    Reads the maintained counters table when RAG_STATS_COUNTERS is enabled,
+    so the cost does not grow with the knowledge base; otherwise runs one
+    grouped aggregate over rag_stores.
+    """
+    if settings.RAG_STATS_COUNTERS:
+        rows = db.execute(
+            select(RAGStoreStats.level, RAGStoreStats.store_count, RAGStoreStats.content_size)
+        ).all()
+        if len(rows) == len(RAGLevel):
+            return {level: (count, size) for level, count, size in rows}
+        # Counters were never initialized for this database
+        return rebuild_store_counters(db)
+    return aggregate_store_stats(db)
+
+def aggregate_store_stats(db: Session) -> StoreStats:
+    """COUNT and SUM(LENGTH(content)) grouped by level in a single query"""
+    rows = db.execute(
+        select(
+            RAGStore.level,
+            func.count(RAGStore.id),
+            func.coalesce(func.sum(func.length(RAGStore.content)), 0)
+        ).group_by(RAGStore.level)
+    ).all()
+    stats = {level: (0, 0) for level in RAGLevel}
+    stats.update({level: (count, int(size)) for level, count, size in rows})
+    return stats
+
+def rebuild_store_counters(db: Session) -> StoreStats:
+    """Reset the counters table from a fresh aggregate of rag_stores"""
+    stats = aggregate_store_stats(db)
+    db.query(RAGStoreStats).delete(synchronize_session=False)
+    db.add_all(
+        RAGStoreStats(level=level, store_count=count, content_size=size)
+        for level, (count, size) in stats.items()
+    )
+    db.commit()
+    return stats
+
+def init_store_counters(session_factory=SessionLocal):
+    """Create and reconcile the counters table at startup"""
+    if not settings.RAG_STATS_COUNTERS:
+        return
+    with session_factory() as db:
+        RAGStoreStats.__table__.create(bind=db.get_bind(), checkfirst=True)
+        stats = rebuild_store_counters(db)
+    logger.info(f"RAG store counters initialized ({sum(count for count, _ in stats.values())} stores)")
+
+def count_inserted_stores(db: Session, rows: Iterable[Dict]):
+    """Apply counter deltas for rows added via a bulk INSERT.
+
+    ORM bulk inserts skip mapper events, so callers add the deltas
+    themselves inside the same transaction.
+    """
+    if not settings.RAG_STATS_COUNTERS:
+        return
+    deltas: Dict[RAGLevel, Tuple[int, int]] = {}
+    for row in rows:
+        count, size = deltas.get(row["level"], (0, 0))
+        deltas[row["level"]] = (count + 1, size + len(row.get("content") or ""))
+    connection = db.connection()
+    for level, (count, size) in deltas.items():
+        _apply_delta(connection, level, count, size)
+
+def _apply_delta(connection, level: RAGLevel, count: int, size: int):
+    connection.execute(
+        update(RAGStoreStats)
+        .where(RAGStoreStats.level == level)
+        .values(
+            store_count=RAGStoreStats.store_count + count,
+            content_size=RAGStoreStats.content_size + size
+        )
+    )
+
+@event.listens_for(RAGStore, "after_insert")
+def _count_insert(mapper, connection, target):
+    if settings.RAG_STATS_COUNTERS:
+        _apply_delta(connection, target.level, 1, len(target.content or ""))
+
+@event.listens_for(RAGStore, "after_delete")
+def _count_delete(mapper, connection, target):
+    if settings.RAG_STATS_COUNTERS:
+        _apply_delta(connection, target.level, -1, -len(target.content or ""))
+
+@event.listens_for(RAGStore, "after_update")
+def _count_update(mapper, connection, target):
+    if not settings.RAG_STATS_COUNTERS:
+        return
+    state = inspect(target)
+    level_history = state.attrs.level.history
+    content_history = state.attrs.content.history
+    if not level_history.has_changes() and not content_history.has_changes():
+        return
+    old_level = level_history.deleted[0] if level_history.deleted else target.level
+    old_content = content_history.deleted[0] if content_history.deleted else target.content
+    _apply_delta(connection, old_level, -1, -len(old_content or ""))
+    _apply_delta(connection, target.level, 1, len(target.content or ""))
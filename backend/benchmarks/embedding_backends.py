@@ -0,0 +1,59 @@
+import argparse
+import random
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.rag.embedding_backends import create_embedding_backend, EMBEDDING_BACKENDS
+
+WORDS = (
+    "project crew agent task knowledge report market research analysis plan "
+    "customer product roadmap budget review meeting document summary strategy "
+    "launch feedback metrics quarter revenue hiring design backend frontend"
+).split()
+
+def make_documents(count: int, words: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) + "." for _ in range(count)]
+
+def benchmark(backend, documents, batch_size: int):
+    backend.encode(documents[:batch_size])  # warm-up
+    started = time.perf_counter()
+    vectors = [backend.encode(documents[i:i + batch_size]) for i in range(0, len(documents), batch_size)]
+    elapsed = time.perf_counter() - started
+    return np.concatenate(vectors), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backend throughput and cosine parity against torch")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--onnx-model-path", default=None, help="ONNX file for the onnx backend")
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=60, help="Words per synthetic document")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents, args.words)
+    names = ["torch"] + [name for name in args.backends if name != "torch"]
+
+    reference = None
+    print(f"{'backend':<8} {'docs/s':>10} {'speedup':>8} {'min cos':>8} {'mean cos':>9}")
+    for name in names:
+        backend = create_embedding_backend(name, args.model, args.onnx_model_path)
+        vectors, elapsed = benchmark(backend, documents, args.batch_size)
+        throughput = len(documents) / elapsed
+        if reference is None:
+            reference, baseline = vectors, throughput
+        cosines = (vectors * reference).sum(axis=1) / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+        )
+        print(
+            f"{name:<8} {throughput:>10.1f} {throughput / baseline:>7.2f}x "
+            f"{cosines.min():>8.4f} {cosines.mean():>9.4f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import sys
+import os
+import time
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.rag.embedding_cache import EmbeddingCache
+
+class SyntheticEncoder:
+    """Stand-in for the embedding model returning normalized float32 rows,
+    so the benchmark measures conversion and copy overhead only"""
+
+    def __init__(self, dimension: int):
+        self.rng = np.random.default_rng(7)
+        self.dimension = dimension
+
+    def encode(self, texts):
+        vectors = self.rng.standard_normal((len(texts), self.dimension), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def list_path(encoder, cache, documents, batch_size):
+    """Previous pipeline: every vector becomes a list of Python floats"""
+    embeddings = []
+    for start in range(0, len(documents), batch_size):
+        batch = documents[start:start + batch_size]
+        for text, vector in zip(batch, encoder.encode(batch)):
+            vector = vector.tolist()
+            cache.put(text, vector)
+            embeddings.append(vector)
+    cached = [cache.get(text) for text in documents]
+    return embeddings, [vector.tolist() for vector in cached]
+
+def array_path(encoder, cache, documents, batch_size):
+    """Current pipeline: batches stay float32 arrays, cache hits are shared"""
+    rows = []
+    for start in range(0, len(documents), batch_size):
+        batch = documents[start:start + batch_size]
+        for text, vector in zip(batch, encoder.encode(batch)):
+            cache.put(text, vector)
+            rows.append(vector)
+    cached = [cache.get(text) for text in documents]
+    return np.stack(rows), np.stack(cached)
+
+def measure(path, encoder, documents, batch_size, cache_entries):
+    cache = EmbeddingCache(model_name="benchmark", max_entries=cache_entries)
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = path(encoder, cache, documents, batch_size)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current, peak
+
+def chroma_write(embeddings, documents, batch_size):
+    import chromadb
+
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(f"bench_{time.time_ns()}")
+    ids = [f"doc_{index}" for index in range(len(documents))]
+    started = time.perf_counter()
+    for start in range(0, len(documents), batch_size):
+        collection.add(
+            ids=ids[start:start + batch_size],
+            documents=documents[start:start + batch_size],
+            embeddings=embeddings[start:start + batch_size]
+        )
+    elapsed = time.perf_counter() - started
+    client.delete_collection(collection.name)
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare list-based and numpy embedding pipelines per 10k documents")
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--dimension", type=int, default=384, help="Vector size (384 for all-MiniLM-L6-v2)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--chroma", action="store_true", help="Also time writes into an in-memory Chroma collection")
+    parser.add_argument("--chroma-batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    documents = [f"document {index}" for index in range(args.documents)]
+    scale = 10000 / args.documents
+
+    print(f"{'pipeline':<8} {'ms/10k':>9} {'retained MB':>12} {'peak MB':>9}" + (f" {'chroma ms/10k':>14}" if args.chroma else ""))
+    for name, path in (("list", list_path), ("numpy", array_path)):
+        (embeddings, _), elapsed, current, peak = measure(
+            path, SyntheticEncoder(args.dimension), documents, args.batch_size, args.documents
+        )
+        line = f"{name:<8} {elapsed * 1000 * scale:>9.1f} {current / 2**20:>12.1f} {peak / 2**20:>9.1f}"
+        if args.chroma:
+            line += f" {chroma_write(embeddings, documents, args.chroma_batch_size) * 1000 * scale:>14.1f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import random
+import re
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Index into a throwaway store; settings are read on import
+os.environ["CHROMA_PERSIST_DIRECTORY"] = tempfile.mkdtemp(prefix="hybrid_bench_")
+os.environ["RAG_LEXICAL_INDEX"] = "true"
+
+import numpy as np
+
+import app.rag.retriever as retriever_module
+from app.rag.retriever import HierarchicalRAG
+from models.schemas import RAGLevel
+
+COMPONENTS = "gateway scheduler billing ledger crawler indexer mailer auth-proxy cache-warmer exporter planner webhook".split()
+SYMPTOMS = "timeouts deadlocks memory-leaks retries throttling crashes stale-reads slow-starts disk-pressure bad-certificates".split()
+PHASES = "deployment failover backup migration rollout peak-traffic cold-start reindexing".split()
+ACTIONS = "drain the node, rotate the key, raise the pool size, restart the worker, roll back the release".split(", ")
+
+class HashingEncoder:
+    """Offline stand-in for a sentence embedding model: hashed bag of words
+    that, like most dense models, carries little signal for numeric codes"""
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"[a-z]+", text.lower()):
+                vectors[row, hash(word) % self.dimension] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+
+def make_corpus(count: int, seed: int = 11):
+    rng = random.Random(seed)
+    combos = [(c, s, p) for c in COMPONENTS for s in SYMPTOMS for p in PHASES]
+    rng.shuffle(combos)
+    documents, identifier_queries, topical_queries = [], [], []
+    for index, (component, symptom, phase) in enumerate(combos[:count]):
+        code = f"{rng.choice(['ERR', 'E', 'INC'])}-{rng.randrange(1000, 99999)}-{index}"
+        document = (
+            f"The {component} showed {symptom.replace('-', ' ')} during {phase.replace('-', ' ')}. "
+            f"Operators should {rng.choice(ACTIONS)}. Reference {code}."
+        )
+        documents.append(document)
+        identifier_queries.append((f"what does {code} mean", document))
+        topical_queries.append((
+            f"{component.replace('-', ' ')} {symptom.replace('-', ' ')} in {phase.replace('-', ' ')}", document
+        ))
+    return documents, identifier_queries, topical_queries
+
+def evaluate(search, queries, top_k):
+    hits, latencies = 0, []
+    for query, relevant in queries:
+        started = time.perf_counter()
+        results = search(query)
+        latencies.append(time.perf_counter() - started)
+        hits += relevant in results[:top_k]
+    return hits / len(queries), latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall and latency of vector, BM25 and hybrid RAG search")
+    parser.add_argument("--documents", type=int, default=960, help=f"Up to {len(COMPONENTS) * len(SYMPTOMS) * len(PHASES)}")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per query set")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--encoder", choices=("model", "hashing"), default="model",
+                        help="model: the configured EMBEDDING_BACKEND; hashing: offline bag-of-words stand-in")
+    args = parser.parse_args()
+
+    if args.encoder == "hashing":
+        retriever_module.create_embedding_backend = lambda *_: HashingEncoder()
+    retriever = HierarchicalRAG()
+
+    documents, identifier_queries, topical_queries = make_corpus(args.documents)
+    started = time.perf_counter()
+    asyncio.run(retriever.add_knowledge_batch([
+        {"level": RAGLevel.PROJECT, "entity_id": 1, "content": document} for document in documents
+    ]))
+    print(f"Indexed {len(documents)} documents in {time.perf_counter() - started:.1f}s")
+
+    stored = retriever.project_collection.get(include=["documents"])
+    text_by_id = dict(zip(stored["ids"], stored["documents"]))
+    embeddings = {}
+
+    def embedding(query):
+        # Precomputed so timings cover retrieval only
+        return embeddings[query]
+
+    def vector(query):
+        return retriever._query_level(RAGLevel.PROJECT, 1, embedding(query), args.top_k)
+
+    def bm25(query):
+        return [text_by_id[chunk_id] for chunk_id in retriever.lexical_index.search(query, RAGLevel.PROJECT, 1, args.top_k)]
+
+    def hybrid(query):
+        return retriever._query_level_hybrid(RAGLevel.PROJECT, 1, query, embedding(query), args.top_k)
+
+    query_sets = {
+        "identifier": random.Random(1).sample(identifier_queries, min(args.queries, len(identifier_queries))),
+        "topical": random.Random(2).sample(topical_queries, min(args.queries, len(topical_queries)))
+    }
+    for queries in query_sets.values():
+        for query, _ in queries:
+            embeddings[query] = retriever._embed_query(query)
+
+    print(f"{'mode':<7} {'id R@' + str(args.top_k):>8} {'topic R@' + str(args.top_k):>10} {'p50 ms':>7} {'p95 ms':>7}")
+    for name, search in (("vector", vector), ("bm25", bm25), ("hybrid", hybrid)):
+        recalls, latencies = [], []
+        for queries in query_sets.values():
+            recall, timings = evaluate(search, queries, args.top_k)
+            recalls.append(recall)
+            latencies.extend(timings)
+        print(
+            f"{name:<7} {recalls[0]:>8.3f} {recalls[1]:>10.3f} "
+            f"{np.percentile(latencies, 50) * 1000:>7.2f} {np.percentile(latencies, 95) * 1000:>7.2f}"
+        )
+    retriever.close()
+
+if __name__ == "__main__":
+    main()
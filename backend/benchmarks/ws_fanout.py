@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import json
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.websocket import ConnectionManager, LogMessage, LogType
+
+class NullWebSocket:
+    """Accepts frames without any I/O, so timings cover encoding and dispatch.
+    send_json mirrors Starlette's: json.dumps per call, then a text frame."""
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        pass
+
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+async def per_socket_broadcast(connections, message: LogMessage):
+    """The previous fan-out: every socket serializes the message itself"""
+    await asyncio.gather(*(connection.send_json(message.to_dict()) for connection in connections))
+
+def make_message(index: int) -> LogMessage:
+    return LogMessage(
+        type=LogType.THOUGHT,
+        agent_id=7,
+        agent_name="Market Researcher",
+        crew_id=3,
+        project_id=1,
+        content=f"Step {index}: comparing pricing pages of five competitors before drafting the summary. " * 3,
+        metadata={"step": index, "tools": ["search", "scrape"], "confidence": 0.82}
+    )
+
+async def queued_broadcast(manager: ConnectionManager, message: LogMessage):
+    """The manager's fan-out, including the writer tasks delivering the frame"""
+    await manager.broadcast_to_project(1, message)
+    while any(client.queue_depth for client in manager.clients.values()):
+        await asyncio.sleep(0)
+
+async def measure(sockets: int, broadcasts: int):
+    manager = ConnectionManager()
+    manager._max_connections_per_project = sockets
+    connections = [NullWebSocket() for _ in range(sockets)]
+    for connection in connections:
+        await manager.connect(connection, project_id=1)
+    await asyncio.sleep(0)
+    messages = [make_message(index) for index in range(broadcasts)]
+
+    timings = {}
+    for name, broadcast in (
+        ("per-socket", lambda message: per_socket_broadcast(connections, message)),
+        ("encode-once", lambda message: queued_broadcast(manager, message))
+    ):
+        started = time.process_time()
+        for message in messages:
+            await broadcast(message)
+        timings[name] = (time.process_time() - started) / broadcasts
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU time per live log broadcast by number of subscribed sockets")
+    parser.add_argument("--sockets", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--broadcasts", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'sockets':>7} {'per-socket us':>14} {'encode-once us':>15} {'saved':>6}")
+    for sockets in args.sockets:
+        timings = asyncio.run(measure(sockets, args.broadcasts))
+        before, after = timings["per-socket"], timings["encode-once"]
+        print(f"{sockets:>7} {before * 1e6:>14.0f} {after * 1e6:>15.0f} {1 - after / before:>6.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,37 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from typing import Optional
+import asyncio
 import uvicorn
 from app.api.routes import router
 from app.core.config import settings
 from app.core.database import init_db
-from app.core.websocket import ws_manager
+from app.core.websocket import ws_manager, parse_since
+from app.rag.jobs import ingestion_jobs
+from app.rag.stats import init_store_counters
+from app.rag.retriever import shared_retriever
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await init_db()
+    init_store_counters()
+    await ingestion_jobs.start()
+    # Load (and warm up) the shared retriever without holding up startup;
+    # requests that need it before then load it on first use, and /ready
+    # reports when it is done
+    preload = asyncio.create_task(
+        shared_retriever.preload(
+            warm_up=settings.RAG_WARMUP_ON_STARTUP,
+            embedding_workers=settings.EMBEDDING_PROCESS_WORKERS
+        )
+    ) if settings.RAG_PRELOAD_ON_STARTUP else None
     yield
     # Shutdown
-    pass
+    if preload:
+        preload.cancel()
+    await ingestion_jobs.stop()
+    shared_retriever.close()
 
 app = FastAPI(
     title="MultiAgent Ultra API",
@@ -38,7 +56,7 @@ app.add_middleware(
         "X-Requested-With",
         "X-API-Key"
     ],
-    expose_headers=["X-Total-Count", "X-Page-Count"],
+    expose_headers=["X-Total-Count", "X-Page-Count", "X-Next-Cursor"],
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
@@ -49,15 +67,28 @@ app.include_router(router, prefix="/api/v1")
 async def websocket_endpoint(
     websocket: WebSocket,
     project_id: int = Query(...),
-    user_id: Optional[int] = Query(None)
+    user_id: Optional[int] = Query(None),
+    batch_ms: Optional[int] = Query(
+        None, ge=1, le=settings.WS_BATCH_MAX_INTERVAL_MS,
+        description="Batch messages into JSON array frames flushed at this interval"
+    ),
+    batch_size: Optional[int] = Query(None, ge=1, description="Flush a batch early once this many messages wait"),
+    since: Optional[str] = Query(None, description="Replay buffered messages after this sequence id or ISO timestamp")
 ):
     """WebSocket endpoint for live agent logs and updates"""
-    await ws_manager.connect(websocket, project_id, user_id)
+    try:
+        resume_from = parse_since(since) if since is not None else None
+    except ValueError:
+        await websocket.close(code=1008, reason="since must be a sequence id or an ISO timestamp")
+        return
+    await ws_manager.connect(
+        websocket, project_id, user_id, batch_interval_ms=batch_ms, batch_size=batch_size, since=resume_from
+    )
     try:
         while True:
-            # Keep connection alive and handle incoming messages
+            # Subscription commands from the client
             data = await websocket.receive_text()
-            # For now, just echo back - could handle commands here later
+            await ws_manager.handle_message(websocket, data)
     except WebSocketDisconnect:
         ws_manager.disconnect(websocket)
 
@@ -0,0 +1,33 @@
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.rag.retriever import HierarchicalRAG
+
+def migrate_rag_collections(batch_size: int, delete_source: bool):
+    """Move project/crew/agent knowledge into the unified collection.
+
+    Stored embeddings are copied as-is, so nothing is re-encoded. Set
+    RAG_UNIFIED_COLLECTION=true afterwards to serve reads from it.
+    """
+    retriever = HierarchicalRAG()
+    try:
+        migrated = retriever.migrate_to_unified(batch_size=batch_size, delete_source=delete_source)
+        print("✅ RAG collections migrated to unified_rag")
+        for level, count in migrated.items():
+            print(f"Copied {count} {level} documents")
+        if delete_source:
+            print("Source collections emptied")
+    except Exception as e:
+        print(f"❌ Error migrating RAG collections: {e}")
+        sys.exit(1)
+    finally:
+        retriever.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate per-level RAG collections into the unified collection")
+    parser.add_argument("--batch-size", type=int, default=500, help="Documents copied per Chroma call")
+    parser.add_argument("--delete-source", action="store_true", help="Delete documents from the per-level collections after copying")
+    args = parser.parse_args()
+    migrate_rag_collections(args.batch_size, args.delete_source)
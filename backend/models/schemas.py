@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, JSON, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -17,6 +17,12 @@ class RAGLevel(enum.Enum):
     CREW = "crew"
     AGENT = "agent"
 
+class JobStatus(enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 class Project(Base):
     __tablename__ = "projects"
     
@@ -111,6 +117,18 @@ class RAGStore(Base):
     project = relationship("Project", back_populates="rag_stores")
     crew = relationship("Crew", back_populates="rag_stores")
     agent = relationship("Agent", back_populates="rag_stores")
+    
+    # Keyset pagination order for store listings
+    __table_args__ = (Index("ix_rag_stores_created_at_id", "created_at", "id"),)
+
+class RAGStoreStats(Base):
+    """Per-level RAG store counters, maintained on insert/update/delete"""
+    __tablename__ = "rag_store_stats"
+    
+    level = Column(Enum(RAGLevel), primary_key=True)
+    store_count = Column(Integer, nullable=False, default=0)
+    content_size = Column(Integer, nullable=False, default=0)  # Sum of LENGTH(content)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 class User(Base):
     __tablename__ = "users"
@@ -135,4 +153,29 @@ class KnowledgeBase(Base):
     processed = Column(Boolean, default=False)
     embeddings_created = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    
+    id = Column(String(32), primary_key=True, index=True)  # uuid4 hex
+    kind = Column(String(20), nullable=False)  # upload, bulk
+    status = Column(Enum(JobStatus), default=JobStatus.PENDING, index=True)
+    level = Column(Enum(RAGLevel))
+    entity_id = Column(Integer)
+    project_id = Column(Integer)  # Project whose live log receives progress events
+    filename = Column(String(200))
+    bytes_total = Column(Integer, default=0)
+    bytes_processed = Column(Integer, default=0)
+    items_total = Column(Integer, default=0)
+    items_processed = Column(Integer, default=0)
+    items_failed = Column(Integer, default=0)
+    chunk_count = Column(Integer, default=0)
+    owner_id = Column(String(100))  # host:pid:token of the process running the job
+    heartbeat_at = Column(DateTime(timezone=True))  # Refreshed by the owner while the job is live
+    result = Column(JSON)
+    error_message = Column(Text)
+    started_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -357,6 +357,16 @@ class TestHealthEndpoints:
         assert data["status"] == "healthy"
         assert data["service"] == "MultiAgent Ultra API"
     
+    def test_readiness_probe_before_load(self):
+        """Readiness fails until the shared retriever has loaded"""
+        client = TestClient(app)
+        with patch('app.api.routes.shared_retriever') as mock_shared:
+            mock_shared.readiness.return_value = {"ready": False, "status": "loading", "components": {}}
+            response = client.get("/api/v1/ready")
+        
+        assert response.status_code == 503
+        assert response.json()["status"] == "loading"
+    
     def test_root_endpoint(self):
         """Test root endpoint"""
         client = TestClient(app)
@@ -446,4 +456,60 @@ class TestPagination:
         response = client.get("/api/v1/projects?size=0")
         assert response.status_code == 200
         data = response.json()
-        assert data["size"] == 1  # Should be minimum 1
\ No newline at end of file
+        assert data["size"] == 1  # Should be minimum 1
+
+class TestRAGStorePagination:
+    """Test suite for keyset pagination of RAG store listings"""
+    
+    @pytest.fixture
+    def db_session(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import StaticPool
+        from models.schemas import Base, RAGStore, RAGLevel
+        
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        db.add(Project(name="Knowledge Project"))
+        db.add_all(
+            RAGStore(level=RAGLevel.PROJECT, name=f"Store {i}", content=f"content {i}", project_id=1)
+            for i in range(5)
+        )
+        db.commit()
+        yield db
+        db.close()
+    
+    @pytest.fixture
+    def client(self, db_session):
+        app.dependency_overrides[get_db] = lambda: db_session
+        client = TestClient(app)
+        yield client
+        app.dependency_overrides.clear()
+    
+    def test_cursor_walks_all_stores_without_content(self, client):
+        """Pages follow X-Next-Cursor and omit content by default"""
+        ids = []
+        params = {"limit": 2}
+        while True:
+            response = client.get("/api/v1/rag/stores", params=params)
+            assert response.status_code == 200
+            assert response.headers["X-Total-Count"] == "5"
+            assert all("content" not in store for store in response.json())
+            ids += [store["id"] for store in response.json()]
+            if "X-Next-Cursor" not in response.headers:
+                break
+            params["cursor"] = response.headers["X-Next-Cursor"]
+        
+        assert ids == [5, 4, 3, 2, 1]
+    
+    def test_detailed_field_projection(self, client):
+        """Only requested fields (plus id and created_at) are returned"""
+        response = client.get("/api/v1/rag/stores/detailed?fields=content,project_name&limit=1")
+        
+        assert response.status_code == 200
+        store = response.json()[0]
+        assert set(store) == {"id", "content", "created_at", "project_name"}
+        assert store["project_name"] == "Knowledge Project"
+        
+        assert client.get("/api/v1/rag/stores?fields=unknown").status_code == 400
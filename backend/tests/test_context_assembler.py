@@ -0,0 +1,74 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from app.rag.chunking import estimate_tokens
+from app.rag.context_assembler import ContextAssembler
+from models.schemas import RAGLevel
+
+
+def passage(level, text, score, embedding=None):
+    return {"id": f"{level}-{text}", "level": level, "text": text, "score": score, "embedding": embedding}
+
+
+class TestContextAssembler:
+    """Test suite for token-budgeted agent context assembly"""
+
+    def test_packs_best_passages_under_budget(self):
+        """Higher scored passages win; a smaller one still fills leftover budget"""
+        long_text = " ".join(["word"] * 40)
+        assembler = ContextAssembler(Mock(), token_budget=50, candidates_per_level=5, duplicate_similarity=0.95)
+
+        context = assembler.pack([
+            passage("project", "low relevance note", 0.1),
+            passage("crew", long_text, 0.9),
+            passage("agent", " ".join(["other"] * 40), 0.8),
+        ])
+
+        assert [p["text"] for p in context.passages] == [long_text, "low relevance note"]
+        assert context.tokens_used <= 50
+        assert context.over_budget == 1
+        assert context.tokens_by_level == {
+            "project": estimate_tokens("low relevance note"),
+            "crew": estimate_tokens(long_text),
+            "agent": 0
+        }
+
+    def test_near_identical_passages_are_kept_once(self):
+        """Duplicates across levels are dropped by text and by embedding similarity"""
+        assembler = ContextAssembler(Mock(), token_budget=500, candidates_per_level=5, duplicate_similarity=0.95)
+
+        context = assembler.pack([
+            passage("project", "Use the EU region.", 0.7, [1.0, 0.0]),
+            passage("agent", "Use the  EU region.", 0.7, [0.0, 1.0]),
+            passage("crew", "Deploy to the EU region only.", 0.6, [0.99, 0.05]),
+            passage("crew", "Budget is fixed.", 0.5, [0.0, 1.0]),
+        ])
+
+        # On a score tie the agent copy wins; the project copy repeats its text and
+        # "Budget is fixed." repeats its embedding
+        assert [p["level"] for p in context.passages] == ["agent", "crew"]
+        assert context.duplicates == 2
+
+    def test_render_and_usage(self):
+        assembler = ContextAssembler(Mock(), token_budget=100, candidates_per_level=5, duplicate_similarity=0.95)
+
+        context = assembler.pack([passage("crew", "Crew fact.", 0.4)])
+
+        rendered = context.render()
+        assert rendered.startswith("PROJECT CONTEXT:\nNo project context available.")
+        assert "CREW CONTEXT:\nCrew fact." in rendered
+        assert context.usage()["tokens_by_level"]["crew"] == estimate_tokens("Crew fact.")
+        assert context.usage()["budget"] == 100
+
+    @pytest.mark.asyncio
+    async def test_assemble_queries_each_known_level(self):
+        retriever = Mock()
+        retriever.retrieve_passages = AsyncMock(return_value=[])
+        assembler = ContextAssembler(retriever, token_budget=100, candidates_per_level=4, duplicate_similarity=0.95)
+
+        context = await assembler.assemble("Researcher. Find prices", project_id=1, crew_id=None, agent_id=3)
+
+        levels = [call.args[0] for call in retriever.retrieve_passages.call_args_list]
+        assert levels == [RAGLevel.PROJECT, RAGLevel.AGENT]
+        assert retriever.retrieve_passages.call_args_list[0].args[3] == 4
+        assert context.tokens_used == 0
@@ -19,8 +19,13 @@ class TestCrewAIManager:
     @pytest.fixture
     def crew_manager(self, mock_db):
         """Create CrewAI manager instance"""
-        with patch('app.crew.manager.HierarchicalRAG'):
-            manager = CrewAIManager(mock_db, max_active_crews=5, cleanup_interval=60)
+        def create_task(coroutine):
+            # No event loop runs in a sync fixture; hand back a stand-in task
+            coroutine.close()
+            return Mock()
+        
+        with patch('app.crew.manager.asyncio.create_task', side_effect=create_task):
+            manager = CrewAIManager(mock_db, max_active_crews=5, cleanup_interval=60, rag_retriever=Mock())
             return manager
     
     @pytest.fixture
@@ -88,20 +93,59 @@ class TestCrewAIManager:
         # Mock database query
         mock_db.query.return_value.options.return_value.filter.return_value.first.return_value = sample_crew_model
         
-        # Mock RAG context methods
-        crew_manager.rag_retriever.get_project_context = AsyncMock(return_value="Project context")
-        crew_manager.rag_retriever.get_crew_context = AsyncMock(return_value="Crew context")
+        agent_model = Mock(spec=AgentModel)
+        agent_model.id = 7
+        agent_model.role = "Researcher"
+        agent_model.goal = "Find pricing data"
+        sample_crew_model.agents = [agent_model]
+        
+        # Mock RAG passages, one per level
+        crew_manager.rag_retriever.retrieve_passages = AsyncMock(side_effect=lambda level, entity_id, query, top_k: [
+            {"id": f"{level.value}-1", "level": level.value, "text": f"{level.value} notes", "score": 0.5}
+        ])
         
-        # Mock crew creation
-        with patch('app.crew.manager.Crew') as mock_crew_class:
+        # Mock crew and agent creation
+        with patch('app.crew.manager.Crew') as mock_crew_class, \
+             patch.object(crew_manager, '_create_agent_from_db', AsyncMock(return_value=Mock())) as create_agent:
             mock_crew_instance = Mock()
             mock_crew_class.return_value = mock_crew_instance
             
             result = await crew_manager.create_crew_from_db(1)
             
             assert result == mock_crew_instance
-            crew_manager.rag_retriever.get_project_context.assert_called_once_with(1)
-            crew_manager.rag_retriever.get_crew_context.assert_called_once_with(1)
+            assert crew_manager.rag_retriever.retrieve_passages.await_count == 3
+            context = create_agent.call_args[0][1]
+            assert "crew notes" in context.render()
+            assert crew_manager.active_crews[1].context_usage[7]["tokens_by_level"]["agent"] > 0
+    
+    @pytest.mark.asyncio
+    async def test_shared_retriever_taken_on_first_use(self, mock_db, sample_crew_model):
+        """Building a manager does not load the retriever; the first crew takes the shared one"""
+        retriever = Mock()
+        retriever.retrieve_passages = AsyncMock(return_value=[])
+        agent_model = Mock(spec=AgentModel)
+        agent_model.id = 7
+        agent_model.role = "Researcher"
+        agent_model.goal = "Find pricing data"
+        sample_crew_model.agents = [agent_model]
+        mock_db.query.return_value.options.return_value.filter.return_value.first.return_value = sample_crew_model
+        
+        with patch('app.crew.manager.shared_retriever') as shared:
+            shared.get.return_value = retriever
+            manager = CrewAIManager(mock_db)
+            shared.get.assert_not_called()
+            
+            with patch('app.crew.manager.Crew'), \
+                 patch.object(manager, '_get_manager_llm', return_value=None), \
+                 patch.object(manager, '_create_agent_from_db', AsyncMock(return_value=Mock())):
+                await manager.create_crew_from_db(1)
+                await manager.create_crew_from_db(1)
+            await manager.shutdown()
+        
+        shared.get.assert_called_once()
+        assert manager.rag_retriever is retriever
+        # Project, crew and agent level for each of the two builds
+        assert retriever.retrieve_passages.await_count == 6
     
     @pytest.mark.asyncio
     async def test_get_crew_status_not_found(self, crew_manager, mock_db):
@@ -218,10 +262,9 @@ class TestCrewAIManager:
         mock_crew2.cleanup = Mock()
         crew_manager.active_crews[2] = CrewActivity(mock_crew2)
         
-        # Mock cleanup task
-        crew_manager._cleanup_task = Mock()
-        crew_manager._cleanup_task.done.return_value = False
-        crew_manager._cleanup_task.cancel = Mock()
+        # Running cleanup task
+        crew_manager._cleanup_task = asyncio.ensure_future(asyncio.sleep(3600))
+        await asyncio.sleep(0)
         
         await crew_manager.shutdown()
         
@@ -229,7 +272,7 @@ class TestCrewAIManager:
         assert len(crew_manager.active_crews) == 0
         mock_crew1.cleanup.assert_called_once()
         mock_crew2.cleanup.assert_called_once()
-        crew_manager._cleanup_task.cancel.assert_called_once()
+        assert crew_manager._cleanup_task.cancelled()
 
 
 class TestCrewManagerIntegration:
@@ -238,7 +281,7 @@ class TestCrewManagerIntegration:
     @pytest.mark.asyncio
     async def test_full_workflow(self):
         """Test complete workflow from creation to cleanup"""
-        with patch('app.crew.manager.HierarchicalRAG') as mock_rag:
+        with patch('app.crew.manager.shared_retriever') as mock_rag:
             mock_db = Mock(spec=Session)
             manager = CrewAIManager(mock_db, max_active_crews=2, cleanup_interval=1)
             
@@ -250,9 +293,8 @@ class TestCrewManagerIntegration:
             
             mock_db.query.return_value.options.return_value.filter.return_value.first.return_value = crew_model
             
-            mock_rag_instance = mock_rag.return_value
-            mock_rag_instance.get_project_context = AsyncMock(return_value="context")
-            mock_rag_instance.get_crew_context = AsyncMock(return_value="context")
+            mock_rag_instance = mock_rag.get.return_value
+            mock_rag_instance.retrieve_passages = AsyncMock(return_value=[])
             
             with patch('app.crew.manager.Crew') as mock_crew_class:
                 mock_crew = Mock()
@@ -0,0 +1,96 @@
+import pytest
+import numpy as np
+import torch
+from unittest.mock import patch
+
+from app.rag.embedding_backends import create_embedding_backend, mean_pool, EmbeddingBackend, TorchBackend
+
+PARITY_TEXTS = [
+    "The crew reviews the quarterly marketing plan.",
+    "Agents share project knowledge through hierarchical retrieval.",
+    "Python code for parsing uploaded markdown documents",
+    "Wie viele Aufgaben hat das Projekt?",
+    "short",
+]
+
+
+class TinyEncoder(torch.nn.Module):
+    """Stand-in SentenceTransformer with a single Linear layer"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.linear = torch.nn.Linear(4, 3)
+    
+    def encode(self, texts):
+        with torch.no_grad():
+            return self.linear(torch.ones(len(texts), 4)).numpy()
+
+
+class TestEmbeddingBackends:
+    """Test suite for pluggable embedding backends"""
+    
+    def test_mean_pool_ignores_padding(self):
+        """Padded positions do not affect the pooled, normalized vector"""
+        hidden = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]], dtype=np.float32)
+        mask = np.array([[1, 1, 0]])
+        
+        pooled = mean_pool(hidden, mask)
+        
+        assert pooled.dtype == np.float32
+        np.testing.assert_allclose(pooled, [[1.0, 0.0]])
+    
+    def test_int8_backend_quantizes_linear_layers(self):
+        with patch('app.rag.embedding_backends.SentenceTransformer', TinyEncoder):
+            backend = create_embedding_backend("int8", "tiny")
+        
+        assert backend.name == "int8"
+        assert isinstance(backend.model.linear, torch.ao.nn.quantized.dynamic.Linear)
+        assert backend.encode(["a", "b"]).shape == (2, 3)
+    
+    def test_torch_backend_normalizes_rows(self):
+        """Backends without a Normalize module still return unit vectors"""
+        with patch('app.rag.embedding_backends.SentenceTransformer', TinyEncoder):
+            backend = create_embedding_backend("torch", "tiny")
+        
+        vectors = backend.encode(["a", "b"])
+        
+        assert vectors.dtype == np.float32
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), [1.0, 1.0], rtol=1e-6)
+    
+    def test_backend_must_implement_encode(self):
+        with pytest.raises(TypeError):
+            EmbeddingBackend()
+    
+    def test_unknown_backend_rejected(self):
+        with pytest.raises(ValueError, match="Unknown embedding backend"):
+            create_embedding_backend("tpu", "all-MiniLM-L6-v2")
+
+
+class TestBackendParity:
+    """Cosine parity of the alternative backends against float32 torch.
+    
+    Needs the real all-MiniLM-L6-v2 weights; skipped when they cannot be loaded.
+    """
+    
+    @staticmethod
+    def _load(name):
+        try:
+            return create_embedding_backend(name, "all-MiniLM-L6-v2")
+        except Exception as e:
+            pytest.skip(f"{name} backend unavailable: {e}")
+    
+    @pytest.fixture(scope="class")
+    def reference(self):
+        return self._load("torch").encode(PARITY_TEXTS)
+    
+    @pytest.mark.parametrize("backend_name,min_cosine", [("onnx", 0.999), ("int8", 0.98)])
+    def test_cosine_parity(self, reference, backend_name, min_cosine):
+        vectors = self._load(backend_name).encode(PARITY_TEXTS)
+        
+        assert vectors.shape == reference.shape
+        cosines = (vectors * reference).sum(axis=1) / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+        )
+        assert cosines.min() >= min_cosine
+        # Each text keeps its nearest neighbour
+        assert ((vectors @ vectors.T).argsort(axis=1)[:, -2] == (reference @ reference.T).argsort(axis=1)[:, -2]).all()
@@ -0,0 +1,61 @@
+import pytest
+import os
+import numpy as np
+from unittest.mock import Mock
+
+from app.rag.embedding_pool import EmbeddingProcessPool
+
+
+class ProcessTaggingBackend:
+    """Backend whose vectors record the text length and encoding process"""
+    
+    def encode(self, texts):
+        return np.array([[len(text), os.getpid(), 0.5] for text in texts], dtype=np.float32)
+
+
+@pytest.mark.skipif(not EmbeddingProcessPool.supported(), reason="requires the fork start method")
+class TestEmbeddingProcessPool:
+    """Test suite for out-of-process embedding workers"""
+    
+    @pytest.fixture
+    def pool(self):
+        pool = EmbeddingProcessPool(ProcessTaggingBackend(), workers=2)
+        pool.start()
+        yield pool
+        pool.shutdown()
+    
+    def test_encodes_in_worker_processes(self, pool):
+        """Vectors are computed by forked workers and returned as float32 arrays"""
+        vectors = pool.encode(["a", "bbb", "cc"])
+        
+        assert pool.dimension == 3
+        assert vectors.dtype == np.float32
+        np.testing.assert_array_equal(vectors[:, 0], [1, 3, 2])
+        assert os.getpid() not in set(vectors[:, 1].astype(int))
+    
+    def test_shared_memory_is_released(self, pool):
+        """Each call's shared memory block is unlinked afterwards"""
+        before = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+        for _ in range(5):
+            pool.encode(["text"] * 10)
+        after = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+        
+        assert after <= before
+    
+    def test_empty_batch(self, pool):
+        assert pool.encode([]).shape == (0, 3)
+    
+    def test_broken_pool_falls_back_in_process(self, pool):
+        """A dead worker breaks the pool; encodes then run in the calling process"""
+        before = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+        for process in list(pool._executor._processes.values()):
+            process.kill()
+            process.join()
+        
+        vectors = pool.encode(["a", "bb"])
+        
+        np.testing.assert_array_equal(vectors[:, 0], [1, 2])
+        assert set(vectors[:, 1].astype(int)) == {os.getpid()}
+        assert pool.encode(["ccc"])[0, 1] == os.getpid()
+        after = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+        assert after <= before
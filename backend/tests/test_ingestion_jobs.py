@@ -0,0 +1,196 @@
+import pytest
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, Mock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from fastapi import HTTPException
+
+from app.api.endpoints.rag import _replay_bulk_items, _spool_bulk_items, upload_knowledge_file
+from app.rag.jobs import IngestionJobQueue, JobQueueFull
+from models.schemas import IngestionJob, JobStatus, RAGLevel
+
+
+class TestIngestionJobQueue:
+    """Test suite for the background ingestion job queue"""
+    
+    @pytest.fixture
+    def session_factory(self):
+        """In-memory database shared across sessions"""
+        engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+        return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    @pytest.fixture
+    def broadcast(self):
+        with patch('app.rag.jobs.ws_manager.broadcast_to_project', new_callable=AsyncMock) as mock_broadcast:
+            yield mock_broadcast
+    
+    @staticmethod
+    async def _wait_for(queue, job_id, statuses=("completed", "failed")):
+        for _ in range(100):
+            job = queue.get(job_id)
+            if job["status"] in statuses:
+                return job
+            await asyncio.sleep(0.01)
+        raise AssertionError(f"Job {job_id} did not finish")
+    
+    @pytest.mark.asyncio
+    async def test_job_runs_in_background_and_records_result(self, session_factory, broadcast):
+        """Submitting returns immediately; the worker persists progress and result"""
+        queue = IngestionJobQueue(session_factory=session_factory, workers=1, max_pending=5)
+        release = asyncio.Event()
+        
+        async def handler(progress):
+            await progress.update(bytes_processed=50, chunk_count=2)
+            await release.wait()
+            await progress.update(bytes_processed=100, chunk_count=4)
+            return {"vector_id": "doc"}
+        
+        with patch('app.rag.jobs.settings.RAG_INGEST_PROGRESS_INTERVAL_SECONDS', 0):
+            job_id = await queue.submit("upload", handler, level=RAGLevel.PROJECT, entity_id=1, project_id=7, bytes_total=100)
+            running = await self._wait_for(queue, job_id, statuses=("running",))
+            assert running["status"] == "running"
+            
+            release.set()
+            job = await self._wait_for(queue, job_id)
+        await queue.stop()
+        
+        assert job["status"] == "completed"
+        assert job["bytes_processed"] == 100
+        assert job["chunk_count"] == 4
+        assert job["progress"] == 1.0
+        assert job["result"] == {"vector_id": "doc"}
+        assert job["bytes_per_second"] > 0
+        # Progress is pushed to the project's live log
+        assert all(call.args[0] == 7 for call in broadcast.call_args_list)
+        events = [call.args[1].metadata["event"] for call in broadcast.call_args_list]
+        assert events[0] == "ingestion_started" and events[-1] == "ingestion_completed"
+    
+    @pytest.mark.asyncio
+    async def test_failed_job_records_error(self, session_factory, broadcast):
+        """Handler exceptions mark the job failed with the error message"""
+        queue = IngestionJobQueue(session_factory=session_factory, workers=1, max_pending=5)
+        
+        async def handler(progress):
+            raise RuntimeError("embedding backend unavailable")
+        
+        job_id = await queue.submit("upload", handler, level=RAGLevel.CREW, entity_id=3)
+        job = await self._wait_for(queue, job_id)
+        await queue.stop()
+        
+        assert job["status"] == "failed"
+        assert job["error"] == "embedding backend unavailable"
+        broadcast.assert_not_called()  # no project to notify
+    
+    @pytest.mark.asyncio
+    async def test_submit_rejects_when_queue_full(self, session_factory, broadcast):
+        """A full queue raises instead of buffering unbounded work"""
+        queue = IngestionJobQueue(session_factory=session_factory, workers=1, max_pending=1)
+        blocker = asyncio.Event()
+        
+        async def handler(progress):
+            await blocker.wait()
+            return {}
+        
+        await queue.submit("upload", handler, level=RAGLevel.PROJECT, entity_id=1)
+        await asyncio.sleep(0.01)  # first job is picked up by the worker
+        await queue.submit("upload", handler, level=RAGLevel.PROJECT, entity_id=1)
+        with pytest.raises(JobQueueFull):
+            await queue.submit("upload", handler, level=RAGLevel.PROJECT, entity_id=1)
+        
+        blocker.set()
+        await queue.stop()
+    
+    @pytest.mark.asyncio
+    async def test_start_fails_only_abandoned_jobs(self, session_factory, broadcast):
+        """Jobs of a live process sharing the table survive; stale or exited owners' jobs fail"""
+        queue = IngestionJobQueue(session_factory=session_factory, workers=1, max_pending=5)
+        with session_factory() as db:
+            IngestionJob.__table__.create(bind=db.get_bind(), checkfirst=True)
+            now = datetime.utcnow()
+            db.add_all([
+                IngestionJob(id="live", kind="upload", status=JobStatus.RUNNING,
+                             owner_id="elsewhere:1:abc", heartbeat_at=now),
+                IngestionJob(id="stale", kind="upload", status=JobStatus.RUNNING,
+                             owner_id="elsewhere:1:abc", heartbeat_at=now - timedelta(hours=1)),
+                IngestionJob(id="exited", kind="upload", status=JobStatus.PENDING,
+                             owner_id=f"{socket.gethostname()}:999999999:abc", heartbeat_at=now),
+                IngestionJob(id="legacy", kind="bulk", status=JobStatus.PENDING)
+            ])
+            db.commit()
+        
+        await queue.start()
+        await queue.stop()
+        
+        assert queue.get("live")["status"] == "running"
+        for job_id in ("stale", "exited", "legacy"):
+            assert queue.get(job_id)["status"] == "failed"
+    
+    @pytest.mark.asyncio
+    async def test_heartbeat_keeps_own_jobs_alive(self, session_factory, broadcast):
+        queue = IngestionJobQueue(session_factory=session_factory, workers=1, max_pending=5)
+        release = asyncio.Event()
+        
+        async def handler(progress):
+            await release.wait()
+            return {}
+        
+        job_id = await queue.submit("upload", handler, level=RAGLevel.PROJECT, entity_id=1)
+        with session_factory() as db:
+            db.query(IngestionJob).filter(IngestionJob.id == job_id).update(
+                {"heartbeat_at": datetime.utcnow() - timedelta(hours=1)}
+            )
+            db.commit()
+        
+        queue._beat()
+        queue._fail_abandoned_jobs()
+        
+        assert queue.get(job_id)["status"] in ("pending", "running")
+        release.set()
+        assert (await self._wait_for(queue, job_id))["status"] == "completed"
+        await queue.stop()
+
+
+class TestBulkSpool:
+    """Test suite for spooling background bulk inserts to disk"""
+    
+    @pytest.mark.asyncio
+    async def test_spooled_items_replay_in_order(self):
+        async def items():
+            yield {"level": "project", "project_id": 1, "name": "a", "content": "x"}
+            yield ValueError("Invalid JSON: Expecting value")
+            yield {"level": "project", "project_id": 1, "name": "b", "content": "y"}
+        
+        with patch('app.api.endpoints.rag.settings.RAG_UPLOAD_READ_BYTES', 16):
+            path, count, project_ids = await _spool_bulk_items(items())
+            try:
+                replayed = [item async for item in _replay_bulk_items(path)]
+            finally:
+                os.unlink(path)
+        
+        assert count == 3 and project_ids == {1}
+        assert [item["name"] for item in (replayed[0], replayed[2])] == ["a", "b"]
+        assert isinstance(replayed[1], ValueError) and str(replayed[1]) == "Invalid JSON: Expecting value"
+    
+    @pytest.mark.asyncio
+    async def test_failed_upload_removes_spool_file(self, tmp_path):
+        upload = Mock(filename="notes.txt")
+        upload.read = AsyncMock(side_effect=[b"first chunk", ConnectionError("client went away")])
+        
+        with patch('tempfile.tempdir', str(tmp_path)), \
+             patch('app.api.endpoints.rag.ingestion_jobs.submit', new_callable=AsyncMock) as submit:
+            with pytest.raises(HTTPException) as exc_info:
+                await upload_knowledge_file(
+                    file=upload, level=RAGLevel.PROJECT, project_id=1, db=Mock()
+                )
+        
+        assert exc_info.value.status_code == 500
+        submit.assert_not_awaited()
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,170 @@
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+from app.rag.chunking import chunk_text, estimate_tokens, markdown_sections, split_by_tokens, StreamingChunker
+from app.rag.ingestion import ingest_stream
+from models.schemas import RAGLevel
+
+
+class TestChunking:
+    """Test suite for the RAG chunking pipeline"""
+
+    def test_short_text_is_single_chunk(self):
+        """Text under the budget is returned as one chunk"""
+        assert chunk_text("  A short note.  ", chunk_tokens=50, overlap_tokens=5) == ["A short note."]
+
+    def test_empty_text_has_no_chunks(self):
+        assert chunk_text("   \n ") == []
+
+    def test_chunks_respect_token_budget(self):
+        """Every chunk stays within the token budget"""
+        text = " ".join(f"word{i}" for i in range(500))
+        chunks = chunk_text(text, chunk_tokens=50, overlap_tokens=10)
+
+        assert len(chunks) > 1
+        assert all(estimate_tokens(chunk) <= 50 for chunk in chunks)
+
+    def test_consecutive_chunks_overlap(self):
+        """The start of each chunk repeats the tail of the previous one"""
+        words = [f"w{i}" for i in range(100)]
+        chunks = split_by_tokens(" ".join(words), budget=20, overlap=5)
+
+        for previous, current in zip(chunks, chunks[1:]):
+            assert previous.split()[-1] in current.split()
+        # All words survive the split
+        assert set(words) == {word for chunk in chunks for word in chunk.split()}
+
+    def test_prefers_paragraph_breaks(self):
+        """Windows end on a paragraph break when one is available"""
+        first = " ".join(["alpha"] * 30)
+        second = " ".join(["beta"] * 30)
+        chunks = split_by_tokens(f"{first}\n\n{second}", budget=40, overlap=0)
+
+        assert chunks[0] == first
+
+    def test_overlap_must_be_smaller_than_chunk(self):
+        with pytest.raises(ValueError):
+            chunk_text("text", chunk_tokens=10, overlap_tokens=10)
+
+    def test_markdown_sections_follow_heading_path(self):
+        """Sections carry their full heading path; fenced headings are ignored"""
+        text = "# Guide\nIntro\n## Setup\nInstall it\n```\n# not a heading\n```\n# Other\nMore"
+        sections = markdown_sections(text)
+
+        assert sections[0] == ("Guide", "Intro")
+        assert sections[1][0] == "Guide > Setup"
+        assert "# not a heading" in sections[1][1]
+        assert sections[2] == ("Other", "More")
+
+    def test_markdown_chunks_are_prefixed_with_headings(self):
+        """Heading-aware splitting is only applied to markdown"""
+        text = "# Title\nBody one\n# Next\nBody two"
+
+        assert chunk_text(text, file_type=".md") == ["Title\n\nBody one", "Next\n\nBody two"]
+        assert chunk_text(text, file_type=".txt") == [text]
+
+
+class TestStreamingIngestion:
+    """Test suite for incremental chunking and streamed uploads"""
+
+    def test_streaming_chunker_carries_heading_state(self):
+        """Headings seen in earlier windows still prefix later chunks"""
+        chunker = StreamingChunker(".md", chunk_tokens=20, overlap_tokens=2, window_tokens=30)
+        text = "# Manual\n" + "".join(f"Line number {i} here.\n" for i in range(40))
+
+        chunks = []
+        for start in range(0, len(text), 16):
+            chunks.extend(chunker.feed(text[start:start + 16]))
+        chunks.extend(chunker.finish())
+
+        assert len(chunks) > 3
+        assert all(chunk.startswith("Manual\n\n") for chunk in chunks)
+        assert all(estimate_tokens(chunk) <= 20 for chunk in chunks)
+        assert "Line number 39 here." in chunks[-1]
+
+    def test_streaming_chunker_bounds_unbroken_text(self):
+        """Text without whitespace is hard-cut instead of buffered whole"""
+        chunker = StreamingChunker(".txt", chunk_tokens=20, overlap_tokens=2, window_tokens=30)
+        blob = "a" * 20000 + "-b" * 5000
+
+        chunks = []
+        largest = 0
+        for start in range(0, len(blob), 500):
+            chunks.extend(chunker.feed(blob[start:start + 500]))
+            largest = max(largest, len(chunker._buffer))
+        chunks.extend(chunker.finish())
+
+        assert largest < 30 * 32
+        assert "".join(chunks) == blob
+
+    def test_streaming_chunker_overlaps_across_windows(self):
+        """The first chunk of a window repeats the end of the previous window"""
+        chunker = StreamingChunker(".txt", chunk_tokens=20, overlap_tokens=4, window_tokens=30)
+        text = "".join(f"Line number {i} here.\n" for i in range(40))
+
+        chunks = []
+        windows = []
+        for start in range(0, len(text), 16):
+            emitted = chunker.feed(text[start:start + 16])
+            if emitted:
+                windows.append(emitted)
+            chunks.extend(emitted)
+        chunks.extend(chunker.finish())
+
+        assert len(windows) > 2
+        for previous, following in zip(windows, windows[1:]):
+            assert previous[-1].endswith(following[0].splitlines()[0])
+        assert all(estimate_tokens(chunk) <= 20 for chunk in chunks)
+
+    @staticmethod
+    def _reader(data: bytes):
+        """Async reader over bytes that records requested sizes"""
+        position = {"offset": 0, "sizes": []}
+
+        async def read(size):
+            position["sizes"].append(size)
+            chunk = data[position["offset"]:position["offset"] + size]
+            position["offset"] += len(chunk)
+            return chunk
+        return read, position
+
+    @pytest.mark.asyncio
+    async def test_ingest_stream_reads_in_fixed_chunks(self):
+        """Uploads are consumed in bounded reads and written in batches"""
+        data = ("Grüße aus der Wissensbasis. " * 400).encode("utf-8")
+        read, position = self._reader(data)
+        retriever = Mock()
+        retriever.new_document_id.return_value = "project_1_1_abc"
+        retriever.add_chunks = AsyncMock(side_effect=lambda level, entity_id, doc_id, chunks, **kwargs: len(chunks))
+        progress = AsyncMock()
+
+        with patch('app.rag.ingestion.settings.RAG_UPLOAD_READ_BYTES', 1024), \
+             patch('app.rag.ingestion.settings.EMBEDDING_BATCH_MAX_SIZE', 4):
+            result = await ingest_stream(retriever, read, RAGLevel.PROJECT, 1, ".txt", progress_callback=progress)
+
+        assert set(position["sizes"]) == {1024}
+        assert result["bytes_processed"] == len(data)
+        assert result["content_length"] == len(data.decode("utf-8"))
+        assert result["chunk_count"] == sum(len(c.args[3]) for c in retriever.add_chunks.call_args_list)
+        assert all(len(c.args[3]) <= 4 for c in retriever.add_chunks.call_args_list)
+        # Chunk indexes continue across batches
+        assert [c.kwargs["start_index"] for c in retriever.add_chunks.call_args_list][:2] == [0, 4]
+        # Only the last batch is final, so the chunk count gets recorded
+        assert [c.kwargs["final"] for c in retriever.add_chunks.call_args_list][-2:] == [False, True]
+        assert progress.call_args[0][0]["done"] is True
+
+    @pytest.mark.asyncio
+    async def test_ingest_stream_cleans_up_on_failure(self):
+        """Chunks written before an error are removed again"""
+        read, _ = self._reader(("Some sentence to embed. " * 400).encode("utf-8"))
+        retriever = Mock()
+        retriever.new_document_id.return_value = "project_1_1_abc"
+        retriever.add_chunks = AsyncMock(side_effect=[4, RuntimeError("vector store down")])
+        retriever.delete_knowledge = AsyncMock()
+
+        with patch('app.rag.ingestion.settings.RAG_UPLOAD_READ_BYTES', 1024), \
+             patch('app.rag.ingestion.settings.EMBEDDING_BATCH_MAX_SIZE', 4):
+            with pytest.raises(RuntimeError, match="vector store down"):
+                await ingest_stream(retriever, read, RAGLevel.PROJECT, 1, ".txt")
+
+        retriever.delete_knowledge.assert_awaited_once_with("project_1_1_abc", RAGLevel.PROJECT)
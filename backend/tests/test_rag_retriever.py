@@ -3,11 +3,22 @@ import asyncio
 import uuid
 from unittest.mock import Mock, AsyncMock, patch, MagicMock
 import threading
+import time
+import numpy as np
 
-from app.rag.retriever import HierarchicalRAG
+from app.rag.retriever import HierarchicalRAG, SharedRetriever
+from app.rag.embedding_batcher import EmbeddingBatcher
+from app.rag.embedding_cache import EmbeddingCache
+from app.rag.query_cache import QueryResultCache
+from app.rag.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+from app.rag.diversity import mmr_select
 from models.schemas import RAGLevel
 
 
+# The mocked model's [0.1, 0.2, 0.3] rows as stored, after the backend L2-normalizes them
+STORED_EMBEDDING = np.array([0.1, 0.2, 0.3]) / np.linalg.norm([0.1, 0.2, 0.3])
+
+
 class TestHierarchicalRAG:
     """Test suite for Hierarchical RAG system"""
     
@@ -23,8 +34,8 @@ class TestHierarchicalRAG:
     def mock_sentence_transformer(self):
         """Mock SentenceTransformer"""
         mock_transformer = Mock()
-        # Mock embedding as list of floats
-        mock_transformer.encode.return_value = [[0.1, 0.2, 0.3]]
+        # Mock embedding as list of floats, one row per input text
+        mock_transformer.encode.side_effect = lambda texts, **kwargs: [[0.1, 0.2, 0.3] for _ in texts]
         return mock_transformer
     
     @pytest.fixture
@@ -33,7 +44,8 @@ class TestHierarchicalRAG:
         mock_client, mock_collection = mock_chroma_client
         
         with patch('app.rag.retriever.chromadb.PersistentClient', return_value=mock_client), \
-             patch('app.rag.retriever.SentenceTransformer', return_value=mock_sentence_transformer):
+             patch('app.rag.embedding_backends.SentenceTransformer', return_value=mock_sentence_transformer), \
+             patch('app.rag.retriever.settings.RAG_LEXICAL_INDEX', False):
             
             retriever = HierarchicalRAG()
             retriever.project_collection = mock_collection
@@ -45,7 +57,8 @@ class TestHierarchicalRAG:
     def test_initialization(self):
         """Test RAG system initialization"""
         with patch('app.rag.retriever.chromadb.PersistentClient') as mock_client_class, \
-             patch('app.rag.retriever.SentenceTransformer') as mock_transformer_class:
+             patch('app.rag.embedding_backends.SentenceTransformer') as mock_transformer_class, \
+             patch('app.rag.retriever.settings.RAG_LEXICAL_INDEX', False):
             
             mock_client = Mock()
             mock_client_class.return_value = mock_client
@@ -78,7 +91,7 @@ class TestHierarchicalRAG:
             call_args = mock_collection.add.call_args
             
             assert call_args[1]["documents"] == ["Test project knowledge"]
-            assert call_args[1]["embeddings"] == [[0.1, 0.2, 0.3]]
+            np.testing.assert_allclose(call_args[1]["embeddings"], [STORED_EMBEDDING], rtol=1e-6)
             assert call_args[1]["metadatas"][0]["entity_id"] == 1
             assert call_args[1]["metadatas"][0]["level"] == "project"
             assert call_args[1]["metadatas"][0]["source"] == "test"
@@ -88,6 +101,146 @@ class TestHierarchicalRAG:
             assert doc_id.startswith("project_1_")
             assert len(doc_id.split("_")) == 4  # level_entity_timestamp_uuid
     
+    @pytest.mark.asyncio
+    async def test_add_knowledge_chunks_long_content(self, rag_retriever):
+        """Long content is stored as several chunk vectors sharing a parent id"""
+        retriever, mock_collection = rag_retriever
+        
+        with patch('app.rag.retriever.settings.RAG_CHUNK_TOKENS', 20), \
+             patch('app.rag.retriever.settings.RAG_CHUNK_OVERLAP_TOKENS', 5):
+            doc_id = await retriever.add_knowledge(
+                level=RAGLevel.CREW,
+                entity_id=2,
+                content=" ".join(f"token{i}" for i in range(100))
+            )
+        
+        call_args = mock_collection.add.call_args[1]
+        chunk_count = len(call_args["documents"])
+        assert chunk_count > 1
+        assert len(call_args["embeddings"]) == chunk_count
+        assert call_args["ids"] == [f"{doc_id}:{i}" for i in range(chunk_count)]
+        assert all(m["parent_id"] == doc_id and m["chunk_count"] == chunk_count for m in call_args["metadatas"])
+        # All chunk embeddings went through a single batched model call
+        assert retriever.embedding_model.model.encode.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_add_chunks_matches_add_knowledge_records(self, rag_retriever):
+        """Streamed batches get the same ids and metadata as add_knowledge"""
+        retriever, mock_collection = rag_retriever
+        
+        await retriever.add_chunks(RAGLevel.CREW, 2, "doc", ["only chunk"], final=True)
+        call_args = mock_collection.add.call_args[1]
+        assert call_args["ids"] == ["doc"]
+        assert call_args["metadatas"][0]["chunk_count"] == 1
+        
+        await retriever.add_chunks(RAGLevel.CREW, 2, "big", ["a", "b"], metadata={"source": "upload"})
+        assert mock_collection.add.call_args[1]["ids"] == ["big:0", "big:1"]
+        assert "chunk_count" not in mock_collection.add.call_args[1]["metadatas"][0]
+        
+        await retriever.add_chunks(RAGLevel.CREW, 2, "big", ["c"], start_index=2, final=True)
+        call_args = mock_collection.add.call_args[1]
+        assert call_args["ids"] == ["big:2"]
+        assert call_args["metadatas"][0]["chunk_count"] == 3
+        mock_collection.update.assert_called_once_with(
+            ids=["big:0", "big:1"], metadatas=[{"chunk_count": 3}, {"chunk_count": 3}]
+        )
+    
+    @pytest.mark.asyncio
+    async def test_add_knowledge_batch_single_write_per_collection(self, rag_retriever):
+        """Bulk adds embed once and write each collection in one call"""
+        retriever, mock_collection = rag_retriever
+        mock_sentence_transformer = retriever.embedding_model.model
+        items = [
+            {"level": RAGLevel.PROJECT, "entity_id": 1, "content": f"Bulk document {i}", "metadata": {"source": "bulk"}}
+            for i in range(5)
+        ]
+        
+        results = await retriever.add_knowledge_batch(items)
+        
+        assert all(result.startswith("project_1_") for result in results)
+        assert len(set(results)) == 5
+        assert mock_sentence_transformer.encode.call_count == 1
+        mock_collection.add.assert_called_once()
+        call_args = mock_collection.add.call_args[1]
+        assert call_args['ids'] == results
+        assert all(meta['source'] == "bulk" for meta in call_args['metadatas'])
+    
+    @pytest.mark.asyncio
+    async def test_add_knowledge_batch_reports_failed_writes(self, rag_retriever):
+        """A failed collection write fails only the items in that write"""
+        retriever, mock_collection = rag_retriever
+        mock_collection.add.side_effect = [None, Exception("write failed")]
+        items = [
+            {"level": RAGLevel.PROJECT, "entity_id": 1, "content": f"Document {i}"}
+            for i in range(4)
+        ]
+        
+        with patch.object(HierarchicalRAG, 'MAX_WRITE_BATCH', 2):
+            results = await retriever.add_knowledge_batch(items)
+        
+        assert all(isinstance(result, str) for result in results[:2])
+        assert all(isinstance(result, Exception) for result in results[2:])
+    
+    def test_warm_up_encodes_and_touches_collections(self, rag_retriever):
+        """Warm-up runs a dummy encode and opens every collection"""
+        retriever, mock_collection = rag_retriever
+        
+        timings = retriever.warm_up()
+        
+        retriever.embedding_model.model.encode.assert_called_once_with(["warm-up"])
+        assert mock_collection.count.call_count == 3
+        assert {"vector_store", "embedding_model", "collections", "warmup_encode", "warmup_collections"} <= set(timings)
+    
+    @pytest.mark.asyncio
+    async def test_ingestion_encodes_use_embedding_pool(self, rag_retriever):
+        """With a process pool attached, document batches go to the pool and
+        queries stay in-process"""
+        retriever, mock_collection = rag_retriever
+        retriever.embedding_pool = Mock()
+        retriever.embedding_pool.encode.side_effect = lambda texts: [[0.4, 0.5, 0.6] for _ in texts]
+        mock_collection.query.return_value = {'documents': [['Result']]}
+        
+        await retriever.add_knowledge(RAGLevel.PROJECT, 1, "Pooled document")
+        await retriever.get_project_context(1, query="in-process query")
+        
+        retriever.embedding_pool.encode.assert_called_once_with(["Pooled document"])
+        np.testing.assert_allclose(mock_collection.add.call_args[1]['embeddings'], [[0.4, 0.5, 0.6]], rtol=1e-6)
+        retriever.embedding_model.model.encode.assert_called_once_with(["in-process query"])
+    
+    @pytest.mark.asyncio
+    async def test_delete_knowledge_removes_all_chunks(self, rag_retriever):
+        """Deleting a document removes its chunks as well as legacy single vectors"""
+        retriever, mock_collection = rag_retriever
+        mock_collection.get.return_value = {
+            'ids': ['crew_2_1_abc:0'],
+            'metadatas': [{'entity_id': 2, 'level': 'crew', 'parent_id': 'crew_2_1_abc'}]
+        }
+        
+        await retriever.delete_knowledge("crew_2_1_abc", RAGLevel.CREW)
+        
+        mock_collection.delete.assert_any_call(ids=["crew_2_1_abc"])
+        mock_collection.delete.assert_any_call(where={"parent_id": "crew_2_1_abc"})
+    
+    @pytest.mark.asyncio
+    async def test_update_knowledge_replaces_chunks(self, rag_retriever):
+        """Updating re-chunks the content and keeps the original metadata"""
+        retriever, mock_collection = rag_retriever
+        mock_collection.get.return_value = {
+            'ids': ['crew_2_1_abc:0'],
+            'metadatas': [{'entity_id': 2, 'level': 'crew', 'source': 'wiki', 'parent_id': 'crew_2_1_abc', 'chunk_index': 0, 'chunk_count': 3}]
+        }
+        
+        await retriever.update_knowledge("crew_2_1_abc", "Replacement text", RAGLevel.CREW)
+        
+        mock_collection.delete.assert_any_call(where={"parent_id": "crew_2_1_abc"})
+        call_args = mock_collection.add.call_args[1]
+        assert call_args["ids"] == ["crew_2_1_abc"]
+        assert call_args["documents"] == ["Replacement text"]
+        assert call_args["metadatas"][0] == {
+            'entity_id': 2, 'level': 'crew', 'source': 'wiki',
+            'parent_id': 'crew_2_1_abc', 'chunk_index': 0, 'chunk_count': 1
+        }
+    
     @pytest.mark.asyncio
     async def test_add_knowledge_thread_safety(self, rag_retriever):
         """Test thread safety of add_knowledge method"""
@@ -178,7 +331,7 @@ class TestHierarchicalRAG:
             mock_collection.query.assert_called_once()
             call_args = mock_collection.query.call_args[1]
             
-            assert call_args['query_embeddings'] == [[0.1, 0.2, 0.3]]
+            np.testing.assert_allclose(call_args['query_embeddings'], [STORED_EMBEDDING], rtol=1e-6)
             assert call_args['n_results'] == 2
             assert call_args['where'] == {'entity_id': 1}
             
@@ -186,6 +339,72 @@ class TestHierarchicalRAG:
             assert "Document 1" in context
             assert "Document 2" in context
     
+    @pytest.mark.asyncio
+    async def test_repeated_context_lookups_are_cached(self, rag_retriever):
+        """Materializing the same crew twice reads each entity's knowledge once"""
+        retriever, mock_collection = rag_retriever
+        mock_collection.get.return_value = {'documents': ['Agent notes']}
+        
+        first = await retriever.get_agent_context(agent_id=7)
+        second = await retriever.get_agent_context(agent_id=7)
+        
+        assert first == second == "Agent notes"
+        mock_collection.get.assert_called_once()
+        assert retriever.query_cache.stats()["hits"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_writes_invalidate_only_the_affected_entity(self, rag_retriever):
+        """Adding knowledge for one agent keeps other agents' results cached"""
+        retriever, mock_collection = rag_retriever
+        mock_collection.get.return_value = {'documents': ['Old notes']}
+        await retriever.get_agent_context(agent_id=7)
+        await retriever.get_agent_context(agent_id=8)
+        
+        await retriever.add_knowledge(level=RAGLevel.AGENT, entity_id=7, content="New notes")
+        mock_collection.get.return_value = {'documents': ['Old notes', 'New notes']}
+        
+        assert await retriever.get_agent_context(agent_id=7) == "Old notes\n\nNew notes"
+        assert await retriever.get_agent_context(agent_id=8) == "Old notes"
+        assert mock_collection.get.call_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_repeated_searches_are_cached_until_delete(self, rag_retriever):
+        """Cross-level searches are served from memory until the entity changes"""
+        retriever, mock_collection = rag_retriever
+        mock_collection.query.return_value = {'documents': [['Hit']]}
+        
+        await retriever.search_across_levels(query="pricing", project_id=1, crew_id=2, diversify=False)
+        results = await retriever.search_across_levels(query=" pricing ", project_id=1, crew_id=2, diversify=False)
+        
+        assert results == {"project": "Hit", "crew": "Hit"}
+        assert mock_collection.query.call_count == 2
+        
+        mock_collection.get.return_value = {'ids': ['crew_2_1_abc'], 'metadatas': [{'entity_id': 2}]}
+        await retriever.delete_knowledge("crew_2_1_abc", RAGLevel.CREW)
+        await retriever.search_across_levels(query="pricing", project_id=1, crew_id=2, diversify=False)
+        
+        # Only the crew level is searched again
+        assert mock_collection.query.call_count == 3
+        assert mock_collection.query.call_args[1]['where'] == {'entity_id': 2}
+    
+    @pytest.mark.asyncio
+    async def test_retrieve_passages_scores_by_cosine_similarity(self, rag_retriever):
+        """Passages carry their embedding and similarity to the query"""
+        retriever, mock_collection = rag_retriever
+        mock_collection.query.return_value = {
+            'ids': [['a', 'b']],
+            'documents': [['Same direction', 'Orthogonal']],
+            'embeddings': [[[0.2, 0.4, 0.6], [0.3, 0.0, -0.1]]]
+        }
+        
+        passages = await retriever.retrieve_passages(RAGLevel.CREW, 2, "budget", top_k=2)
+        
+        assert [p["id"] for p in passages] == ["a", "b"]
+        assert passages[0]["score"] == pytest.approx(1.0, abs=1e-5)
+        assert passages[1]["score"] == pytest.approx(0.0, abs=1e-5)
+        assert passages[0]["level"] == "crew"
+        assert mock_collection.query.call_args[1]['include'] == ["documents", "embeddings"]
+    
     @pytest.mark.asyncio
     async def test_get_project_context_without_query(self, rag_retriever):
         """Test project context retrieval without search query"""
@@ -246,6 +465,180 @@ class TestHierarchicalRAG:
         
         assert "Agent document 1" in context
     
+    @pytest.mark.asyncio
+    async def test_retrieval_runs_on_query_pool(self, rag_retriever):
+        """Query embedding and vector search run off the event loop on the query pool"""
+        retriever, mock_collection = rag_retriever
+        threads = []
+        
+        def query(**kwargs):
+            threads.append(threading.current_thread().name)
+            return {'documents': [['Pooled result']]}
+        
+        mock_collection.query.side_effect = query
+        
+        results = await retriever.search_across_levels(query="pooled", project_id=1, crew_id=2, diversify=False)
+        
+        assert results == {"project": "Pooled result", "crew": "Pooled result"}
+        assert threads and all(name.startswith("rag-query") for name in threads)
+    
+    @pytest.mark.asyncio
+    async def test_search_across_levels_slow_level_degrades_to_empty(self, rag_retriever):
+        """Levels are searched concurrently and a slow level times out to empty"""
+        retriever, mock_collection = rag_retriever
+        
+        def query(**kwargs):
+            if kwargs['where']['entity_id'] == 3:
+                time.sleep(0.5)
+                return {'documents': [['Too late']]}
+            time.sleep(0.1)
+            return {'documents': [[f"Level {kwargs['where']['entity_id']}"]]}
+        
+        mock_collection.query.side_effect = query
+        
+        with patch('app.rag.retriever.settings.RAG_LEVEL_QUERY_TIMEOUT_SECONDS', 0.3):
+            started = time.perf_counter()
+            results = await retriever.search_across_levels(
+                query="fan out", project_id=1, crew_id=2, agent_id=3, diversify=False
+            )
+            elapsed = time.perf_counter() - started
+        
+        assert results == {"project": "Level 1", "crew": "Level 2", "agent": ""}
+        assert elapsed < 0.45  # bounded by the timeout, not the sum of level latencies
+        # Only one query embedding is computed for all levels
+        assert retriever.embedding_model.model.encode.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_unified_search_is_single_pass(self, rag_retriever):
+        """Unified mode answers cross-level search with one query partitioned by level"""
+        retriever, mock_collection = rag_retriever
+        retriever.unified = True
+        retriever.unified_collection = mock_collection
+        
+        mock_collection.query.return_value = {
+            'documents': [['P1', 'C1', 'P2', 'P3', 'P4', 'A1']],
+            'metadatas': [[
+                {'level': 'project'}, {'level': 'crew'}, {'level': 'project'},
+                {'level': 'project'}, {'level': 'project'}, {'level': 'agent'}
+            ]]
+        }
+        
+        results = await retriever.search_across_levels(
+            query="unified", project_id=1, crew_id=2, agent_id=3, diversify=False
+        )
+        
+        mock_collection.query.assert_called_once()
+        where = mock_collection.query.call_args[1]['where']
+        assert {"$and": [{"level": "crew"}, {"entity_id": 2}]} in where["$or"]
+        assert results == {"project": "P1\nP2\nP3", "crew": "C1", "agent": "A1"}
+    
+    @pytest.mark.asyncio
+    async def test_diversified_search_returns_repeats_once(self, rag_retriever):
+        """A passage stored at crew and project level is returned once, at the crew level"""
+        retriever, mock_collection = rag_retriever
+        pools = {
+            1: (['p1', 'p2', 'p3'], ['Shared fact', 'Project fact', 'Project aside'],
+                [[0.1, 0.2, 0.3], [0.3, 0.1, 0.0], [0.0, 0.0, 1.0]]),
+            2: (['c1', 'c2'], ['Shared fact', 'Crew fact'], [[0.1, 0.2, 0.3], [0.0, 1.0, 0.0]])
+        }
+        
+        def query(**kwargs):
+            ids, documents, embeddings = pools[kwargs['where']['entity_id']]
+            return {'ids': [ids], 'documents': [documents], 'embeddings': [embeddings]}
+        
+        mock_collection.query.side_effect = query
+        
+        with patch('app.rag.retriever.settings.RAG_MMR_CANDIDATES', 2):
+            results = await retriever.search_across_levels(query="facts", project_id=1, crew_id=2, diversify=True)
+        
+        assert results["crew"] == "Shared fact\nCrew fact"
+        assert results["project"] == "Project aside\nProject fact"
+        assert mock_collection.query.call_args[1]['n_results'] == 6
+    
+    @pytest.mark.asyncio
+    async def test_diversified_unified_search_is_single_pass(self, rag_retriever):
+        """With both unified mode and MMR on, one query feeds the diversification"""
+        retriever, mock_collection = rag_retriever
+        retriever.unified = True
+        retriever.unified_collection = mock_collection
+        
+        mock_collection.query.return_value = {
+            'ids': [['c1', 'p1', 'c2', 'p2']],
+            'documents': [['Shared fact', 'Shared fact', 'Crew fact', 'Project fact']],
+            'metadatas': [[{'level': 'crew'}, {'level': 'project'}, {'level': 'crew'}, {'level': 'project'}]],
+            'embeddings': [[[0.1, 0.2, 0.3], [0.1, 0.2, 0.3], [0.0, 1.0, 0.0], [0.3, 0.1, 0.0]]]
+        }
+        
+        with patch('app.rag.retriever.settings.RAG_MMR_CANDIDATES', 2):
+            results = await retriever.search_across_levels(query="facts", project_id=1, crew_id=2, diversify=True)
+        
+        mock_collection.query.assert_called_once()
+        assert "embeddings" in mock_collection.query.call_args[1]['include']
+        assert results["crew"] == "Shared fact\nCrew fact"
+        assert results["project"] == "Project fact"
+    
+    @pytest.mark.asyncio
+    async def test_hybrid_search_finds_exact_identifiers(self, rag_retriever, tmp_path):
+        """BM25 surfaces a chunk the vector ranking missed, fetched by id"""
+        retriever, mock_collection = rag_retriever
+        retriever.lexical_index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+        
+        await retriever.add_knowledge(level=RAGLevel.AGENT, entity_id=4, content="Retry on ERR-4031 after a timeout")
+        error_doc = mock_collection.add.call_args[1]["ids"][0]
+        await retriever.add_knowledge(level=RAGLevel.AGENT, entity_id=5, content="ERR-4031 for another agent")
+        
+        mock_collection.query.return_value = {'ids': [['agent_4_other']], 'documents': [['Unrelated text']]}
+        mock_collection.get.return_value = {'ids': [error_doc], 'documents': ['Retry on ERR-4031 after a timeout']}
+        
+        context = await retriever.get_agent_context(agent_id=4, query="err-4031", top_k=2, mode="hybrid")
+        
+        assert set(context.split("\n\n")) == {"Retry on ERR-4031 after a timeout", "Unrelated text"}
+        mock_collection.get.assert_called_once_with(ids=[error_doc], include=["documents"])
+    
+    @pytest.mark.asyncio
+    async def test_hybrid_search_requires_lexical_index(self, rag_retriever):
+        retriever, _ = rag_retriever
+        
+        with pytest.raises(ValueError, match="RAG_LEXICAL_INDEX"):
+            await retriever.search_across_levels(query="x", project_id=1, mode="hybrid")
+    
+    @pytest.mark.asyncio
+    async def test_lexical_index_follows_deletes(self, rag_retriever, tmp_path):
+        retriever, mock_collection = rag_retriever
+        retriever.lexical_index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+        doc_id = await retriever.add_knowledge(level=RAGLevel.CREW, entity_id=2, content="Deploy token XK-77")
+        mock_collection.get.return_value = {'ids': [doc_id], 'metadatas': [{'entity_id': 2}]}
+        
+        await retriever.delete_knowledge(doc_id, RAGLevel.CREW)
+        
+        assert retriever.lexical_index.search("XK-77", RAGLevel.CREW, 2, 5) == []
+    
+    def test_migrate_to_unified_reuses_embeddings(self, rag_retriever):
+        """Migration copies stored vectors and ids without calling the model"""
+        retriever, _ = rag_retriever
+        source = Mock()
+        source.get.side_effect = [
+            {'ids': ['project_1_1_a'], 'documents': ['Doc'], 'metadatas': [{'entity_id': 1}], 'embeddings': [[0.4, 0.5]]},
+            {'ids': []}
+        ]
+        empty = Mock()
+        empty.get.return_value = {'ids': []}
+        retriever.project_collection, retriever.crew_collection, retriever.agent_collection = source, empty, empty
+        unified = Mock()
+        retriever.unified_collection = unified
+        
+        migrated = retriever.migrate_to_unified(batch_size=10)
+        
+        assert migrated == {"project": 1, "crew": 0, "agent": 0}
+        unified.upsert.assert_called_once_with(
+            ids=['project_1_1_a'],
+            documents=['Doc'],
+            embeddings=[[0.4, 0.5]],
+            metadatas=[{'entity_id': 1, 'level': 'project'}]
+        )
+        retriever.embedding_model.model.encode.assert_not_called()
+        source.delete.assert_not_called()
+    
     @pytest.mark.asyncio
     async def test_search_knowledge(self, rag_retriever):
         """Test knowledge search functionality"""
@@ -270,7 +663,7 @@ class TestHierarchicalRAG:
             mock_collection.query.assert_called_once()
             call_args = mock_collection.query.call_args[1]
             
-            assert call_args['query_embeddings'] == [[0.1, 0.2, 0.3]]
+            np.testing.assert_allclose(call_args['query_embeddings'], [STORED_EMBEDDING], rtol=1e-6)
             assert call_args['n_results'] == 2
             assert call_args['where'] == {'level': 'project', 'entity_id': 1}
             
@@ -338,6 +731,286 @@ class TestHierarchicalRAG:
         assert mock_collection.add.call_count == 10
 
 
+class TestEmbeddingBatcher:
+    """Test suite for the micro-batching embedder"""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_batch(self):
+        """Concurrent embeds inside the wait window are encoded together"""
+        encode = Mock(side_effect=lambda texts: [[float(len(t))] for t in texts])
+        batcher = EmbeddingBatcher(encode, max_batch_size=10, max_wait_ms=20)
+        
+        vectors = await asyncio.gather(*(batcher.embed("x" * i) for i in range(1, 5)))
+        
+        encode.assert_called_once_with(["x", "xx", "xxx", "xxxx"])
+        assert vectors == [[1.0], [2.0], [3.0], [4.0]]
+        assert batcher.batches_encoded == 1
+        assert batcher.items_encoded == 4
+    
+    @pytest.mark.asyncio
+    async def test_batches_are_capped_at_max_size(self):
+        """A full batch flushes immediately without waiting for the window"""
+        encode = Mock(side_effect=lambda texts: [[0.0] for _ in texts])
+        batcher = EmbeddingBatcher(encode, max_batch_size=2, max_wait_ms=10_000)
+        
+        vectors = await asyncio.wait_for(batcher.embed_many(["a", "b", "c", "d"]), timeout=1)
+        
+        assert len(vectors) == 4
+        assert [call.args[0] for call in encode.call_args_list] == [["a", "b"], ["c", "d"]]
+    
+    @pytest.mark.asyncio
+    async def test_encoder_errors_propagate_to_all_waiters(self):
+        """Every caller in a failed batch receives the encoder exception"""
+        encode = Mock(side_effect=RuntimeError("model crashed"))
+        batcher = EmbeddingBatcher(encode, max_batch_size=10, max_wait_ms=5)
+        
+        results = await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+        
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+
+class TestEmbeddingCache:
+    """Test suite for the content-hash embedding cache"""
+    
+    def test_hit_after_put_with_normalized_text(self):
+        """Whitespace differences map to the same cache entry"""
+        cache = EmbeddingCache(model_name="test-model", max_entries=10)
+        
+        assert cache.get("hello world") is None
+        cache.put("hello world", [0.5, 0.25])
+        
+        np.testing.assert_array_equal(cache.get("  hello   world\n"), [0.5, 0.25])
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+    
+    def test_get_returns_read_only_float32_array(self):
+        """Hits share the cached array instead of copying it to a list"""
+        cache = EmbeddingCache(model_name="test-model", max_entries=10)
+        source = np.array([0.5, 0.25])
+        cache.put("vector", source)
+        source[0] = 9.0
+        
+        vector = cache.get("vector")
+        assert vector.dtype == np.float32
+        assert not vector.flags.writeable
+        assert cache.get("vector") is vector
+        np.testing.assert_array_equal(vector, [0.5, 0.25])
+    
+    def test_keys_include_model_name(self):
+        """Different models never share cache keys"""
+        assert EmbeddingCache("model-a").make_key("text") != EmbeddingCache("model-b").make_key("text")
+    
+    def test_lru_eviction(self):
+        """Least recently used entries are evicted first"""
+        cache = EmbeddingCache(model_name="test-model", max_entries=2)
+        cache.put("a", [1.0])
+        cache.put("b", [2.0])
+        cache.get("a")
+        cache.put("c", [3.0])
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == [1.0]
+        assert cache.get("c") == [3.0]
+    
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """Vectors written to the memory-mapped tier are readable by a new cache"""
+        cache = EmbeddingCache(model_name="test-model", max_entries=0, persist_directory=str(tmp_path), disk_capacity=4)
+        cache.put("persisted", [0.5, 0.25, 0.125])
+        cache.flush()
+        
+        reopened = EmbeddingCache(model_name="test-model", max_entries=10, persist_directory=str(tmp_path), disk_capacity=4)
+        np.testing.assert_array_equal(reopened.get("persisted"), [0.5, 0.25, 0.125])
+        assert reopened.stats()["disk_hits"] == 1
+
+    
+    def test_disk_tier_shared_between_processes(self, tmp_path):
+        """Caches sharing a directory append to one ring instead of truncating it"""
+        first = EmbeddingCache(model_name="test-model", max_entries=0, persist_directory=str(tmp_path), disk_capacity=4)
+        second = EmbeddingCache(model_name="test-model", max_entries=0, persist_directory=str(tmp_path), disk_capacity=4)
+        first.put("one", [1.0, 0.0])
+        second.put("two", [0.0, 1.0])
+        first.flush()
+        
+        reopened = EmbeddingCache(model_name="test-model", max_entries=0, persist_directory=str(tmp_path), disk_capacity=4)
+        np.testing.assert_array_equal(reopened.get("one"), [1.0, 0.0])
+        np.testing.assert_array_equal(reopened.get("two"), [0.0, 1.0])
+    
+    def test_disk_tier_verifies_key_on_read(self, tmp_path):
+        """A slot reused by another process is a miss, not someone else's vector"""
+        first = EmbeddingCache(model_name="test-model", max_entries=0, persist_directory=str(tmp_path), disk_capacity=1)
+        second = EmbeddingCache(model_name="test-model", max_entries=0, persist_directory=str(tmp_path), disk_capacity=1)
+        first.put("old", [1.0, 0.0])
+        second.put("new", [0.0, 1.0])
+        
+        assert first.get("old") is None
+        np.testing.assert_array_equal(second.get("new"), [0.0, 1.0])
+
+class TestQueryResultCache:
+    """Test suite for the retrieval result cache"""
+    
+    def test_invalidate_drops_only_that_entity(self):
+        cache = QueryResultCache(max_entries=10)
+        crew = cache.make_key(RAGLevel.CREW, 1, "q", 3)
+        agent = cache.make_key(RAGLevel.AGENT, 1, "q", 3)
+        cache.put(crew, ["crew doc"], cache.generation(RAGLevel.CREW, 1))
+        cache.put(agent, ["agent doc"], cache.generation(RAGLevel.AGENT, 1))
+        
+        cache.invalidate(RAGLevel.CREW, 1)
+        
+        assert cache.get(crew) is None
+        assert cache.get(agent) == ["agent doc"]
+        assert cache.stats()["invalidations"] == 1
+    
+    def test_result_read_before_a_write_is_not_stored(self):
+        """A read that overlaps a write cannot re-insert stale results"""
+        cache = QueryResultCache(max_entries=10)
+        key = cache.make_key(RAGLevel.PROJECT, 1, "", 5)
+        generation = cache.generation(RAGLevel.PROJECT, 1)
+        
+        cache.invalidate(RAGLevel.PROJECT, 1)
+        cache.put(key, ["stale"], generation)
+        
+        assert cache.get(key) is None
+    
+    def test_lru_eviction_updates_entity_index(self):
+        cache = QueryResultCache(max_entries=1)
+        first = cache.make_key(RAGLevel.AGENT, 1, "a", 2)
+        second = cache.make_key(RAGLevel.AGENT, 2, "b", 2)
+        cache.put(first, ["one"], cache.generation(RAGLevel.AGENT, 1))
+        cache.put(second, ["two"], cache.generation(RAGLevel.AGENT, 2))
+        
+        assert cache.get(first) is None
+        assert cache.stats()["entities"] == 1
+
+
+class TestLexicalIndex:
+    """Test suite for the BM25 index and rank fusion"""
+    
+    def test_tokenize_keeps_identifiers_whole_and_split(self):
+        assert tokenize("See ERR-4031 in v2.1") == ["see", "err_4031", "err", "4031", "in", "v2_1", "v2", "1"]
+    
+    def test_search_is_scoped_to_entity_and_ranked(self, tmp_path):
+        index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+        index.add(
+            ["a", "b", "c"],
+            ["timeout ERR-4031 ERR-4031", "timeout only", "ERR-4031 elsewhere"],
+            [
+                {"level": "agent", "entity_id": 1},
+                {"level": "agent", "entity_id": 1},
+                {"level": "agent", "entity_id": 2}
+            ]
+        )
+        
+        assert index.search("err-4031 timeout", RAGLevel.AGENT, 1, 5) == ["a", "b"]
+        assert index.search("err-4031", RAGLevel.AGENT, 2, 5) == ["c"]
+    
+    def test_index_persists_and_deletes_by_parent(self, tmp_path):
+        path = str(tmp_path / "lexical.sqlite3")
+        index = LexicalIndex(path)
+        index.add(["doc:0", "doc:1"], ["alpha", "beta"], [
+            {"level": "project", "entity_id": 3, "parent_id": "doc"},
+            {"level": "project", "entity_id": 3, "parent_id": "doc"}
+        ])
+        index.close()
+        
+        reopened = LexicalIndex(path)
+        assert reopened.search("beta", RAGLevel.PROJECT, 3, 5) == ["doc:1"]
+        reopened.delete_document("doc")
+        assert reopened.count() == 0
+    
+    def test_reciprocal_rank_fusion(self):
+        """Items ranked by both lists beat items ranked by only one"""
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "b", "d"]], k=60)
+        
+        assert fused == ["c", "b", "a", "d"]
+        assert reciprocal_rank_fusion([["a", "b"], ["b"]], limit=1) == ["b"]
+
+
+class TestMMR:
+    """Test suite for maximal marginal relevance selection"""
+    
+    def test_near_duplicates_give_way_to_distinct_passages(self):
+        passages = [
+            {"text": "a", "score": 0.9, "embedding": [1.0, 0.0]},
+            {"text": "a again", "score": 0.89, "embedding": [0.99, 0.1]},
+            {"text": "b", "score": 0.6, "embedding": [0.0, 1.0]},
+        ]
+        
+        picked = mmr_select(passages, 2, lambda_mult=0.7, duplicate_similarity=0.999)
+        
+        assert [p["text"] for p in picked] == ["a", "b"]
+        # Pure relevance keeps the original ranking
+        assert [p["text"] for p in mmr_select(passages, 2, lambda_mult=1.0)] == ["a", "b"]
+        assert [p["text"] for p in mmr_select(passages, 2, lambda_mult=1.0, duplicate_similarity=1.0)] == ["a", "a again"]
+    
+    def test_excluded_embeddings_count_as_picked(self):
+        passages = [
+            {"text": "seen", "score": 0.9, "embedding": [2.0, 0.0]},
+            {"text": "new", "score": 0.5, "embedding": [0.0, 1.0]},
+        ]
+        
+        picked = mmr_select(passages, 2, exclude=[np.array([1.0, 0.0])], duplicate_similarity=0.95)
+        
+        assert [p["text"] for p in picked] == ["new"]
+        assert mmr_select([], 3) == []
+
+
+class TestSharedRetriever:
+    """Test suite for the process-wide retriever"""
+    
+    def test_created_once_on_first_use(self):
+        """Concurrent first uses share a single instance"""
+        factory = Mock(side_effect=lambda: (time.sleep(0.05), Mock())[1])
+        shared = SharedRetriever(factory)
+        
+        assert shared.instance is None
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(shared.get())) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert factory.call_count == 1
+        assert all(result is shared.instance for result in results)
+    
+    @pytest.mark.asyncio
+    async def test_readiness_after_warm_up(self):
+        """Readiness turns ready only after the warm-up stage and reports timings"""
+        retriever = Mock()
+        retriever.startup_timings = {"embedding_model": 1.5, "vector_store": 0.25}
+        retriever.warm_up.side_effect = lambda: retriever.startup_timings.update(warmup_encode=0.5)
+        shared = SharedRetriever(Mock(return_value=retriever))
+        
+        assert shared.readiness(require_warm_up=True)["status"] == "not_loaded"
+        shared.get()
+        assert shared.readiness(require_warm_up=True)["ready"] is False
+        
+        await shared.preload(warm_up=True)
+        report = shared.readiness(require_warm_up=True)
+        
+        assert report["ready"] is True
+        assert report["components"]["warmup_encode"] == {"seconds": 0.5}
+        assert report["total_seconds"] == 2.25
+    
+    @pytest.mark.asyncio
+    async def test_preload_failure_retries_on_first_use(self):
+        """A failed background load does not poison later requests"""
+        factory = Mock(side_effect=[RuntimeError("model download failed"), Mock()])
+        shared = SharedRetriever(factory)
+        
+        await shared.preload()
+        assert shared.instance is None
+        
+        retriever = shared.get()
+        shared.close()
+        
+        retriever.close.assert_called_once()
+        assert shared.instance is None
+
+
 class TestRAGIntegration:
     """Integration tests for RAG system"""
     
@@ -345,7 +1018,8 @@ class TestRAGIntegration:
     async def test_full_knowledge_workflow(self):
         """Test complete knowledge management workflow"""
         with patch('app.rag.retriever.chromadb.PersistentClient') as mock_client_class, \
-             patch('app.rag.retriever.SentenceTransformer') as mock_transformer_class:
+             patch('app.rag.embedding_backends.SentenceTransformer') as mock_transformer_class, \
+             patch('app.rag.retriever.settings.RAG_LEXICAL_INDEX', False):
             
             # Setup mocks
             mock_client = Mock()
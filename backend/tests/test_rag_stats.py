@@ -0,0 +1,65 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.rag.stats import aggregate_store_stats, count_inserted_stores, get_store_stats, init_store_counters
+from models.schemas import Base, RAGLevel, RAGStore
+
+
+class TestRAGStoreStats:
+    """Test suite for RAG store statistics"""
+    
+    @pytest.fixture
+    def session_factory(self):
+        """In-memory database with the application schema"""
+        engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+        Base.metadata.create_all(bind=engine)
+        return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    @staticmethod
+    def _add_stores(db, level, contents):
+        db.add_all(RAGStore(level=level, name=f"{level.value} {i}", content=content) for i, content in enumerate(contents))
+        db.commit()
+    
+    def test_aggregate_is_a_single_grouped_query(self, session_factory):
+        """Counts and content sizes come from one query without loading documents"""
+        with session_factory() as db:
+            self._add_stores(db, RAGLevel.PROJECT, ["abc", "defgh"])
+            self._add_stores(db, RAGLevel.AGENT, ["x", None])
+            
+            statements = []
+            event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+            stats = aggregate_store_stats(db)
+        
+        assert len(statements) == 1
+        assert "GROUP BY" in statements[0]
+        assert stats == {RAGLevel.PROJECT: (2, 8), RAGLevel.CREW: (0, 0), RAGLevel.AGENT: (2, 1)}
+    
+    def test_counters_track_inserts_updates_and_deletes(self, session_factory):
+        """Maintained counters stay equal to a fresh aggregate"""
+        with patch('app.rag.stats.settings.RAG_STATS_COUNTERS', True):
+            with session_factory() as db:
+                self._add_stores(db, RAGLevel.PROJECT, ["seed"])
+            init_store_counters(session_factory)
+            
+            with session_factory() as db:
+                self._add_stores(db, RAGLevel.CREW, ["one", "two"])
+                rows = [{"level": RAGLevel.AGENT, "name": "bulk", "content": "bulk content"}]
+                db.execute(insert(RAGStore), rows)
+                count_inserted_stores(db, rows)
+                db.commit()
+                
+                store = db.query(RAGStore).filter(RAGStore.level == RAGLevel.CREW).first()
+                store.content = "a much longer replacement"
+                db.commit()
+                db.delete(db.query(RAGStore).filter(RAGStore.level == RAGLevel.PROJECT).first())
+                db.commit()
+                
+                assert get_store_stats(db) == aggregate_store_stats(db)
+                assert get_store_stats(db)[RAGLevel.CREW] == (2, len("a much longer replacement") + 3)
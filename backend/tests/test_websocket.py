@@ -0,0 +1,346 @@
+import pytest
+import asyncio
+import json
+from unittest.mock import AsyncMock, Mock, patch
+
+from datetime import datetime
+
+from app.core.websocket import ConnectionManager, LogMessage, LogType, Subscription, encode_json, parse_since
+
+
+def make_socket():
+    websocket = Mock()
+    websocket.accept = AsyncMock()
+    websocket.close = AsyncMock()
+    websocket.send_text = AsyncMock()
+    return websocket
+
+
+def make_blocked_socket():
+    """A socket whose sends hang until the returned event is set"""
+    websocket = make_socket()
+    release = asyncio.Event()
+
+    async def send_text(text):
+        await release.wait()
+
+    websocket.send_text.side_effect = send_text
+    return websocket, release
+
+
+def make_message(content="Thinking", metadata=None, type=LogType.THOUGHT, agent_id=3, crew_id=2):
+    return LogMessage(
+        type=type,
+        agent_id=agent_id,
+        agent_name="Researcher",
+        crew_id=crew_id,
+        project_id=1,
+        content=content,
+        metadata=metadata
+    )
+
+
+def sent_contents(websocket):
+    return [json.loads(call.args[0])["content"] for call in websocket.send_text.call_args_list]
+
+
+async def drain():
+    """Let the writer tasks run"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestConnectionManager:
+    """Test suite for live log WebSocket fan-out"""
+
+    @pytest.mark.asyncio
+    async def test_broadcast_encodes_once_for_all_sockets(self):
+        manager = ConnectionManager()
+        sockets = [make_socket() for _ in range(3)]
+        for websocket in sockets:
+            await manager.connect(websocket, project_id=1)
+        message = make_message()
+
+        with patch.object(LogMessage, 'to_dict', wraps=message.to_dict) as to_dict:
+            await manager.broadcast_to_project(1, message)
+        await drain()
+
+        assert to_dict.call_count == 1
+        frames = [websocket.send_text.call_args[0][0] for websocket in sockets]
+        assert len(set(frames)) == 1
+        assert json.loads(frames[0]) == message.to_dict()
+
+    @pytest.mark.asyncio
+    async def test_failed_send_disconnects_only_that_socket(self):
+        manager = ConnectionManager()
+        healthy, broken = make_socket(), make_socket()
+        await manager.connect(healthy, project_id=1)
+        await manager.connect(broken, project_id=1)
+        broken.send_text.side_effect = RuntimeError("closed")
+
+        await manager.broadcast_to_project(1, make_message())
+        await drain()
+
+        assert manager.active_connections[1] == [healthy]
+        assert broken not in manager.clients
+
+    @pytest.mark.asyncio
+    async def test_unencodable_message_is_not_sent(self):
+        manager = ConnectionManager()
+        websocket = make_socket()
+        await manager.connect(websocket, project_id=1)
+        await drain()
+        websocket.send_text.reset_mock()
+
+        await manager.broadcast_to_project(1, make_message(metadata={"handle": object()}))
+        await drain()
+
+        websocket.send_text.assert_not_called()
+        assert manager.active_connections[1] == [websocket]
+
+    @pytest.mark.asyncio
+    async def test_slow_client_does_not_hold_up_broadcast(self):
+        manager = ConnectionManager()
+        slow, release = make_blocked_socket()
+        fast = make_socket()
+        await manager.connect(slow, project_id=1)
+        await manager.connect(fast, project_id=1)
+
+        await asyncio.wait_for(manager.broadcast_to_project(1, make_message("Live")), timeout=0.1)
+        await drain()
+
+        assert sent_contents(fast)[-1] == "Live"
+        assert manager.stats(1)[0]["queue_depth"] == 1
+        release.set()
+        await drain()
+        assert sent_contents(slow)[-1] == "Live"
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest_policy(self):
+        manager = ConnectionManager(max_queue=2, overflow_policy="drop_oldest")
+        websocket, release = make_blocked_socket()
+        await manager.connect(websocket, project_id=1)
+        await drain()  # the writer is now stuck sending the confirmation
+
+        for content in ("one", "two", "three"):
+            await manager.broadcast_to_project(1, make_message(content, type=LogType.ACTION))
+
+        stats = manager.stats()[0]
+        assert (stats["queue_depth"], stats["max_queue_depth"], stats["dropped"]) == (2, 2, 1)
+        release.set()
+        await drain()
+        assert sent_contents(websocket)[1:] == ["two", "three"]
+
+    @pytest.mark.asyncio
+    async def test_coalesce_policy_replaces_queued_frame_of_same_stream(self):
+        manager = ConnectionManager(max_queue=2, overflow_policy="coalesce")
+        websocket, release = make_blocked_socket()
+        await manager.connect(websocket, project_id=1)
+        await drain()
+
+        await manager.broadcast_to_project(1, make_message("step 1", type=LogType.ACTION))
+        await manager.broadcast_to_project(1, make_message("thinking 1"))
+        await manager.broadcast_to_project(1, make_message("thinking 2"))
+        # Actions never coalesce, so a full queue drops the oldest frame instead
+        await manager.broadcast_to_project(1, make_message("step 2", type=LogType.ACTION))
+
+        stats = manager.stats()[0]
+        assert (stats["coalesced"], stats["dropped"]) == (1, 1)
+        release.set()
+        await drain()
+        assert sent_contents(websocket)[1:] == ["thinking 2", "step 2"]
+
+    @pytest.mark.asyncio
+    async def test_disconnect_policy_closes_slow_client(self):
+        manager = ConnectionManager(max_queue=1, overflow_policy="disconnect")
+        websocket, release = make_blocked_socket()
+        await manager.connect(websocket, project_id=1)
+        await drain()
+
+        await manager.broadcast_to_project(1, make_message("one"))
+        await manager.broadcast_to_project(1, make_message("two"))
+        release.set()
+        await drain()
+
+        websocket.close.assert_awaited_once_with(code=1013, reason="Client too slow")
+        assert websocket not in manager.clients
+        assert 1 not in manager.active_connections
+
+    @pytest.mark.asyncio
+    async def test_batching_flushes_full_batches_as_array_frames(self):
+        manager = ConnectionManager()
+        websocket = make_socket()
+        await manager.connect(websocket, project_id=1, batch_interval_ms=1000, batch_size=3)
+        await drain()
+
+        # The connection confirmation goes out at once, as an array frame too
+        confirmation = json.loads(websocket.send_text.call_args[0][0])
+        assert confirmation[0]["metadata"]["batch"] == {"interval_ms": 1000, "max_messages": 3}
+
+        for content in ("one", "two"):
+            await manager.broadcast_to_project(1, make_message(content, type=LogType.ACTION))
+        await drain()
+        assert websocket.send_text.call_count == 1
+
+        await manager.broadcast_to_project(1, make_message("three", type=LogType.ACTION))
+        await drain()
+
+        frame = json.loads(websocket.send_text.call_args[0][0])
+        assert [message["content"] for message in frame] == ["one", "two", "three"]
+        stats = manager.stats()[0]
+        assert (stats["sent"], stats["frames"], stats["queue_depth"]) == (4, 2, 0)
+
+    @pytest.mark.asyncio
+    async def test_batching_flushes_partial_batch_after_interval(self):
+        manager = ConnectionManager()
+        websocket = make_socket()
+        await manager.connect(websocket, project_id=1, batch_interval_ms=20)
+        await asyncio.sleep(0.05)
+
+        await manager.broadcast_to_project(1, make_message("one", type=LogType.ACTION))
+        await manager.broadcast_to_project(1, make_message("two", type=LogType.ACTION))
+        await drain()
+        assert websocket.send_text.call_count == 1
+
+        await asyncio.sleep(0.05)
+
+        assert [m["content"] for m in json.loads(websocket.send_text.call_args[0][0])] == ["one", "two"]
+
+    @pytest.mark.asyncio
+    async def test_broadcast_from_another_thread_and_loop(self):
+        """Agents running in worker threads broadcast with asyncio.run"""
+        manager = ConnectionManager()
+        websocket = make_socket()
+        await manager.connect(websocket, project_id=1)
+
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: asyncio.run(manager.broadcast_to_project(1, make_message("From a crew thread")))
+        )
+        await drain()
+
+        assert sent_contents(websocket)[-1] == "From a crew thread"
+
+    @pytest.mark.asyncio
+    async def test_broadcast_reaches_only_matching_subscriptions(self):
+        manager = ConnectionManager()
+        everything, crew_errors, agent = make_socket(), make_socket(), make_socket()
+        for websocket in (everything, crew_errors, agent):
+            await manager.connect(websocket, project_id=1)
+        manager.subscribe(crew_errors, Subscription(crew_ids=[2], min_severity="notice"))
+        manager.subscribe(agent, Subscription(agent_ids=[5], log_types=[LogType.THOUGHT, LogType.ACTION]))
+        await drain()
+        for websocket in (everything, crew_errors, agent):
+            websocket.send_text.reset_mock()
+
+        await manager.broadcast_to_project(1, make_message("crew 2 thought"))
+        await manager.broadcast_to_project(1, make_message("crew 2 error", type=LogType.ERROR))
+        await manager.broadcast_to_project(1, make_message("agent 5 action", type=LogType.ACTION, agent_id=5, crew_id=9))
+        await manager.broadcast_to_project(1, make_message("project status", type=LogType.STATUS, agent_id=None, crew_id=None))
+        await drain()
+
+        assert sent_contents(everything) == ["crew 2 thought", "crew 2 error", "agent 5 action", "project status"]
+        assert sent_contents(crew_errors) == ["crew 2 error"]
+        assert sent_contents(agent) == ["agent 5 action"]
+
+        # Disconnecting drops the connection from the index
+        manager.disconnect(crew_errors)
+        assert manager.subscriptions[1].by_crew == {}
+        assert manager.subscriptions[1].match(make_message(type=LogType.ERROR)) == {manager.clients[everything]}
+
+    @pytest.mark.asyncio
+    async def test_subscribe_command_over_socket(self):
+        manager = ConnectionManager()
+        websocket = make_socket()
+        await manager.connect(websocket, project_id=1)
+
+        await manager.handle_message(websocket, json.dumps({
+            "action": "subscribe", "crew_ids": [2], "log_types": ["error", "milestone", "thought"], "min_severity": "notice"
+        }))
+        await drain()
+
+        reply = json.loads(websocket.send_text.call_args[0][0])
+        assert reply["content"] == "Subscription updated"
+        assert reply["metadata"]["subscription"] == {
+            "crew_ids": [2], "agent_ids": [], "log_types": ["error", "milestone"], "min_severity": "notice"
+        }
+
+        await manager.handle_message(websocket, json.dumps({"action": "subscribe", "log_types": ["chatter"]}))
+        await manager.handle_message(websocket, "not json")
+        await drain()
+
+        errors = [json.loads(call.args[0]) for call in websocket.send_text.call_args_list[-2:]]
+        assert [error["type"] for error in errors] == ["error", "error"]
+        assert errors[0]["content"].startswith("Invalid command: log_types.0:")
+        # A rejected command keeps the previous filter
+        assert manager.stats()[0]["subscription"]["crew_ids"] == [2]
+
+    @pytest.mark.asyncio
+    async def test_reconnect_replays_missed_messages_once(self):
+        manager = ConnectionManager()
+        first = make_socket()
+        await manager.connect(first, project_id=1)
+        for content in ("one", "two"):
+            await manager.broadcast_to_project(1, make_message(content, type=LogType.ACTION))
+        await manager.broadcast_to_project(2, make_message("other project", type=LogType.ACTION))
+        await drain()
+        last_seen = json.loads(first.send_text.call_args[0][0])["seq"]
+        manager.disconnect(first)
+
+        for content in ("three", "four"):
+            await manager.broadcast_to_project(1, make_message(content, type=LogType.ACTION))
+        second = make_socket()
+        await manager.connect(second, project_id=1, since=last_seen)
+        await manager.broadcast_to_project(1, make_message("five", type=LogType.ACTION))
+        await drain()
+
+        frames = [json.loads(call.args[0]) for call in second.send_text.call_args_list]
+        confirmation, replay, live = frames
+        assert last_seen == 2
+        assert confirmation["metadata"]["last_seq"] == 4
+        assert confirmation["metadata"]["replay"] == {"messages": 2, "complete": True}
+        assert [(message["seq"], message["content"]) for message in replay] == [(3, "three"), (4, "four")]
+        assert (live["seq"], live["content"]) == (5, "five")
+
+    @pytest.mark.asyncio
+    async def test_replay_buffer_is_bounded_by_size(self):
+        manager = ConnectionManager(replay_buffer_bytes=600)
+        for index in range(10):
+            await manager.broadcast_to_project(1, make_message(f"message {index}", type=LogType.ACTION))
+
+        websocket = make_socket()
+        await manager.connect(websocket, project_id=1, since=0)
+        await drain()
+
+        confirmation, replay = [json.loads(call.args[0]) for call in websocket.send_text.call_args_list]
+        assert manager._replay[1].size <= 600
+        assert 0 < len(replay) < 10
+        assert replay[-1]["seq"] == 10
+        assert confirmation["metadata"]["replay"]["complete"] is False
+
+    @pytest.mark.asyncio
+    async def test_replay_since_timestamp_or_stale_sequence(self):
+        manager = ConnectionManager()
+        await manager.broadcast_to_project(1, make_message("old", type=LogType.ACTION))
+        cutoff = datetime.utcnow()
+        await asyncio.sleep(0.001)
+        await manager.broadcast_to_project(1, make_message("new", type=LogType.ACTION))
+
+        by_time, stale = make_socket(), make_socket()
+        await manager.connect(by_time, project_id=1, since=cutoff)
+        # A sequence id from before a restart is beyond the current stream
+        await manager.connect(stale, project_id=1, since=500)
+        await drain()
+
+        assert [m["content"] for m in json.loads(by_time.send_text.call_args[0][0])] == ["new"]
+        assert [m["content"] for m in json.loads(stale.send_text.call_args[0][0])] == ["old", "new"]
+
+    def test_parse_since(self):
+        assert parse_since("42") == 42
+        assert parse_since("2026-01-02T03:04:05+02:00") == datetime(2026, 1, 2, 1, 4, 5)
+        with pytest.raises(ValueError):
+            parse_since("yesterday")
+
+    def test_encode_json_matches_stdlib(self):
+        payload = {"content": "Grüße", "metadata": {1: [1.5, None, True]}}
+
+        assert json.loads(encode_json(payload)) == json.loads(json.dumps(payload))